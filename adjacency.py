@@ -0,0 +1,238 @@
+import math
+
+from sqlalchemy import text
+
+import models
+import spatial
+
+# Parcel adjacency graph and site contiguity analysis.
+#
+# Two parcels of the same project are adjacent when their outlines share
+# boundary of at least MIN_SHARED_LENGTH_M, with segments matched within
+# EDGE_TOLERANCE_M (survey polygons rarely line up exactly). Touching at a
+# corner does not count.
+#
+# Edges live in `parcel_adjacency` (parcel_a < parcel_b) and are maintained
+# incrementally: when a parcel's geometry changes only its own edges are
+# recomputed, using the R-tree to find candidate neighbours. A trigger drops
+# a parcel's edges when the parcel row is deleted.
+#
+# Contiguity of the site (parcels with include_in_site=1) is then a union-find
+# over stored edges; no geometry is decoded at query time.
+
+EDGE_TOLERANCE_M = 0.5
+MIN_SHARED_LENGTH_M = 1.0
+# An excluded parcel sharing at least this share of its perimeter with site
+# parcels is reported as an enclave.
+ENCLAVE_SHARED_RATIO = 0.9
+
+ADJACENCY_DDL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS parcel_adjacency_ad AFTER DELETE ON land_parcels
+    BEGIN
+        DELETE FROM parcel_adjacency WHERE parcel_a = OLD.id OR parcel_b = OLD.id;
+    END
+    """,
+]
+
+
+def ensure_adjacency_triggers(cursor):
+    for statement in ADJACENCY_DDL:
+        cursor.execute(statement)
+
+
+# --- Geometry ---
+
+def _segments(pts):
+    return [(a, b) for a, b in zip(pts, pts[1:]) if a != b]
+
+
+def _overlap_length(seg_a, seg_b, tol: float) -> float:
+    (ax, ay), (bx, by) = seg_a
+    dx, dy = bx - ax, by - ay
+    length = math.hypot(dx, dy)
+    ux, uy = dx / length, dy / length
+    # Both ends of seg_b must lie within tol of seg_a's line
+    ts = []
+    for px, py in seg_b:
+        rx, ry = px - ax, py - ay
+        if abs(rx * uy - ry * ux) > tol:
+            return 0.0
+        ts.append(rx * ux + ry * uy)
+    lo = max(0.0, min(ts))
+    hi = min(length, max(ts))
+    return hi - lo if hi > lo else 0.0
+
+
+def shared_boundary_m(ring_a, ring_b, tol: float = EDGE_TOLERANCE_M) -> float:
+    lat0 = ring_a[0][1]
+    segs_a = _segments(spatial.to_metres(ring_a, lat0))
+    segs_b = _segments(spatial.to_metres(ring_b, lat0))
+    total = 0.0
+    for seg_b in segs_b:
+        bx0, bx1 = sorted((seg_b[0][0], seg_b[1][0]))
+        by0, by1 = sorted((seg_b[0][1], seg_b[1][1]))
+        for seg_a in segs_a:
+            if (max(seg_a[0][0], seg_a[1][0]) < bx0 - tol or min(seg_a[0][0], seg_a[1][0]) > bx1 + tol
+                    or max(seg_a[0][1], seg_a[1][1]) < by0 - tol or min(seg_a[0][1], seg_a[1][1]) > by1 + tol):
+                continue
+            total += _overlap_length(seg_a, seg_b, tol)
+    return total
+
+
+# --- Incremental Maintenance ---
+
+_CANDIDATES_SQL = text("""
+    SELECT p.id, p.geom
+    FROM land_parcels_rtree AS r
+    JOIN land_parcels AS p ON p.id = r.id
+    WHERE r.min_x <= :max_x AND r.max_x >= :min_x
+      AND r.min_y <= :max_y AND r.max_y >= :min_y
+      AND p.project_id = :project_id AND p.id != :parcel_id
+""")
+
+
+def update_parcel_adjacency(db, parcel):
+    """Recompute the edges of one parcel. Call after the parcel row is flushed."""
+    db.query(models.ParcelAdjacency).filter(
+        (models.ParcelAdjacency.parcel_a == parcel.id) | (models.ParcelAdjacency.parcel_b == parcel.id)
+    ).delete(synchronize_session=False)
+
+    rings = spatial.decode_polygon(parcel.geom)
+    if rings is None or parcel.project_id is None:
+        return
+    outline = rings[0]
+
+    # Expand the search box by the tolerance, in degrees
+    pad_y = EDGE_TOLERANCE_M / spatial.M_PER_DEG_LAT
+    pad_x = EDGE_TOLERANCE_M / (spatial.M_PER_DEG_LNG_EQUATOR * math.cos(math.radians(outline[0][1])))
+    candidates = db.execute(_CANDIDATES_SQL, {
+        "min_x": parcel.min_x - pad_x, "max_x": parcel.max_x + pad_x,
+        "min_y": parcel.min_y - pad_y, "max_y": parcel.max_y + pad_y,
+        "project_id": parcel.project_id, "parcel_id": parcel.id,
+    }).all()
+
+    for other_id, other_geom in candidates:
+        other_rings = spatial.decode_polygon(other_geom)
+        shared = shared_boundary_m(outline, other_rings[0])
+        if shared >= MIN_SHARED_LENGTH_M:
+            a, b = sorted((parcel.id, other_id))
+            db.add(models.ParcelAdjacency(
+                parcel_a=a, parcel_b=b, project_id=parcel.project_id, shared_length_m=shared,
+            ))
+
+
+def rebuild_project_adjacency(db, project_id: int):
+    """Full rebuild for one project (backfill / after bulk imports)."""
+    db.query(models.ParcelAdjacency).filter(
+        models.ParcelAdjacency.project_id == project_id
+    ).delete(synchronize_session=False)
+    parcels = db.query(models.LandParcel).filter(
+        models.LandParcel.project_id == project_id, models.LandParcel.geom.isnot(None)
+    ).all()
+    decoded = {p.id: spatial.decode_polygon(p.geom)[0] for p in parcels}
+    ids = sorted(decoded)
+    boxes = {p.id: (p.min_x, p.min_y, p.max_x, p.max_y) for p in parcels}
+    pad = EDGE_TOLERANCE_M / spatial.M_PER_DEG_LAT * 2
+    for i, a in enumerate(ids):
+        ax0, ay0, ax1, ay1 = boxes[a]
+        for b in ids[i + 1:]:
+            bx0, by0, bx1, by1 = boxes[b]
+            if bx0 > ax1 + pad or bx1 < ax0 - pad or by0 > ay1 + pad or by1 < ay0 - pad:
+                continue
+            shared = shared_boundary_m(decoded[a], decoded[b])
+            if shared >= MIN_SHARED_LENGTH_M:
+                db.add(models.ParcelAdjacency(
+                    parcel_a=a, parcel_b=b, project_id=project_id, shared_length_m=shared,
+                ))
+
+
+# --- Contiguity ---
+
+class _UnionFind:
+    def __init__(self, items):
+        self.parent = {item: item for item in items}
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+
+def analyze_contiguity(db, project_id: int):
+    parcels = db.execute(text("""
+        SELECT id, area_m2, include_in_site, perimeter_m, geom IS NOT NULL AS located
+        FROM land_parcels WHERE project_id = :project_id
+    """), {"project_id": project_id}).all()
+    edges = db.execute(text("""
+        SELECT parcel_a, parcel_b, shared_length_m
+        FROM parcel_adjacency WHERE project_id = :project_id
+    """), {"project_id": project_id}).all()
+
+    included = {p.id for p in parcels if p.include_in_site and p.located}
+    unlocated = [p.id for p in parcels if not p.located]
+    info = {p.id: p for p in parcels}
+
+    uf = _UnionFind(included)
+    internal_shared = {}
+    neighbours = {}
+    for a, b, shared in edges:
+        neighbours.setdefault(a, []).append((b, shared))
+        neighbours.setdefault(b, []).append((a, shared))
+        if a in included and b in included:
+            uf.union(a, b)
+
+    groups = {}
+    for pid in included:
+        groups.setdefault(uf.find(pid), []).append(pid)
+    for a, b, shared in edges:
+        if a in included and b in included:
+            root = uf.find(a)
+            internal_shared[root] = internal_shared.get(root, 0.0) + shared
+
+    # Largest component first; component index is used by bridging_parcels
+    ordered = sorted(groups.items(), key=lambda item: -sum(info[p].area_m2 or 0.0 for p in item[1]))
+    component_index = {root: i for i, (root, _) in enumerate(ordered)}
+    components = []
+    for root, members in ordered:
+        perimeter = sum(info[p].perimeter_m or 0.0 for p in members)
+        components.append({
+            "parcel_ids": sorted(members),
+            "area_m2": round(sum(info[p].area_m2 or 0.0 for p in members), 2),
+            # Outer boundary of the assembled site: perimeter not shared between its own parcels
+            "frontage_m": round(perimeter - 2.0 * internal_shared.get(root, 0.0), 2),
+        })
+
+    bridging = []
+    enclaves = []
+    for p in parcels:
+        if p.id in included or not p.located:
+            continue
+        joined = set()
+        shared_with_site = 0.0
+        for other, shared in neighbours.get(p.id, []):
+            if other in included:
+                joined.add(component_index[uf.find(other)])
+                shared_with_site += shared
+        if len(joined) >= 2:
+            bridging.append({"parcel_id": p.id, "joins_components": sorted(joined)})
+        if p.perimeter_m and shared_with_site >= ENCLAVE_SHARED_RATIO * p.perimeter_m:
+            enclaves.append(p.id)
+
+    return {
+        "project_id": project_id,
+        "is_contiguous": len(components) <= 1,
+        "component_count": len(components),
+        "components": components,
+        "bridging_parcels": bridging,
+        "enclave_parcels": sorted(enclaves),
+        "unlocated_parcels": sorted(unlocated),
+    }
@@ -0,0 +1,164 @@
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+# Read throughput vs. uvicorn worker count, in DB_MODE=production.
+#
+#   python bench_db_workers.py                      # workers 1, 2, 4
+#   python bench_db_workers.py --workers 1 2 4 8 --writers 2 --duration 10
+#
+# Seeds a throw-away SQLite DB (projects with parcels) in a temp directory,
+# then for each worker count starts `uvicorn main:app --workers N`, hammers
+# GET /projects/{id} from client threads for --duration seconds, optionally
+# alongside --writers threads doing PUT /projects/{id}, and reports reads/s,
+# p50/p95 latency and how many requests failed (e.g. "database is locked").
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed(workdir, n_projects, n_parcels):
+    code = f"""
+import models
+from database import SessionLocal, engine
+models.Base.metadata.create_all(bind=engine)
+from patch_db import patch_db
+patch_db()
+db = SessionLocal()
+for i in range({n_projects}):
+    p = models.Project(name=f"bench-{{i}}")
+    db.add(p)
+    db.flush()
+    db.bulk_insert_mappings(models.LandParcel, [
+        {{"project_id": p.id, "section_name": "西園段", "lot_number": str(j),
+          "area_m2": 100.0, "zoning_type": "第三種住宅區", "announced_value": 250000.0}}
+        for j in range({n_parcels})
+    ])
+    p.total_area_m2 = 100.0 * {n_parcels}
+db.commit()
+"""
+    subprocess.run([sys.executable, "-c", code], cwd=workdir, env=bench_env(), check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def bench_env():
+    env = dict(os.environ)
+    env.update({
+        "DB_MODE": "production",
+        "QUERY_LOG_ENABLED": "0",
+        "PYTHONPATH": HERE + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    return env
+
+
+def wait_ready(base, proc, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if requests.get(base + "/health", timeout=1).ok:
+                return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("uvicorn did not become ready")
+
+
+def hammer(base, n_projects, duration, readers, writers):
+    stop = time.time() + duration
+    latencies, errors = [], [0]
+    writes = [0]
+    lock = threading.Lock()
+
+    def reader(offset):
+        session = requests.Session()
+        local, i = [], offset
+        while time.time() < stop:
+            start = time.perf_counter()
+            try:
+                ok = session.get(f"{base}/projects/{i % n_projects + 1}", timeout=30).ok
+            except requests.RequestException:
+                ok = False
+            local.append((time.perf_counter() - start) * 1000.0)
+            if not ok:
+                with lock:
+                    errors[0] += 1
+            i += 1
+        with lock:
+            latencies.extend(local)
+
+    def writer(offset):
+        session = requests.Session()
+        i = offset
+        while time.time() < stop:
+            try:
+                ok = session.put(f"{base}/projects/{i % n_projects + 1}", json={"bcr": float(i % 80)}, timeout=30).ok
+            except requests.RequestException:
+                ok = False
+            with lock:
+                writes[0] += 1
+                if not ok:
+                    errors[0] += 1
+            i += 1
+
+    threads = [threading.Thread(target=reader, args=(k,)) for k in range(readers)]
+    threads += [threading.Thread(target=writer, args=(k,)) for k in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    return latencies, writes[0], errors[0]
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="bench_db_workers_")
+    try:
+        seed(workdir, args.projects, args.parcels)
+        print(f"{args.projects} projects x {args.parcels} parcels, {args.clients} reader threads, "
+              f"{args.writers} writer threads, {args.duration:.0f}s per run\n")
+        print(f"{'workers':>8} {'reads/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'writes':>7} {'errors':>7}")
+        for workers in args.workers:
+            port = free_port()
+            base = f"http://127.0.0.1:{port}"
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                 "--workers", str(workers), "--log-level", "warning"],
+                cwd=workdir, env=bench_env(), stdout=subprocess.DEVNULL,
+            )
+            try:
+                wait_ready(base, proc)
+                time.sleep(1.0 if workers > 1 else 0.2)  # let every worker finish startup
+                latencies, writes, errors = hammer(base, args.projects, args.duration, args.clients, args.writers)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            p50 = latencies[len(latencies) // 2] if latencies else 0.0
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+            print(f"{workers:>8} {len(latencies) / args.duration:>9.1f} {p50:>8.2f} {p95:>8.2f} {writes:>7} {errors:>7}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16, help="concurrent reader threads")
+    parser.add_argument("--writers", type=int, default=1, help="concurrent writer threads")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--parcels", type=int, default=20)
+    run(parser.parse_args())
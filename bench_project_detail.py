@@ -0,0 +1,119 @@
+import os
+import sys
+import tempfile
+import time
+
+# Query-count regression check + latency benchmark for the project detail paths.
+#
+#   python bench_project_detail.py
+#
+# Runs against a throw-away SQLite file in a temp directory (the app uses
+# ./sql_app.db relative to the working directory), seeds projects with
+# 1 / 100 / 5000 parcels and fails if any detail path issues more queries
+# than its budget, independent of parcel count.
+
+PARCEL_COUNTS = [1, 100, 5000]
+ROUNDS = 20
+
+# Max statements per request; must not grow with the number of parcels.
+QUERY_BUDGETS = {
+    "GET /projects/{id}": 2,
+    # get, sync seq, UPDATE, change_log, reload (2)
+    "PUT /projects/{id}": 6,
+    # get, sync seq, INSERT, change_log, total-area UPDATE, its change_log row,
+    # project_summary rebuild, refresh
+    "POST /projects/{id}/parcels/": 8,
+    "PUT /land_parcels/{id}": 8,
+}
+
+
+def seed_project(db, models, n_parcels):
+    project = models.Project(name=f"bench-{n_parcels}")
+    db.add(project)
+    db.flush()
+    db.bulk_insert_mappings(models.LandParcel, [
+        {
+            "project_id": project.id,
+            "section_name": "西園段",
+            "lot_number": str(i),
+            "area_m2": 100.0,
+            "zoning_type": "第三種住宅區",
+            "announced_value": 250000.0,
+        }
+        for i in range(n_parcels)
+    ])
+    project.total_area_m2 = 100.0 * n_parcels
+    db.commit()
+    return project.id
+
+
+def timed(fn, rounds=ROUNDS):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1]
+
+
+def run():
+    from fastapi.testclient import TestClient
+
+    import main
+    import models
+    import query_log
+    from database import SessionLocal
+
+    failures = []
+    client = TestClient(main.app)
+
+    with client:
+        db = SessionLocal()
+        project_ids = {n: seed_project(db, models, n) for n in PARCEL_COUNTS}
+        parcel_ids = {
+            n: db.query(models.LandParcel.id).filter(models.LandParcel.project_id == pid).first()[0]
+            for n, pid in project_ids.items()
+        }
+        db.close()
+
+        print(f"{'case':32} {'parcels':>8} {'queries':>8} {'p50 ms':>9} {'p95 ms':>9}")
+        for n in PARCEL_COUNTS:
+            pid = project_ids[n]
+            cases = {
+                "GET /projects/{id}": lambda: client.get(f"/projects/{pid}"),
+                "PUT /projects/{id}": lambda: client.put(f"/projects/{pid}", json={"bcr": 50.0}),
+                "POST /projects/{id}/parcels/": lambda: client.post(f"/projects/{pid}/parcels/", json={
+                    "section_name": "西園段", "lot_number": "new", "area_m2": 1.0, "zoning_type": "第三種住宅區",
+                }),
+                "PUT /land_parcels/{id}": lambda: client.put(f"/land_parcels/{parcel_ids[n]}", json={"area_m2": 100.0}),
+            }
+            for name, call in cases.items():
+                with query_log.track_queries() as stats:
+                    response = call()
+                if response.status_code != 200:
+                    failures.append(f"{name} [{n} parcels]: HTTP {response.status_code}")
+                    continue
+                if stats.count > QUERY_BUDGETS[name]:
+                    failures.append(
+                        f"{name} [{n} parcels]: {stats.count} queries > budget {QUERY_BUDGETS[name]}"
+                    )
+                p50, p95 = timed(call)
+                print(f"{name:32} {n:>8} {stats.count:>8} {p50:>9.2f} {p95:>9.2f}")
+
+    if failures:
+        print("\nQUERY BUDGET REGRESSIONS:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("\nAll detail paths within query budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, here)
+    os.environ.setdefault("QUERY_LOG_ENABLED", "1")  # budgets are checked through the instrumentation
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        sys.exit(run())
@@ -0,0 +1,62 @@
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+import schemas
+import site_optimizer
+
+# Site assembly optimizer on synthetic sites, no database.
+#
+#   python bench_site_optimizer.py                          # 40 and 60 parcels, 1 and 4 workers
+#   python bench_site_optimizer.py --parcels 80 --workers 1 2 4 8 --min-area 3000
+#
+# Parcels get random area (40-400 m2), FAR (225/300/400%) and integration risk.
+# Prints wall time, B&B nodes, front size and whether every search finished
+# under OPTIMIZER_MAX_NODES.
+
+
+def synthetic_site(n, seed):
+    rng = random.Random(seed)
+    parcels = [
+        SimpleNamespace(
+            id=i + 1,
+            area_m2=rng.uniform(40, 400),
+            far_limit=rng.choice([225.0, 300.0, 400.0]),
+            legal_floor_area_rate=None,
+            include_in_site=1,
+            integration_risk=rng.choice(["low", "medium", "high", None]),
+            ownership_status=rng.choice(["private_single", "private_multiple", "public"]),
+        )
+        for i in range(n)
+    ]
+    project = SimpleNamespace(**{name: None for name in site_optimizer.calc_engine.PARAMETER_FIELDS})
+    project.bonus_soil_mgmt = 10.0
+    project.bonus_cap = 50.0
+    return project, parcels
+
+
+def run(args):
+    print(f"{'parcels':>8} {'workers':>8} {'ms':>9} {'nodes':>9} {'front':>6} {'exact':>6}")
+    for n in args.parcels:
+        project, parcels = synthetic_site(n, args.seed)
+        request = schemas.SiteOptimizeRequest(min_site_area_m2=args.min_area)
+        problem = site_optimizer.build_problem(project, parcels, request)
+        for workers in args.workers:
+            if workers > 1:
+                site_optimizer.solve(problem, workers=workers)  # warm the pool
+            start = time.perf_counter()
+            subsets, nodes, exact = site_optimizer.solve(problem, workers=workers)
+            front = site_optimizer.pareto_front(problem, subsets)
+            elapsed = (time.perf_counter() - start) * 1000.0
+            print(f"{n:>8} {workers:>8} {elapsed:>9.1f} {nodes:>9} {len(front):>6} {str(exact):>6}")
+    site_optimizer.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parcels", type=int, nargs="+", default=[40, 60])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--min-area", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    run(parser.parse_args())
@@ -0,0 +1,216 @@
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+import calc_cache
+import calc_engine
+import models
+
+# Cheapest way to fill the bonus cap.
+#
+# calculateBonus sums the effective rates of central, local, disaster
+# (bonus_other), chloride, soil 80-2 and TOD and clips the sum at bonus_cap,
+# so every % claimed above the cap is compliance cost for nothing. Candidates
+# are read from the project:
+#
+#   central.<key> / local.<key>    each numeric checklist entry of central_ / local_bonus_details
+#   disaster.delta_b1..3           disaster checklist components (0 when the gates fail)
+#   central / local / disaster     the plain rate, when the checklist is empty
+#   chloride, soil_80_2, tod       one item each, at its effective rate for the current site
+#
+# Each candidate has one or more tiers (rate, cost); `costs` prices the
+# detected rate, `options` replaces/adds tiers (e.g. green building diamond vs
+# gold). Picking at most one tier per candidate to reach the target at minimum
+# cost is a multiple-choice covering knapsack, solved exactly by a DP over the
+# claimed rate in 0.01% units, clamped at the target (anything above it is
+# waste). Each candidate's step is a few NumPy operations on the whole state
+# vector, so the full min-cost-per-rate curve comes out of the same pass.
+
+RATE_UNITS = 100  # DP resolution: 0.01%
+
+_SINGLE_ITEMS = {"central": "bonus_central", "local": "bonus_local", "disaster": "bonus_other"}
+
+
+def _checklist_items(category, details):
+    items = {}
+    for key, value in calc_engine.details_checklist(details).items():
+        if isinstance(value, bool):
+            continue  # gates / flags, not rates
+        rate = calc_engine.safe_num(value)
+        if rate > 0:
+            items[f"{category}.{key}"] = rate
+    return items
+
+
+def detect_candidates(params, base_volume, site_area):
+    """{item id: (category, detected rate, note)} for one project's parameters."""
+    candidates = {}
+    for category in ("central", "local"):
+        items = _checklist_items(category, params.get(f"{category}_bonus_details"))
+        if not items:
+            rate = calc_engine.safe_num(calc_engine.parameter_value(params, _SINGLE_ITEMS[category]))
+            items = {category: rate} if rate > 0 else {}
+        for item_id, rate in items.items():
+            candidates[item_id] = (category, rate, None)
+
+    disaster_details = params.get("disaster_bonus_details")
+    eligible = calc_engine.disaster_effective_rate(1.0, disaster_details) > 0
+    components = {
+        item_id: rate for item_id, rate in _checklist_items("disaster", disaster_details).items()
+        if item_id.startswith("disaster.delta_b")
+    }
+    if not components:
+        rate = calc_engine.safe_num(calc_engine.parameter_value(params, "bonus_other"))
+        components = {"disaster": rate} if rate > 0 else {}
+    for item_id, rate in components.items():
+        candidates[item_id] = ("disaster", rate if eligible else 0.0, None if eligible else "disaster gates not met")
+
+    items = calc_engine.bonus_items(params, base_volume, site_area)
+    raw_soil = calc_engine.safe_num(calc_engine.parameter_value(params, "bonus_soil_mgmt"))
+    for item_id, key, raw in (
+        ("chloride", "bonus_chloride", items["bonus_chloride"]),
+        ("soil_80_2", "bonus_soil_mgmt", raw_soil),
+        ("tod", "bonus_tod", items["bonus_tod"]),
+    ):
+        if raw > 0:
+            note = None
+            if key == "bonus_soil_mgmt" and items[key] < raw:
+                note = "site area below 2,000 m2" if items[key] == 0 else "capped at 30%"
+            candidates[item_id] = (item_id, items[key], note)
+    return candidates
+
+
+def _solve(groups, target_units):
+    """Multiple-choice covering DP. groups: [[(units, cost), ...], ...].
+
+    Returns (dp per group boundary, choice per group): dp[g][s] is the min cost
+    to reach exactly s units (s == target_units meaning "at least") with the
+    first g groups; choice[g][s] the tier picked in group g (-1 = skip).
+    """
+    size = target_units + 1
+    dp = np.full(size, np.inf)
+    dp[0] = 0.0
+    history, choices = [dp], []
+    for tiers in groups:
+        new = dp.copy()
+        choice = np.full(size, -1, dtype=np.int16)
+        for t, (units, cost) in enumerate(tiers):
+            cand = np.full(size, np.inf)
+            if units < target_units:
+                cand[units:target_units] = dp[:target_units - units] + cost
+            lo = max(target_units - units, 0)
+            cand[target_units] = dp[lo:].min() + cost
+            better = cand < new
+            new[better] = cand[better]
+            choice[better] = t
+        dp = new
+        history.append(dp)
+        choices.append(choice)
+    return history, choices
+
+
+def _backtrack(groups, history, choices, state, target_units):
+    picked = {}
+    for g in range(len(groups) - 1, -1, -1):
+        t = int(choices[g][state])
+        if t < 0:
+            continue
+        units = groups[g][t][0]
+        picked[g] = t
+        if state < target_units:
+            state -= units
+        else:
+            lo = max(target_units - units, 0)
+            previous = history[g]
+            state = lo + int(np.argmin(previous[lo:]))
+    return picked
+
+
+def optimize(db, project, request):
+    """Min-cost tier selection reaching the bonus cap, per schemas.BonusOptimizeRequest."""
+    started = time.perf_counter()
+    params = {name: getattr(project, name) for name in calc_engine.PARAMETER_FIELDS}
+    parcels = db.execute(
+        select(
+            models.LandParcel.id, models.LandParcel.area_m2, models.LandParcel.far_limit,
+            models.LandParcel.legal_floor_area_rate, models.LandParcel.include_in_site,
+        ).where(models.LandParcel.project_id == project.id)
+    ).mappings().all()
+    site = calc_cache.evaluate(parcels, [params], project_ids=(project.id,))
+    site_area, base_volume = float(site["site_area_m2"][0]), float(site["base_volume_m2"][0])
+
+    cap = calc_engine.bonus_cap(params)
+    target = min(request.target_rate, cap) if request.target_rate is not None else cap
+    target_units = max(int(round(target * RATE_UNITS)), 0)
+
+    detected = detect_candidates(params, base_volume, site_area)
+    candidates, unpriced, excluded = [], [], []
+    for item_id, (category, rate, note) in detected.items():
+        if item_id in request.options:
+            continue
+        if rate <= 0:
+            excluded.append({"id": item_id, "reason": note or "no effective rate"})
+            continue
+        if item_id not in request.costs:
+            unpriced.append(item_id)
+        tiers = [{"rate": rate, "cost": float(request.costs.get(item_id, 0.0))}]
+        candidates.append({"id": item_id, "category": category, "tiers": tiers, "note": note})
+    for item_id, options in request.options.items():
+        category = detected[item_id][0] if item_id in detected else "custom"
+        tiers = [{"rate": o.rate, "cost": o.cost} for o in options if o.rate > 0]
+        if tiers:
+            candidates.append({"id": item_id, "category": category, "tiers": tiers, "note": None})
+
+    groups = [
+        [(int(round(t["rate"] * RATE_UNITS)), t["cost"]) for t in c["tiers"]]
+        for c in candidates
+    ]
+    history, choices = _solve(groups, target_units)
+    final = history[-1]
+
+    # Min cost to claim at least r% (suffix minimum). The curve keeps, per cost
+    # level, the highest rate it buys: the cost/rate efficient frontier.
+    at_least = np.minimum.accumulate(final[::-1])[::-1]
+    reachable = np.flatnonzero(np.isfinite(at_least))
+    best_units = int(reachable[-1]) if reachable.size else 0
+    curve = []
+    for units in reachable:
+        point = {"rate": units / RATE_UNITS, "min_cost": float(at_least[units])}
+        if curve and curve[-1]["min_cost"] == point["min_cost"]:
+            curve[-1] = point
+        else:
+            curve.append(point)
+    for previous, point in zip(curve, curve[1:]):
+        point["marginal_cost_per_pct"] = (point["min_cost"] - previous["min_cost"]) / (point["rate"] - previous["rate"])
+
+    # Cheapest exact state among those reaching best_units (at_least is a suffix min)
+    state = best_units + int(np.argmin(final[best_units:]))
+    picked = _backtrack(groups, history, choices, state, target_units)
+    selected = [
+        {"id": candidates[g]["id"], **candidates[g]["tiers"][t]}
+        for g, t in sorted(picked.items())
+    ]
+    claimed = sum(item["rate"] for item in selected)
+
+    # Current claim: every candidate at its first (detected) tier
+    current_rate = sum(c["tiers"][0]["rate"] for c in candidates)
+    current_cost = sum(c["tiers"][0]["cost"] for c in candidates)
+    return {
+        "cap": cap,
+        "target_rate": target,
+        "site_area_m2": site_area,
+        "base_volume_m2": base_volume,
+        "candidates": candidates,
+        "excluded": excluded,
+        "unpriced": unpriced,
+        "selected": selected,
+        "selected_rate": claimed,
+        "effective_rate": min(claimed, cap),
+        "wasted_rate": max(claimed - target, 0.0),
+        "min_cost": float(at_least[best_units]) if reachable.size else 0.0,
+        "reaches_target": best_units >= target_units,
+        "current": {"rate": current_rate, "cost": current_cost, "wasted_rate": max(current_rate - cap, 0.0)},
+        "curve": curve,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1),
+    }
@@ -0,0 +1,322 @@
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+import calc_engine
+import config
+import models
+from database import engine, read_engine
+
+# Memoized calc_engine results.
+#
+# The key is a SHA-256 of the canonical JSON of the normalized input plus
+# CALCULATION_VERSION:
+#
+#   parcels      (id, area, effective FAR, include) sorted by id, as
+#                calc_engine.parcel_arrays sees them
+#   param sets   every PARAMETER_FIELDS entry with defaults filled in, so an
+#                unset column and its default hash the same
+#
+# Because the key is the content, a changed project or parcel can never be
+# served a stale result; invalidation only reclaims memory. Entries are
+# tagged with their project ids and dropped when a commit touches one of
+# those projects (change_feed commit hook).
+#
+# LruCache is the in-process cache shared by every module (calc results,
+# Monte Carlo simulations, massing GLBs). It is bounded by entry count and
+# approximate bytes and keeps hit/miss/eviction counters for
+# GET /debug/cache-stats. A tag -> keys index makes invalidation cost the
+# number of matching entries; caches holding no tagged entries are skipped.
+#
+# With CALC_CACHE_PERSIST=1, single-project results are also written to the
+# calc_cache table so they survive restarts and are shared between workers.
+# Triggers delete a project's rows when its parameters or parcels change,
+# and rows of other calculation versions are purged at startup.
+
+
+def canonical_hash(payload) -> str:
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _sizeof(value) -> int:
+    """Approximate memory of a cached value (arrays by nbytes, containers summed)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 112
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value) + 49
+    if isinstance(value, dict):
+        return 64 + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+# --- LRU ---
+
+_registry = []
+
+
+class LruCache:
+    def __init__(self, name: str, maxsize: int, maxbytes: int = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self._items = OrderedDict()  # key -> (value, nbytes, tags)
+        self._by_tag = {}  # tag -> {key, ...}, so invalidation only visits matching entries
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        _registry.append(self)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, tags=()):
+        nbytes = _sizeof(value)
+        with self._lock:
+            if self.maxbytes is not None and nbytes > self.maxbytes:
+                return  # larger than the whole cache
+            self._remove(key)
+            tags = frozenset(tags)
+            self._items[key] = (value, nbytes, tags)
+            self.bytes += nbytes
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._items) > self.maxsize or (self.maxbytes is not None and self.bytes > self.maxbytes):
+                self._remove(next(iter(self._items)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        # Caller holds the lock
+        entry = self._items.pop(key, None)
+        if entry is None:
+            return False
+        self.bytes -= entry[1]
+        for tag in entry[2]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+        return True
+
+    def invalidate(self, tags) -> int:
+        """Drop entries tagged with any of `tags`; returns how many."""
+        if not self._by_tag:
+            return 0  # nothing tagged (e.g. json bodies): no lock, no scan
+        with self._lock:
+            stale = set()
+            for tag in tags:
+                stale.update(self._by_tag.get(tag, ()))
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._by_tag.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._items),
+                "maxsize": self.maxsize,
+                "bytes": self.bytes,
+                "maxbytes": self.maxbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def invalidate_projects(project_ids):
+    """Drop every cached entry of these projects (all caches, this process)."""
+    for cache in _registry:
+        cache.invalidate(project_ids)
+
+
+# --- Persistence ---
+
+_persisted = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+_persisted_lock = threading.Lock()
+
+
+def _count(name):
+    with _persisted_lock:
+        _persisted[name] += 1
+
+
+def _cache_ddl():
+    columns = ", ".join(calc_engine.PARAMETER_FIELDS)
+    return [
+        """
+        CREATE TRIGGER IF NOT EXISTS calc_cache_project_ad AFTER DELETE ON projects
+        BEGIN
+            DELETE FROM calc_cache WHERE project_id = OLD.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS calc_cache_project_au AFTER UPDATE OF {columns} ON projects
+        BEGIN
+            DELETE FROM calc_cache WHERE project_id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS calc_cache_parcel_ai AFTER INSERT ON land_parcels
+        BEGIN
+            DELETE FROM calc_cache WHERE project_id = NEW.project_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS calc_cache_parcel_au AFTER UPDATE ON land_parcels
+        BEGIN
+            DELETE FROM calc_cache WHERE project_id IN (OLD.project_id, NEW.project_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS calc_cache_parcel_ad AFTER DELETE ON land_parcels
+        BEGIN
+            DELETE FROM calc_cache WHERE project_id = OLD.project_id;
+        END
+        """,
+    ]
+
+
+def ensure_calc_cache(cursor):
+    """Create the invalidation triggers and purge other versions (idempotent). Takes a sqlite3 cursor."""
+    for statement in _cache_ddl():
+        cursor.execute(statement)
+    cursor.execute(
+        "DELETE FROM calc_cache WHERE calculation_version != ?", (calc_engine.CALCULATION_VERSION,)
+    )
+
+
+def _load(key):
+    try:
+        with read_engine.connect() as conn:
+            outputs = conn.execute(
+                select(models.CalcCacheEntry.outputs).where(
+                    models.CalcCacheEntry.key == key,
+                    models.CalcCacheEntry.calculation_version == calc_engine.CALCULATION_VERSION,
+                )
+            ).scalar()
+    except SQLAlchemyError:
+        _count("errors")
+        return None
+    _count("hits" if outputs is not None else "misses")
+    return outputs
+
+
+def _store(key, project_id, outputs):
+    values = {
+        "key": key,
+        "project_id": project_id,
+        "calculation_version": calc_engine.CALCULATION_VERSION,
+        "outputs": outputs,
+    }
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(models.CalcCacheEntry).values(values).on_conflict_do_nothing())
+        _count("writes")
+    except SQLAlchemyError:
+        _count("errors")  # a cache write never fails the request
+
+
+# --- Calculation results ---
+
+_results = LruCache("calc_engine", config.CALC_CACHE_SIZE, config.CALC_CACHE_MAX_MB * 1024 * 1024)
+
+
+def normalize_parameters(params) -> dict:
+    return {
+        name: calc_engine.parameter_value(params, name) if name in calc_engine.PARAMETER_DEFAULTS
+        else params.get(name)
+        for name in calc_engine.PARAMETER_FIELDS
+    }
+
+
+def parcels_payload(parcels) -> list:
+    arrays = calc_engine.parcel_arrays(parcels)
+    rows = zip(arrays["ids"], arrays["area"].tolist(), arrays["far"].tolist(), arrays["include"].tolist())
+    return sorted(rows, key=lambda row: row[0])
+
+
+def _frozen(outputs):
+    for values in outputs.values():
+        values.flags.writeable = False
+    return outputs
+
+
+def _cached(payload, compute, project_ids):
+    key = canonical_hash({"calc": calc_engine.CALCULATION_VERSION, **payload})
+    outputs = _results.get(key)
+    if outputs is not None:
+        return outputs
+    persist = config.CALC_CACHE_PERSIST and len(project_ids) == 1
+    stored = _load(key) if persist else None
+    if stored is not None:
+        outputs = _frozen({name: np.asarray(values, dtype=float) for name, values in stored.items()})
+    else:
+        outputs = _frozen(compute())
+        if persist:
+            _store(key, project_ids[0], {name: values.tolist() for name, values in outputs.items()})
+    _results.put(key, outputs, tags=project_ids)
+    return outputs
+
+
+def evaluate(parcels, param_sets, project_ids=()):
+    """calc_engine.evaluate through the cache. Returned arrays are read-only."""
+    payload = {
+        "kind": "parcels",
+        "parcels": parcels_payload(parcels),
+        "params": [normalize_parameters(p) for p in param_sets],
+    }
+    return _cached(payload, lambda: calc_engine.evaluate(parcels, param_sets), tuple(project_ids))
+
+
+def evaluate_sites(site_area, base_volume, param_sets, project_ids=()):
+    """calc_engine.evaluate_sites through the cache. Returned arrays are read-only."""
+    payload = {
+        "kind": "sites",
+        "site_area": np.asarray(site_area, dtype=float).tolist(),
+        "base_volume": np.asarray(base_volume, dtype=float).tolist(),
+        "params": [normalize_parameters(p) for p in param_sets],
+    }
+    return _cached(
+        payload, lambda: calc_engine.evaluate_sites(site_area, base_volume, param_sets), tuple(project_ids)
+    )
+
+
+def stats(db=None) -> dict:
+    result = {"caches": [cache.stats() for cache in _registry]}
+    if config.CALC_CACHE_PERSIST:
+        with _persisted_lock:
+            persisted = dict(_persisted)
+        if db is not None:
+            persisted["rows"], persisted["bytes"] = db.execute(
+                select(func.count(), func.coalesce(func.sum(func.length(models.CalcCacheEntry.outputs)), 0))
+            ).one()
+        result["persisted"] = persisted
+    return result
@@ -0,0 +1,312 @@
+import math
+from collections.abc import Mapping
+
+import numpy as np
+
+# Server-side port of the frontend calculation engine
+# (frontend/src/domain/computeScenario.js and calculators/{bonus,massing,
+# basement}.js), vectorized over parameter sets with NumPy.
+#
+# A "parameter set" is a dict keyed by `projects` column names
+# (massing_me_rate, basement_floor_height, bonus_cap, site_config, ...), e.g.
+# a project row merged with a scenario diff. evaluate() takes one parcel list
+# and N parameter sets and computes every output as an array of length N
+# (evaluate_sites does the same for N different sites, e.g. a portfolio):
+#
+#   - site selection: an N x P mask (include_in_site, site_config.selectedParcelIds)
+#     times the per-parcel area / capacity vectors
+#   - bonus: per set in Python (it reads the bonus-detail JSON), cheap
+#   - massing / basement: plain array arithmetic
+#
+# Formulas, defaults and fallbacks follow the JS so both sides agree on the
+# same inputs. CALCULATION_VERSION matches snapshot.calculationVersion there;
+# bump both when the formulas change.
+
+CALCULATION_VERSION = "1.0.0"
+
+# (column, default) as hydrated in useProjectStore.selectProject (`?? default`)
+PARAMETER_DEFAULTS = {
+    "massing_design_coverage": 45.0,
+    "massing_exemption_coef": 1.15,
+    "massing_public_ratio": 33.0,
+    "massing_me_rate": 15.0,
+    "massing_stair_rate": 10.0,
+    "massing_balcony_rate": 5.0,
+    "usage_residential_rate": 60.0,
+    "usage_commercial_rate": 30.0,
+    "usage_agency_rate": 10.0,
+    "basement_legal_parking": 0,
+    "basement_bonus_parking": 0,
+    "basement_excavation_rate": 70.0,
+    "basement_parking_space_area": 40.0,
+    "basement_floor_height": 3.3,
+    "basement_motorcycle_unit_area": 4.0,
+    "basement_legal_motorcycle": 0,
+    "bonus_central": 30.0,
+    "bonus_local": 20.0,
+    "bonus_other": 0.0,
+    "bonus_chloride": 0.0,
+    "bonus_soil_mgmt": 0.0,
+    "bonus_tod": 0.0,
+    "bonus_public_exemption": 7.98,
+    "bonus_cap": 100.0,
+}
+
+# JSON parameters (compared / stored whole)
+JSON_PARAMETERS = (
+    "central_bonus_details",
+    "local_bonus_details",
+    "disaster_bonus_details",
+    "chloride_bonus_details",
+    "tod_reward_bonus_details",
+    "tod_increment_bonus_details",
+    "site_config",
+)
+
+PARAMETER_FIELDS = tuple(PARAMETER_DEFAULTS) + JSON_PARAMETERS
+
+# Bonus items summed under bonus_cap (bonus.js aggregation)
+CAPPED_BONUS_ITEMS = ("bonus_central", "bonus_local", "bonus_other", "bonus_chloride", "bonus_soil_mgmt", "bonus_tod")
+
+
+def safe_num(value) -> float:
+    """Mirrors safeNum() in bonus.js: None/NaN/garbage -> 0, "5,762.4" -> 5762.4."""
+    if value is None or isinstance(value, bool):
+        return float(value or 0)
+    if isinstance(value, (int, float)):
+        return 0.0 if math.isnan(value) else float(value)
+    try:
+        num = float(str(value).strip().replace(",", ""))
+    except ValueError:
+        return 0.0
+    return num if math.isfinite(num) else 0.0
+
+
+def parameter_value(params: dict, name: str):
+    value = params.get(name)
+    return PARAMETER_DEFAULTS[name] if value is None else value
+
+
+# --- Parcels / Site ---
+
+def parcel_arrays(parcels):
+    """Per-parcel vectors from LandParcel rows (or mappings with the same keys)."""
+    def get(p, key):
+        return p.get(key) if isinstance(p, Mapping) else getattr(p, key)
+
+    ids = [get(p, "id") for p in parcels]
+    area = np.array([safe_num(get(p, "area_m2")) for p in parcels], dtype=float)
+    # computeScenario calcCapacity: far_limit when set, else legal_floor_area_rate
+    far = np.array([
+        safe_num(get(p, "far_limit")) if get(p, "far_limit") is not None else safe_num(get(p, "legal_floor_area_rate"))
+        for p in parcels
+    ], dtype=float)
+    include = np.array([get(p, "include_in_site") not in (0, False) for p in parcels], dtype=bool)
+    return {"ids": ids, "area": area, "far": far, "include": include}
+
+
+def site_masks(arrays, site_configs):
+    """N x P: parcel counts toward the site of parameter set n.
+
+    include_in_site !== false AND (selectedParcelIds empty OR id selected).
+    """
+    ids = [str(i) for i in arrays["ids"]]
+    masks = np.empty((len(site_configs), len(ids)), dtype=bool)
+    for n, site in enumerate(site_configs):
+        selected = {str(i) for i in ((site or {}).get("selectedParcelIds") or [])}
+        if selected:
+            masks[n] = arrays["include"] & np.array([i in selected for i in ids], dtype=bool)
+        else:
+            masks[n] = arrays["include"]
+    return masks
+
+
+# --- Bonus (bonus.js) ---
+
+def details_checklist(details):
+    return (details or {}).get("checklist") or {}
+
+
+def disaster_effective_rate(rate: float, details) -> float:
+    checklist = details_checklist(details)
+    urban_renewal = bool(checklist.get("urbanRenewalMode")) or bool(checklist.get("is_plan_approved"))
+    site_area_ok = safe_num(checklist.get("siteAreaM2") or checklist.get("base_area_m2")) >= 1000
+    seismic_path = checklist.get("seismicPath")
+    id_value = safe_num(checklist.get("idValue"))
+    seismic_ok = (
+        (seismic_path == "ID_LT_035" and 0 < id_value < 0.35)
+        or seismic_path == "PRE_630215_USE_PERMIT_EXEMPT"
+        or bool(checklist.get("has_risk_assessment"))
+    )
+    eligible = urban_renewal and site_area_ok and (
+        bool(checklist.get("legalBuildingProof")) or bool(checklist.get("has_risk_assessment")) or seismic_ok
+    )
+    return rate if eligible else 0.0
+
+
+def _chloride_bonus_area(details):
+    """Fixed bonus area (m2) in original_volume mode, else None (rate mode)."""
+    checklist = details_checklist(details)
+    if checklist.get("calculation_mode") == "original_volume":
+        return (safe_num(checklist.get("area_ground")) + safe_num(checklist.get("area_underground"))) * 0.3
+    return None
+
+
+def _chloride_rate(base_volume: float, rate, details) -> float:
+    bonus_area = _chloride_bonus_area(details)
+    if bonus_area is not None:
+        return bonus_area / base_volume * 100 if base_volume > 0 else 0.0
+    return safe_num(rate)
+
+
+# Soil management 80-2: site area threshold and rate ceiling
+SOIL_MIN_SITE_AREA_M2 = 2000.0
+SOIL_MAX_RATE = 30.0
+
+
+def _soil_effective_rate(site_area: float, rate) -> float:
+    return min(safe_num(rate), SOIL_MAX_RATE) if site_area >= SOIL_MIN_SITE_AREA_M2 else 0.0
+
+
+def bonus_items(params: dict, base_volume: float, site_area: float) -> dict:
+    """Effective rate (%) of each capped bonus item for one parameter set.
+
+    TOD uses the manual bonus_tod rate: the D1-D5 worksheet lives only in the
+    frontend session (tod_bonus_details is not persisted).
+    """
+    return {
+        "bonus_central": safe_num(parameter_value(params, "bonus_central")),
+        "bonus_local": safe_num(parameter_value(params, "bonus_local")),
+        "bonus_other": disaster_effective_rate(
+            safe_num(parameter_value(params, "bonus_other")), params.get("disaster_bonus_details")
+        ),
+        "bonus_chloride": _chloride_rate(
+            base_volume, parameter_value(params, "bonus_chloride"), params.get("chloride_bonus_details")
+        ),
+        "bonus_soil_mgmt": _soil_effective_rate(site_area, parameter_value(params, "bonus_soil_mgmt")),
+        "bonus_tod": safe_num(parameter_value(params, "bonus_tod")),
+    }
+
+
+def bonus_cap(params: dict) -> float:
+    return safe_num(parameter_value(params, "bonus_cap")) or 50.0
+
+
+def total_allowed_rate(params: dict, base_volume: float, site_area: float) -> float:
+    """100 + capped bonus + public exemption (%) for one parameter set and site."""
+    effective_sum = sum(bonus_items(params, base_volume, site_area).values())
+    return 100.0 + min(effective_sum, bonus_cap(params)) + safe_num(parameter_value(params, "bonus_public_exemption"))
+
+
+def total_allowed_rates(params: dict, base_volume, site_area):
+    """total_allowed_rate over arrays of candidate sites for one parameter set.
+
+    Only soil (site area threshold) and original-volume chloride (fixed area
+    over base) depend on the site; every other item is a constant.
+    """
+    base_volume = np.asarray(base_volume, dtype=float)
+    site_area = np.asarray(site_area, dtype=float)
+    items = bonus_items(params, 1.0, 0.0)
+    fixed = items["bonus_central"] + items["bonus_local"] + items["bonus_other"] + items["bonus_tod"]
+    soil_rate = min(safe_num(parameter_value(params, "bonus_soil_mgmt")), SOIL_MAX_RATE)
+    soil = np.where(site_area >= SOIL_MIN_SITE_AREA_M2, soil_rate, 0.0)
+    bonus_area = _chloride_bonus_area(params.get("chloride_bonus_details"))
+    if bonus_area is None:
+        chloride = safe_num(parameter_value(params, "bonus_chloride"))
+    else:
+        chloride = _ratio(np.full_like(base_volume, bonus_area * 100.0), base_volume)
+    capped = np.minimum(fixed + soil + chloride, bonus_cap(params))
+    return 100.0 + capped + safe_num(parameter_value(params, "bonus_public_exemption"))
+
+
+# --- Evaluation ---
+
+def _column(param_sets, name):
+    return np.array([safe_num(parameter_value(p, name)) for p in param_sets], dtype=float)
+
+
+def _ratio(numerator, denominator):
+    out = np.zeros_like(numerator, dtype=float)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def evaluate(parcels, param_sets):
+    """Evaluate N parameter sets against one parcel list. Returns {output: array[N]}."""
+    n = len(param_sets)
+    arrays = parcel_arrays(parcels)
+    masks = site_masks(arrays, [p.get("site_config") for p in param_sets])
+    site_area = masks @ arrays["area"] if arrays["ids"] else np.zeros(n)
+    base_volume = masks @ (arrays["area"] * arrays["far"] / 100.0) if arrays["ids"] else np.zeros(n)
+    return evaluate_sites(site_area, base_volume, param_sets)
+
+
+def evaluate_sites(site_area, base_volume, param_sets):
+    """Row i: parameter set i on a site of site_area[i] / base_volume[i] (e.g. one row per project)."""
+    site_area = np.asarray(site_area, dtype=float)
+    base_volume = np.asarray(base_volume, dtype=float)
+
+    # Bonus: capped sum of effective rates, plus public exemption on top
+    allowed_rate = np.array([
+        total_allowed_rate(p, base_volume[i], site_area[i]) for i, p in enumerate(param_sets)
+    ], dtype=float)
+    actual_bonus = allowed_rate - 100.0 - _column(param_sets, "bonus_public_exemption")
+
+    # Massing (massing.js)
+    allowed = base_volume * allowed_rate / 100.0
+    me_area = allowed * _column(param_sets, "massing_me_rate") / 100.0
+    flow = allowed + me_area
+    stair = flow * _column(param_sets, "massing_stair_rate") / 100.0
+    balcony = flow * _column(param_sets, "massing_balcony_rate") / 100.0
+    gfa_no_balcony = allowed + me_area + stair
+    gfa_total = gfa_no_balcony + balcony
+    non_public = 1.0 - _column(param_sets, "massing_public_ratio") / 100.0
+    registered = _ratio(allowed + balcony, non_public)
+    saleable_ratio = _ratio(registered, allowed)
+    single_floor = site_area * _column(param_sets, "massing_design_coverage") / 100.0
+    floors = np.ceil(_ratio(gfa_total, single_floor))
+
+    residential = gfa_no_balcony * _column(param_sets, "usage_residential_rate") / 100.0
+    commercial = gfa_no_balcony * _column(param_sets, "usage_commercial_rate") / 100.0
+    agency = gfa_no_balcony * _column(param_sets, "usage_agency_rate") / 100.0
+
+    # Basement (computeScenario auto parking + basement.js)
+    auto_car = np.ceil(residential / 120.0 + commercial / 100.0 + agency / 100.0)
+    auto_car[auto_car == 0] = 1  # `|| 1`
+    auto_moto = np.ceil(residential / 100.0 + commercial / 200.0 + agency / 140.0)
+    auto_moto[auto_moto == 0] = 1
+    manual_car = _column(param_sets, "basement_legal_parking")
+    manual_moto = _column(param_sets, "basement_legal_motorcycle")
+    legal_car = np.where(manual_car > 0, manual_car, auto_car)
+    legal_moto = np.where(manual_moto > 0, manual_moto, auto_moto)
+
+    basement_floor_area = site_area * _column(param_sets, "basement_excavation_rate") / 100.0
+    total_parking = legal_car + _column(param_sets, "basement_bonus_parking")
+    moto_unit = _column(param_sets, "basement_motorcycle_unit_area")
+    moto_unit[moto_unit == 0] = 4.0  # `|| 4`
+    required_area = total_parking * _column(param_sets, "basement_parking_space_area") + legal_moto * moto_unit
+    basement_floors = np.ceil(_ratio(required_area, basement_floor_area))
+    excavation_depth = basement_floors * _column(param_sets, "basement_floor_height") + 1.5
+
+    return {
+        "site_area_m2": site_area,
+        "base_volume_m2": base_volume,
+        "actual_bonus_rate": actual_bonus,
+        "total_allowed_rate": allowed_rate,
+        "allowed_volume_m2": allowed,
+        "gfa_total_m2": gfa_total,
+        "gfa_no_balcony_m2": gfa_no_balcony,
+        "est_registered_area_m2": registered,
+        "saleable_ratio": saleable_ratio,
+        "est_floors": floors,
+        "parking_total": total_parking,
+        "motorcycle_total": legal_moto,
+        "basement_floors": basement_floors,
+        "basement_depth_m": excavation_depth,
+        "basement_gfa_m2": basement_floor_area * basement_floors,
+        "excavation_volume_m3": basement_floor_area * excavation_depth,
+        # Registered (saleable) area split by the usage mix
+        "saleable_residential_m2": registered * _column(param_sets, "usage_residential_rate") / 100.0,
+        "saleable_commercial_m2": registered * _column(param_sets, "usage_commercial_rate") / 100.0,
+        "saleable_agency_m2": registered * _column(param_sets, "usage_agency_rate") / 100.0,
+    }
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import date, datetime
+
+from sqlalchemy import delete, event, func, insert, inspect, select
+from starlette.concurrency import run_in_threadpool
+
+import config
+import models
+from database import SessionLocal
+from models import ChangeLog
+
+# Change feed for projects and parcels.
+#
+# Every ORM flush that creates, updates or deletes a Project / LandParcel
+# appends compact rows to `change_log` in the same transaction, so an event
+# exists exactly when its change was committed. Readers:
+#   - GET /changes?after=<id>      catch-up / polling
+#   - GET /changes/stream          Server-Sent Events, resumable via
+#                                  Last-Event-ID (or ?last_event_id=)
+#
+# Event ids are the change_log autoincrement ids and double as the version a
+# client has applied. Commits in this process wake streams immediately; the
+# stream also polls every CHANGE_FEED_POLL_S so writes from other worker
+# processes show up too. Only the newest CHANGE_LOG_RETENTION rows are kept;
+# a client resuming from an id older than that gets a `reset` event and
+# should refetch.
+#
+# Modules that keep per-project state (calc_cache) register on_commit
+# listeners; they get the set of project ids each committed session touched.
+
+# Attributes that are derived, binary or bookkeeping and not worth shipping in an event
+_SKIP_FIELDS = {"geom", "min_x", "min_y", "max_x", "max_y", "perimeter_m", "change_seq"}
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return None
+    return value
+
+
+def _entity_of(obj):
+    if isinstance(obj, models.Project):
+        return "project", obj.id, obj.id
+    if isinstance(obj, models.LandParcel):
+        return "parcel", obj.id, obj.project_id
+    return None
+
+
+def _changed_values(obj, all_columns: bool):
+    state = inspect(obj)
+    values = {}
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        history = state.attrs[key].history
+        if key in _SKIP_FIELDS:
+            if key == "geom" and history.has_changes():
+                values["geometry"] = None  # changed; fetch via /parcels/within
+            continue
+        if all_columns:
+            values[key] = _json_value(getattr(obj, key))
+        elif history.has_changes():
+            values[key] = _json_value(history.added[0] if history.added else None)
+    return values
+
+
+def note_change(session, entity: str, entity_id: int, project_id: int, changes: dict, op: str = "update"):
+    """Record a change made outside the ORM unit of work (Core UPDATE etc.)."""
+    note_changes(session, [{
+        "entity": entity, "entity_id": entity_id, "project_id": project_id,
+        "op": op, "changes": changes,
+    }])
+
+
+def _event_rows(events):
+    return [
+        {**change, "changes": {k: _json_value(v) for k, v in change["changes"].items()}}
+        for change in events
+    ]
+
+
+def write_changes(conn, events):
+    """note_changes for Core code on a plain connection (no session hooks).
+    The caller calls broker.notify() once its transaction has committed.
+    """
+    if events:
+        conn.execute(insert(ChangeLog), _event_rows(events))
+
+
+def note_changes(session, events):
+    """Bulk note_change: one executemany INSERT for a list of event dicts."""
+    if not events:
+        return
+    session.execute(insert(ChangeLog), _event_rows(events))
+    session.info["change_feed_dirty"] = True
+    session.info.setdefault("change_feed_projects", set()).update(change["project_id"] for change in events)
+
+
+def _after_flush(session, flush_context):
+    rows = []
+    for op, objects in (("create", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            entity = _entity_of(obj)
+            if entity is None:
+                continue
+            if op == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+            name, entity_id, project_id = entity
+            changes = {} if op == "delete" else _changed_values(obj, all_columns=(op == "create"))
+            if op == "update" and not changes:
+                continue
+            rows.append({
+                "entity": name, "entity_id": entity_id, "project_id": project_id,
+                "op": op, "changes": changes,
+            })
+    if rows:
+        session.connection().execute(insert(ChangeLog), rows)
+        session.info["change_feed_dirty"] = True
+        session.info.setdefault("change_feed_projects", set()).update(row["project_id"] for row in rows)
+
+
+_commit_listeners = []
+
+
+def on_commit(listener):
+    """Call listener(project_ids) after each commit that changed projects/parcels."""
+    _commit_listeners.append(listener)
+
+
+def _after_commit(session):
+    projects = session.info.pop("change_feed_projects", None)
+    if session.info.pop("change_feed_dirty", False):
+        broker.notify()
+    if projects:
+        for listener in _commit_listeners:
+            listener(projects)
+
+
+def _after_rollback(session):
+    session.info.pop("change_feed_dirty", None)
+    session.info.pop("change_feed_projects", None)
+
+
+def install(session_factory):
+    if not event.contains(session_factory, "after_flush", _after_flush):
+        event.listen(session_factory, "after_flush", _after_flush)
+        event.listen(session_factory, "after_commit", _after_commit)
+        event.listen(session_factory, "after_soft_rollback", lambda session, previous: _after_rollback(session))
+
+
+# --- Reading ---
+
+def event_to_dict(row):
+    return {
+        "id": row.id,
+        "entity": row.entity,
+        "entity_id": row.entity_id,
+        "project_id": row.project_id,
+        "op": row.op,
+        "changes": row.changes or {},
+        "version": row.id,
+    }
+
+
+def read_changes(db, after: int, limit: int = 500):
+    rows = db.execute(
+        select(ChangeLog).where(ChangeLog.id > after).order_by(ChangeLog.id).limit(limit)
+    ).scalars().all()
+    return [event_to_dict(r) for r in rows]
+
+
+def feed_bounds(db):
+    """(oldest retained id, newest id); (0, 0) for an empty log."""
+    low, high = db.execute(select(func.min(ChangeLog.id), func.max(ChangeLog.id))).one()
+    return (low or 0), (high or 0)
+
+
+def prune(db, retention: int = None):
+    retention = retention or config.CHANGE_LOG_RETENTION
+    _, high = feed_bounds(db)
+    if high > retention:
+        db.execute(delete(ChangeLog).where(ChangeLog.id <= high - retention))
+        db.commit()
+
+
+# --- Wake-ups for open streams ---
+
+class _Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = set()  # (loop, asyncio.Event)
+        self._commits = 0
+
+    def notify(self):
+        with self._lock:
+            waiters = list(self._waiters)
+            self._commits += 1
+            commits = self._commits
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(waiter.set)
+        # Prune now and then, off the request's critical path
+        if commits % 500 == 0:
+            threading.Thread(target=_prune_in_background, daemon=True).start()
+
+    async def wait(self, timeout: float):
+        waiter = asyncio.Event()
+        entry = (asyncio.get_running_loop(), waiter)
+        with self._lock:
+            self._waiters.add(entry)
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(entry)
+
+
+broker = _Broker()
+
+
+def _prune_in_background():
+    db = SessionLocal()
+    try:
+        prune(db)
+    finally:
+        db.close()
+
+
+def format_sse(event_name: str, data: dict, event_id: int = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_name}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_changes(request, session_factory, last_event_id: int = None, project_id: int = None):
+    """Async generator of SSE frames for StreamingResponse."""
+    def with_session(fn, *args):
+        db = session_factory()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+    low, high = await run_in_threadpool(with_session, feed_bounds)
+    if last_event_id is None:
+        cursor = high
+    elif low and last_event_id < low - 1:
+        # Client is further behind than the retained log
+        yield format_sse("reset", {"reason": "history_pruned", "resume_from": high}, high)
+        cursor = high
+    else:
+        cursor = last_event_id
+
+    yield "retry: 3000\n\n"
+    last_sent = time.monotonic()
+    while not await request.is_disconnected():
+        events = await run_in_threadpool(with_session, read_changes, cursor)
+        for change in events:
+            cursor = change["id"]
+            if project_id is not None and change["project_id"] != project_id:
+                continue
+            yield format_sse("change", change, change["id"])
+            last_sent = time.monotonic()
+        if not events:
+            await broker.wait(config.CHANGE_FEED_POLL_S)
+            if time.monotonic() - last_sent >= 15:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
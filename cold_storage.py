@@ -0,0 +1,428 @@
+import base64
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.orm import defer
+
+import change_feed
+import models
+import project_summary
+import sync
+from database import SessionLocal
+
+# Cold storage for archived projects.
+#
+# A project archived (and not opened) for COLD_STORAGE_AFTER_DAYS is moved out
+# of the hot tables: its project row, parcels, adjacency edges and scenarios
+# become one zlib-compressed JSON payload in `cold_projects`, next to the few
+# columns list views sort and filter on. `cold_parcels` maps parcel ids to
+# their project. The hot tables, their indexes and the page cache then only
+# hold active work.
+#
+#   freeze   rows -> payload, hot rows deleted (the usual delete triggers
+#            drop summary/adjacency/R-tree rows; the tombstones they write
+#            are removed again, so delta sync clients keep the project)
+#   thaw     payload -> rows with their original ids, summary rebuilt,
+#            change_seq bumped so delta sync sees them again
+#
+# Thawing is transparent: a request that misses a project (or parcel) that is
+# in cold storage restores it and is retried (see main.project_not_found).
+# GET /projects/?include_archived=true merges cold rows into the page
+# without restoring them (list_page).
+#
+# projects and land_parcels are AUTOINCREMENT tables, so the id of a frozen
+# project or parcel is never handed to a new row (ensure_autoincrement_ids
+# rebuilds older databases). Other ids can be reused meanwhile; a restored
+# row whose id was taken gets a new one.
+
+_projects = models.Project.__table__
+_parcels = models.LandParcel.__table__
+_adjacency = models.ParcelAdjacency.__table__
+_scenarios = models.Scenario.__table__
+_cold = models.ColdProject.__table__
+_cold_parcels = models.ColdParcel.__table__
+_tombstones = models.Tombstone.__table__
+
+logger = logging.getLogger("cold_storage")
+
+COMPRESSION_LEVEL = 6
+SWEEP_BATCH = 200
+
+
+class ProjectThawed(Exception):
+    """Raised after a request's project was restored; the request should be retried."""
+
+    def __init__(self, project_id: int, restored_id: int):
+        super().__init__(project_id, restored_id)
+        self.project_id = project_id
+        self.restored_id = restored_id
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# --- Payload ---
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"$b": base64.b64encode(bytes(value)).decode("ascii")}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and len(value) == 1:
+        if "$dt" in value:
+            return datetime.fromisoformat(value["$dt"])
+        if "$b" in value:
+            return base64.b64decode(value["$b"])
+    return value
+
+
+def _rows(db, table, condition):
+    return [
+        {key: _encode(value) for key, value in row.items()}
+        for row in db.execute(select(table).where(condition)).mappings()
+    ]
+
+
+def _restore_row(table, row):
+    """Payload row -> insert values for columns the table still has."""
+    columns = table.c
+    return {key: _decode(value) for key, value in row.items() if key in columns}
+
+
+def pack(payload: dict):
+    """(compressed bytes, uncompressed size) of a payload."""
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return zlib.compress(raw, COMPRESSION_LEVEL), len(raw)
+
+
+def unpack(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data))
+
+
+# --- Schema ---
+
+# Hot table -> the cold table holding ids that left it
+_AUTOINCREMENT_TABLES = {"projects": "cold_projects", "land_parcels": "cold_parcels"}
+
+
+def _column_sql(column):
+    _, name, type_, notnull, default, pk = column
+    if pk:
+        return f"{name} INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT"
+    sql = f"{name} {type_}".rstrip()
+    if notnull:
+        sql += " NOT NULL"
+    if default is not None:
+        sql += f" DEFAULT {default}"
+    return sql
+
+
+def ensure_autoincrement_ids(cursor):
+    """Rebuild projects / land_parcels as AUTOINCREMENT tables, their sequence above
+    every hot and cold id (idempotent). Takes a sqlite3 cursor.
+    """
+    for table, cold_table in _AUTOINCREMENT_TABLES.items():
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        row = cursor.fetchone()
+        if row is None or "AUTOINCREMENT" in row[0].upper():
+            continue
+        logger.info("Rebuilding %s with AUTOINCREMENT ids", table)
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = cursor.fetchall()
+        cursor.execute(f"PRAGMA foreign_key_list({table})")
+        foreign_keys = [
+            f"FOREIGN KEY({fk[3]}) REFERENCES {fk[2]} ({fk[4]})" for fk in cursor.fetchall()
+        ]
+        # Indexes and triggers go with the old table; recreate them verbatim
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL",
+            (table,),
+        )
+        dependents = [sql for (sql,) in cursor.fetchall()]
+
+        names = ", ".join(column[1] for column in columns)
+        definitions = ",\n\t".join([_column_sql(column) for column in columns] + foreign_keys)
+        # Keep references in other tables' triggers as they are during the swap
+        cursor.execute("PRAGMA legacy_alter_table = ON")
+        cursor.execute(f"CREATE TABLE {table}_rebuild (\n\t{definitions}\n)")
+        cursor.execute(f"INSERT INTO {table}_rebuild ({names}) SELECT {names} FROM {table}")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_rebuild RENAME TO {table}")
+        cursor.execute("PRAGMA legacy_alter_table = OFF")
+        for sql in dependents:
+            cursor.execute(sql)
+
+        cursor.execute(
+            f"SELECT max(coalesce((SELECT max(id) FROM {table}), 0), coalesce((SELECT max(id) FROM {cold_table}), 0))"
+        )
+        top = cursor.fetchone()[0]
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+        cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, top))
+
+
+# --- Freeze / thaw (callers commit) ---
+
+def freeze(db, project_id: int) -> bool:
+    """Move one project into cold storage. Returns False if it is not in the hot tables."""
+    project = _rows(db, _projects, _projects.c.id == project_id)
+    if not project:
+        return False
+    parcels = _rows(db, _parcels, _parcels.c.project_id == project_id)
+    payload = {
+        "project": project[0],
+        "parcels": parcels,
+        "adjacency": _rows(db, _adjacency, _adjacency.c.project_id == project_id),
+        "scenarios": _rows(db, _scenarios, _scenarios.c.project_id == project_id),
+    }
+    data, raw_bytes = pack(payload)
+    summary = db.execute(
+        select(models.ProjectSummary.announced_value_total).where(models.ProjectSummary.project_id == project_id)
+    ).scalar()
+
+    row = project[0]
+    db.execute(insert(_cold).values(
+        id=project_id,
+        name=row["name"],
+        is_pinned=row["is_pinned"],
+        archived_at=_decode(row["archived_at"]),
+        last_opened_at=_decode(row["last_opened_at"]),
+        updated_at=_decode(row["updated_at"]),
+        created_at=_decode(row["created_at"]),
+        total_area_m2=row["total_area_m2"],
+        announced_value_total=summary or 0.0,
+        parcel_count=len(parcels),
+        raw_bytes=raw_bytes,
+        payload=data,
+        frozen_at=_utcnow(),
+    ))
+    if parcels:
+        db.execute(insert(_cold_parcels), [{"id": p["id"], "project_id": project_id} for p in parcels])
+
+    # The delete triggers tombstone every row with a fresh seq; a frozen
+    # project was not deleted, so drop those again.
+    seq = db.execute(select(sync.current_seq)).scalar() or 0
+    db.execute(delete(_scenarios).where(_scenarios.c.project_id == project_id))
+    db.execute(delete(_parcels).where(_parcels.c.project_id == project_id))
+    db.execute(delete(_projects).where(_projects.c.id == project_id))
+    db.execute(delete(_tombstones).where(_tombstones.c.project_id == project_id, _tombstones.c.change_seq > seq))
+    change_feed.note_change(db, "project", project_id, project_id, {"cold": True})
+    return True
+
+
+def _free_id(db, table, wanted):
+    taken = db.execute(select(table.c.id).where(table.c.id == wanted)).scalar()
+    return wanted if taken is None else None
+
+
+def thaw(db, project_id: int):
+    """Restore one project from cold storage. Returns its id (new if the old one was
+    reused meanwhile) or None if it is not in cold storage.
+    """
+    data = db.execute(select(_cold.c.payload).where(_cold.c.id == project_id)).scalar()
+    if data is None:
+        return None
+    payload = unpack(data)
+    seq = sync.next_seq(db.connection())
+    now = _utcnow()
+
+    values = _restore_row(_projects, payload["project"])
+    values.update(id=_free_id(db, _projects, project_id), change_seq=seq, last_opened_at=now)
+    if values["id"] is None:
+        values.pop("id")
+    new_id = db.execute(insert(_projects).values(values).returning(_projects.c.id)).scalar_one()
+
+    parcel_ids = {}
+    for parcel in payload["parcels"]:
+        values = _restore_row(_parcels, parcel)
+        values.update(project_id=new_id, change_seq=seq)
+        if _free_id(db, _parcels, parcel["id"]) is None:
+            values.pop("id")
+        parcel_ids[parcel["id"]] = db.execute(
+            insert(_parcels).values(values).returning(_parcels.c.id)
+        ).scalar_one()
+
+    edges = [
+        {**_restore_row(_adjacency, edge), "project_id": new_id,
+         "parcel_a": parcel_ids[edge["parcel_a"]], "parcel_b": parcel_ids[edge["parcel_b"]]}
+        for edge in payload["adjacency"]
+        if edge["parcel_a"] in parcel_ids and edge["parcel_b"] in parcel_ids
+    ]
+    if edges:
+        db.execute(insert(_adjacency), edges)
+    for scenario in payload["scenarios"]:
+        values = {**_restore_row(_scenarios, scenario), "project_id": new_id}
+        if _free_id(db, _scenarios, scenario["id"]) is None:
+            values.pop("id")
+        db.execute(insert(_scenarios).values(values))
+
+    project_summary.refresh(db, new_id)
+    db.execute(delete(_cold_parcels).where(_cold_parcels.c.project_id == project_id))
+    db.execute(delete(_cold).where(_cold.c.id == project_id))
+    change_feed.note_change(db, "project", new_id, new_id, {"cold": False})
+    return new_id
+
+
+def thaw_committed(project_id: int = None, parcel_id: int = None):
+    """thaw() in its own write session, by project or parcel id. Returns the restored id or None."""
+    db = SessionLocal()
+    try:
+        if parcel_id is not None:
+            project_id = db.execute(
+                select(_cold_parcels.c.project_id).where(_cold_parcels.c.id == parcel_id)
+            ).scalar()
+            if project_id is None:
+                return None
+        restored = thaw(db, project_id)
+        if restored is not None:
+            db.commit()
+        return restored
+    finally:
+        db.close()
+
+
+def sweep(db, after_days: int, limit: int = SWEEP_BATCH):
+    """Freeze up to `limit` projects archived and unopened for `after_days`. Returns their ids."""
+    cutoff = _utcnow() - timedelta(days=after_days)
+    ids = db.execute(
+        select(_projects.c.id)
+        .where(
+            _projects.c.archived_at != None,
+            _projects.c.archived_at <= cutoff,
+            or_(_projects.c.last_opened_at == None, _projects.c.last_opened_at <= cutoff),
+        )
+        .order_by(_projects.c.archived_at)
+        .limit(limit)
+    ).scalars().all()
+    return [project_id for project_id in ids if freeze(db, project_id)]
+
+
+def sweep_all(after_days: int):
+    """sweep() in batches, committing each. Returns the number of frozen projects."""
+    total = 0
+    while True:
+        db = SessionLocal()
+        try:
+            frozen = sweep(db, after_days)
+            db.commit()
+        finally:
+            db.close()
+        total += len(frozen)
+        if len(frozen) < SWEEP_BATCH:
+            return total
+
+
+# --- Reading without restoring ---
+
+def _parcel_summary(parcels):
+    included = [p for p in parcels if p.get("include_in_site") in (1, True)]
+    by_zoning = {}
+    for p in parcels:
+        zone = p.get("zoning_type") or "unknown"
+        by_zoning[zone] = by_zoning.get(zone, 0.0) + (p.get("area_m2") or 0.0)
+    return {
+        "count": len(parcels),
+        "included_count": len(included),
+        "total_area_m2": sum(p.get("area_m2") or 0.0 for p in parcels),
+        "included_area_m2": sum(p.get("area_m2") or 0.0 for p in included),
+        "area_by_zoning": by_zoning,
+    }
+
+
+def as_project(payload: dict, parcels: str = "full") -> dict:
+    """A schemas.Project-shaped dict from a cold payload (`parcels` as GET /projects/)."""
+    project = {key: _decode(value) for key, value in payload["project"].items()}
+    rows = [{key: _decode(value) for key, value in p.items() if key != "geom"} for p in payload["parcels"]]
+    project["total_area_ping"] = (project.get("total_area_m2") or 0.0) * 0.3025
+    project["land_parcels"] = rows if parcels == "full" else []
+    if parcels == "summary":
+        project["parcel_summary"] = _parcel_summary(rows)
+    return project
+
+
+def _timestamp(value):
+    return value or datetime.min
+
+
+# Python twins of read_projects' ORDER BY clauses (SQLite sorts NULL lowest)
+_SORT_KEYS = {
+    "recent_updated": (lambda p: (_timestamp(p.updated_at or p.created_at), _timestamp(p.created_at)), True),
+    "recent_opened": (lambda p: (_timestamp(p.last_opened_at), _timestamp(p.updated_at or p.created_at)), True),
+    "name_asc": (lambda p: (p.name is not None, p.name or ""), False),
+    "created_desc": (lambda p: _timestamp(p.created_at), True),
+    "value_desc": (lambda p: (p.announced_value_total or 0.0, p.id), True),
+}
+_SORT_COLUMNS = {
+    "recent_updated": [func.coalesce(_cold.c.updated_at, _cold.c.created_at).desc(), _cold.c.created_at.desc()],
+    "recent_opened": [_cold.c.last_opened_at.desc(), func.coalesce(_cold.c.updated_at, _cold.c.created_at).desc()],
+    "name_asc": [_cold.c.name.asc()],
+    "created_desc": [_cold.c.created_at.desc()],
+    "value_desc": [_cold.c.announced_value_total.desc(), _cold.c.id.desc()],
+}
+
+
+class _Hot:
+    # Sort view of a hot ORM project (value_desc reads the joined summary)
+    def __init__(self, project):
+        self.project = project
+        self.id = project.id
+        self.name = project.name
+        self.created_at = project.created_at
+        self.updated_at = project.updated_at
+        self.last_opened_at = project.last_opened_at
+        self.announced_value_total = project.summary.announced_value_total if project.summary else 0.0
+
+
+def list_page(db, hot_projects, search, sort, skip, limit, parcels="full"):
+    """Merge the first skip+limit hot projects (already sorted) with cold ones; return the page.
+
+    Hot entries are the ORM objects, cold entries schemas.Project-shaped dicts.
+    """
+    query = select(models.ColdProject).options(defer(models.ColdProject.payload))
+    if search:
+        query = query.where(models.ColdProject.name.ilike(f"%{search}%"))
+    query = query.order_by(*_SORT_COLUMNS.get(sort, [])).limit(skip + limit)
+    cold = db.execute(query).scalars().all()
+    if not cold:
+        return hot_projects[skip:skip + limit]
+
+    merged = [_Hot(p) for p in hot_projects] + list(cold)
+    if sort in _SORT_KEYS:
+        key, reverse = _SORT_KEYS[sort]
+        merged.sort(key=key, reverse=reverse)  # stable: ties keep hot-before-cold
+    page = merged[skip:skip + limit]
+
+    cold_ids = [entry.id for entry in page if not isinstance(entry, _Hot)]
+    payloads = dict(db.execute(select(_cold.c.id, _cold.c.payload).where(_cold.c.id.in_(cold_ids))).all())
+    return [
+        entry.project if isinstance(entry, _Hot) else as_project(unpack(payloads[entry.id]), parcels)
+        for entry in page
+    ]
+
+
+def stats(db) -> dict:
+    hot = db.execute(
+        select(func.count(), func.count(_projects.c.archived_at)).select_from(_projects)
+    ).one()
+    cold = db.execute(
+        select(
+            func.count(), func.coalesce(func.sum(_cold.c.parcel_count), 0),
+            func.coalesce(func.sum(_cold.c.raw_bytes), 0), func.coalesce(func.sum(func.length(_cold.c.payload)), 0),
+        )
+    ).one()
+    return {
+        "hot_projects": hot[0],
+        "hot_archived_projects": hot[1],
+        "hot_parcels": db.execute(select(func.count()).select_from(_parcels)).scalar(),
+        "cold_projects": cold[0],
+        "cold_parcels": cold[1],
+        "cold_raw_bytes": cold[2],
+        "cold_stored_bytes": cold[3],
+    }
@@ -0,0 +1,119 @@
+import time
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import noload
+
+import calc_cache
+import calc_engine
+import feasibility
+import models
+import scenarios
+
+# Portfolio comparison matrix: many projects and scenarios side by side.
+#
+# Every column (a project's baseline or one of its scenarios) is evaluated
+# exactly once, all in one calc_engine.evaluate_sites pass, so they share a
+# calculation version by construction (compareResults refuses pairs whose
+# versions differ). From the columnar metric table the rest is array
+# arithmetic:
+#
+#   deltas[m][i][j]  metrics[m][j] - metrics[m][i]  (j against i as baseline,
+#                    as compareResults(baseline, current))
+#   ranks[m][i]      1 = largest value; ties share the better rank
+#
+# Three queries regardless of size: projects, scenarios, parcels.
+
+# calc_engine output (or "land_value") -> metric name
+METRICS = {
+    "gfa_total_m2": "gfa_total_m2",
+    "allowed_volume_m2": "allowed_volume_m2",
+    "est_floors": "floors",
+    "basement_floors": "basement_floors",
+    "saleable_ratio": "saleable_ratio",
+    "land_value": "land_value",
+}
+
+
+def rank_descending(values):
+    """Competition ranks (1, 2, 2, 4) with the largest value first."""
+    ordered = np.sort(-values)
+    return np.searchsorted(ordered, -values, side="left") + 1
+
+
+def _columns(db, request):
+    scenario_ids = request.scenario_ids or []
+    rows = []
+    if scenario_ids:
+        rows = db.execute(
+            select(models.Scenario.id, models.Scenario.project_id, models.Scenario.name, models.Scenario.diff)
+            .where(models.Scenario.id.in_(scenario_ids))
+        ).all()
+        missing = sorted(set(scenario_ids) - {row.id for row in rows})
+        if missing:
+            raise ValueError(f"unknown scenario ids: {missing}")
+        by_id = {row.id: row for row in rows}
+        rows = [by_id[scenario_id] for scenario_id in dict.fromkeys(scenario_ids)]
+
+    query = db.query(models.Project).options(noload(models.Project.land_parcels))
+    if request.project_ids is not None:
+        project_ids = list(dict.fromkeys(request.project_ids))
+        query = query.filter(models.Project.id.in_(project_ids + [row.project_id for row in rows]))
+    elif scenario_ids:
+        project_ids = []
+        query = query.filter(models.Project.id.in_({row.project_id for row in rows}))
+    else:
+        project_ids = None
+        query = query.filter(models.Project.archived_at == None)
+    projects = {p.id: p for p in query.order_by(models.Project.id).all()}
+    if project_ids is None:
+        project_ids = list(projects)
+    missing = sorted(set(project_ids) - set(projects))
+    if missing:
+        raise ValueError(f"unknown project ids: {missing}")
+
+    columns, param_sets = [], []
+    baselines = {pid: scenarios.project_parameters(project) for pid, project in projects.items()}
+    for pid in project_ids:
+        project = projects[pid]
+        columns.append({"kind": "project", "id": pid, "project_id": pid, "name": project.name})
+        param_sets.append(baselines[pid])
+    for row in rows:
+        columns.append({"kind": "scenario", "id": row.id, "project_id": row.project_id, "name": row.name})
+        param_sets.append(scenarios.apply_diff(baselines[row.project_id], row.diff))
+    return columns, param_sets
+
+
+def compare(db, request):
+    """Columnar comparison per schemas.ComparisonRequest."""
+    started = time.perf_counter()
+    wanted = request.metrics or list(METRICS.values())
+    unknown = sorted(set(wanted) - set(METRICS.values()))
+    if unknown:
+        raise ValueError(f"unknown metrics: {unknown}")
+    columns, param_sets = _columns(db, request)
+    site_area, base_volume, land_value = feasibility.sites(
+        db, [(column["project_id"], params.get("site_config")) for column, params in zip(columns, param_sets)]
+    )
+    outputs = dict(calc_cache.evaluate_sites(
+        site_area, base_volume, param_sets, project_ids=sorted({c["project_id"] for c in columns})
+    ))
+    outputs["land_value"] = land_value
+
+    metrics, ranks, deltas = {}, {}, {}
+    for output, metric in METRICS.items():
+        if metric not in wanted:
+            continue
+        values = np.round(np.asarray(outputs[output], dtype=float), 4)
+        metrics[metric] = values.tolist()
+        ranks[metric] = rank_descending(values).tolist()
+        if request.pairwise:
+            deltas[metric] = (np.round(values[None, :] - values[:, None], 4) + 0.0).tolist()  # no -0.0
+    return {
+        "calculation_version": calc_engine.CALCULATION_VERSION,
+        "columns": columns,
+        "metrics": metrics,
+        "ranks": ranks,
+        "deltas": deltas,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1),
+    }
@@ -0,0 +1,99 @@
+import os
+
+# Runtime settings, read once from the environment at import time.
+# Everything defaults to the existing dev behaviour; override via env vars.
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# --- Database ---
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./sql_app.db")
+# "dev" (single default engine) or "production" (WAL, split read/write pools; see database.py)
+DB_MODE = os.environ.get("DB_MODE", "dev").strip().lower()
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_SYNCHRONOUS = os.environ.get("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE_KB = int(os.environ.get("DB_CACHE_SIZE_KB", "65536"))
+DB_MMAP_SIZE_MB = int(os.environ.get("DB_MMAP_SIZE_MB", "256"))
+DB_READ_POOL_SIZE = int(os.environ.get("DB_READ_POOL_SIZE", "8"))
+DB_READ_POOL_OVERFLOW = int(os.environ.get("DB_READ_POOL_OVERFLOW", "8"))
+# Write connections per process; 1 = writes in a process queue behind each other.
+DB_WRITE_POOL_SIZE = int(os.environ.get("DB_WRITE_POOL_SIZE", "1"))
+# How long a write request may wait in that queue before failing.
+DB_WRITE_QUEUE_TIMEOUT_S = float(os.environ.get("DB_WRITE_QUEUE_TIMEOUT_S", "30"))
+
+# --- Logging ---
+# Records go through a bounded queue to a background writer thread (see structured_log.py).
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+# Per-logger overrides, e.g. "main=DEBUG,query_log=WARNING".
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+# "text" or "json" (one object per line).
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").strip().lower()
+# Fraction of DEBUG records kept per call site (1 = all, 0 = none).
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+# Records waiting for the writer; beyond this they are dropped, never blocking a request.
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+# --- Request Profiling ---
+# Opt-in only: when disabled the profiling middleware is not installed at all.
+PROFILING_ENABLED = _env_bool("PROFILING_ENABLED")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "./profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "1"))
+
+# --- SQL Instrumentation ---
+# Slow-query log (with EXPLAIN QUERY PLAN) and per-request N+1 detection.
+# Opt-in like profiling: when disabled no cursor events or middleware are installed.
+QUERY_LOG_ENABLED = _env_bool("QUERY_LOG_ENABLED")
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+# Same statement shape this many times in one request => reported as N+1.
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", "5"))
+# Test mode: answer 500 when a route exceeds its registered query budget.
+QUERY_BUDGET_STRICT = _env_bool("QUERY_BUDGET_STRICT")
+
+# --- Massing Geometry ---
+# Number of generated GLB massings kept in memory (a few KB each).
+MASSING_CACHE_SIZE = int(os.environ.get("MASSING_CACHE_SIZE", "256"))
+
+# --- Change Feed ---
+# Newest change_log rows kept for resume; older clients get a `reset` event.
+CHANGE_LOG_RETENTION = int(os.environ.get("CHANGE_LOG_RETENTION", "10000"))
+# How often an idle SSE stream re-checks the log (picks up other workers' writes).
+CHANGE_FEED_POLL_S = float(os.environ.get("CHANGE_FEED_POLL_S", "1.0"))
+
+# --- last_opened_at Touches ---
+# How often buffered POST /projects/{id}/touch writes are flushed to the DB.
+TOUCH_FLUSH_INTERVAL_S = float(os.environ.get("TOUCH_FLUSH_INTERVAL_S", "5"))
+
+# --- Calculation Cache ---
+# In-memory calc_engine results (entries and approximate MB, whichever is hit first).
+CALC_CACHE_SIZE = int(os.environ.get("CALC_CACHE_SIZE", "512"))
+CALC_CACHE_MAX_MB = int(os.environ.get("CALC_CACHE_MAX_MB", "64"))
+# Also keep single-project results in the calc_cache table (shared by workers, survives restarts).
+CALC_CACHE_PERSIST = _env_bool("CALC_CACHE_PERSIST")
+
+# --- Cold Storage ---
+# Projects archived (and not opened) for this many days move to cold storage at startup.
+# -1 (default) disables the startup sweep; run it with `landtool freeze` or POST /cold-storage/sweep.
+COLD_STORAGE_AFTER_DAYS = int(os.environ.get("COLD_STORAGE_AFTER_DAYS", "-1"))
+
+# --- NLSC Land Lookup ---
+# Upstream timeout per request (GET /proxy/land-info, landtool).
+NLSC_TIMEOUT_S = float(os.environ.get("NLSC_TIMEOUT_S", "15"))
+# How long a district's section list is reused before it is fetched again.
+NLSC_SECTION_TTL_DAYS = float(os.environ.get("NLSC_SECTION_TTL_DAYS", "30"))
+
+# --- Site Assembly Optimizer ---
+# Worker processes for the branch-and-bound searches (0 or 1 = run in-process).
+OPTIMIZER_WORKERS = int(os.environ.get("OPTIMIZER_WORKERS", str(os.cpu_count() or 1)))
+# Smaller candidate sets are searched in-process; the pool only pays off above this.
+OPTIMIZER_PARALLEL_MIN_PARCELS = int(os.environ.get("OPTIMIZER_PARALLEL_MIN_PARCELS", "20"))
+# Node limit per search; a search that hits it returns its best so far (exact=false).
+OPTIMIZER_MAX_NODES = int(os.environ.get("OPTIMIZER_MAX_NODES", "200000"))
+
+# --- Site Assembly Risk Simulation ---
+# Monte Carlo results kept in memory, keyed by parcel state + request.
+SIMULATION_CACHE_SIZE = int(os.environ.get("SIMULATION_CACHE_SIZE", "64"))
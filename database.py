@@ -1,12 +1,89 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
+import config
+
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+# Two modes (DB_MODE):
+#
+#   dev         one default engine, as before. SessionLocal and ReadSessionLocal
+#               are the same thing.
+#   production  for `uvicorn --workers N`:
+#               - WAL journal, so readers never block the writer or each other
+#               - synchronous=NORMAL, larger page cache, mmap, busy_timeout
+#               - write engine: DB_WRITE_POOL_SIZE connections (default 1). Write
+#                 sessions queue for it (up to DB_WRITE_QUEUE_TIMEOUT_S), which
+#                 is the per-process single-writer queue, and open their
+#                 transaction with BEGIN IMMEDIATE so that between processes
+#                 they wait on busy_timeout for the write lock instead of
+#                 failing with "database is locked" on a read->write upgrade
+#               - read engine: pool of DB_READ_POOL_SIZE query_only connections,
+#                 each session reading from one consistent snapshot
+#
+# `engine` / SessionLocal are the write side and stay the default for any code
+# that may write; GET handlers use ReadSessionLocal.
+
+
+def _sqlite_pragmas(read_only: bool):
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={config.DB_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={config.DB_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size=-{config.DB_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={config.DB_MMAP_SIZE_MB * 1024 * 1024}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=1")
+    return pragmas
+
+
+def _configure_sqlite(engine, read_only: bool):
+    pragmas = _sqlite_pragmas(read_only)
+    begin = "BEGIN" if read_only else "BEGIN IMMEDIATE"
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        # Take over transaction control from pysqlite so we choose the BEGIN
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def on_begin(conn):
+        conn.exec_driver_sql(begin)
+
+
+if config.DB_MODE == "production":
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": config.DB_BUSY_TIMEOUT_MS / 1000.0},
+        pool_size=config.DB_WRITE_POOL_SIZE,
+        max_overflow=0,
+        pool_timeout=config.DB_WRITE_QUEUE_TIMEOUT_S,
+    )
+    _configure_sqlite(engine, read_only=False)
+    read_engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": config.DB_BUSY_TIMEOUT_MS / 1000.0},
+        pool_size=config.DB_READ_POOL_SIZE,
+        max_overflow=config.DB_READ_POOL_OVERFLOW,
+    )
+    _configure_sqlite(read_engine, read_only=True)
+else:
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    )
+    read_engine = engine
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+    if read_engine is not engine else SessionLocal
+)
 
 Base = declarative_base()
@@ -0,0 +1,152 @@
+import time
+from itertools import groupby
+
+import numpy as np
+from sqlalchemy import select
+
+import calc_cache
+import calc_engine
+import models
+
+# Residual land value: what a project's land is worth to a developer.
+#
+#   revenue   = saleable area by usage (registered area x usage mix) x unit price
+#               + parking spaces x price per space
+#   hard cost = above-ground GFA x cost/m2 + basement GFA x cost/m2
+#               + excavation volume (basement plate x depth) x cost/m3
+#   soft, finance, sales and profit as rates on hard cost / revenue
+#   RLV       = revenue - all costs
+#
+# Areas come from calc_engine.evaluate_sites, one row per project. The money
+# step is plain array arithmetic over rows = projects x price factors x cost
+# factors, so a whole portfolio and its sensitivity band are one call. The
+# site's announced land value (sum of area x announced_value) is reported
+# next to the RLV for comparison.
+
+_OUTPUTS = (
+    "site_area_m2", "saleable_area_m2", "parking_total",
+    "revenue", "hard_cost", "soft_cost", "finance_cost", "sales_cost", "profit",
+    "residual_land_value", "rlv_per_site_m2", "announced_land_value", "rlv_to_announced",
+)
+
+
+def sites(db, entries):
+    """(site_area, base_volume, announced land value) arrays for [(project_id, site_config), ...].
+
+    One parcel query for all entries; an entry's site is its project's
+    parcels under its site_config (a scenario may select a different site).
+    """
+    ids = sorted({project_id for project_id, _ in entries})
+    rows = db.execute(
+        select(
+            models.LandParcel.project_id, models.LandParcel.id, models.LandParcel.area_m2,
+            models.LandParcel.far_limit, models.LandParcel.legal_floor_area_rate,
+            models.LandParcel.include_in_site, models.LandParcel.announced_value,
+        )
+        .where(models.LandParcel.project_id.in_(ids))
+        .order_by(models.LandParcel.project_id, models.LandParcel.id)
+    ).mappings().all()
+    by_project = {pid: list(group) for pid, group in groupby(rows, key=lambda r: r["project_id"])}
+
+    site_area = np.zeros(len(entries))
+    base_volume = np.zeros(len(entries))
+    land_value = np.zeros(len(entries))
+    for i, (project_id, site_config) in enumerate(entries):
+        parcels = by_project.get(project_id)
+        if not parcels:
+            continue
+        arrays = calc_engine.parcel_arrays(parcels)
+        mask = calc_engine.site_masks(arrays, [site_config])[0]
+        values = np.array([calc_engine.safe_num(p["announced_value"]) for p in parcels]) * arrays["area"]
+        site_area[i] = arrays["area"][mask].sum()
+        base_volume[i] = (arrays["area"] * arrays["far"] / 100.0)[mask].sum()
+        land_value[i] = values[mask].sum()
+    return site_area, base_volume, land_value
+
+
+def project_sites(db, projects):
+    """sites() for the projects' own site_config, one entry per project."""
+    return sites(db, [(p.id, p.site_config) for p in projects])
+
+
+def evaluate(db, projects, options):
+    """Rows of project x price factor x cost factor per schemas.FeasibilityOptions."""
+    started = time.perf_counter()
+    a = options.assumptions
+    site_area, base_volume, land_value = project_sites(db, projects)
+    param_sets = [{name: getattr(p, name) for name in calc_engine.PARAMETER_FIELDS} for p in projects]
+    out = calc_cache.evaluate_sites(site_area, base_volume, param_sets, project_ids=[p.id for p in projects])
+
+    # calc_engine keeps the frontend's `|| 1` parking fallback, which gives a
+    # project with no site one legal space; there is nothing to sell there.
+    parking = np.where(site_area > 0, out["parking_total"], 0.0)
+
+    # Per-project money at factor 1, then broadcast over the band
+    gross = (
+        out["saleable_residential_m2"] * a.price_residential_per_m2
+        + out["saleable_commercial_m2"] * a.price_commercial_per_m2
+        + out["saleable_agency_m2"] * a.price_agency_per_m2
+        + parking * a.price_parking_per_space
+    )
+    hard = (
+        out["gfa_total_m2"] * a.cost_above_ground_per_m2
+        + out["basement_gfa_m2"] * a.cost_basement_per_m2
+        + out["excavation_volume_m3"] * a.cost_excavation_per_m3
+    )
+    price_factors = np.asarray(options.price_factors, dtype=float)
+    cost_factors = np.asarray(options.cost_factors, dtype=float)
+    n, n_price, n_cost = len(projects), len(price_factors), len(cost_factors)
+    band = n_price * n_cost
+
+    def per_row(values):
+        return np.repeat(values, band)
+
+    price = np.tile(np.repeat(price_factors, n_cost), n)
+    cost = np.tile(np.tile(cost_factors, n_price), n)
+    revenue = per_row(gross) * price
+    hard_cost = per_row(hard) * cost
+    soft_cost = hard_cost * a.soft_cost_rate / 100.0
+    finance_cost = (hard_cost + soft_cost) * a.finance_rate / 100.0
+    sales_cost = revenue * a.sales_cost_rate / 100.0
+    profit = revenue * a.profit_rate / 100.0
+    rlv = revenue - hard_cost - soft_cost - finance_cost - sales_cost - profit
+    site = per_row(site_area)
+    announced = per_row(land_value)
+    saleable = per_row(
+        out["saleable_residential_m2"] + out["saleable_commercial_m2"] + out["saleable_agency_m2"]
+    )
+
+    columns = {
+        "site_area_m2": site,
+        "saleable_area_m2": saleable,
+        "parking_total": per_row(parking),
+        "revenue": revenue,
+        "hard_cost": hard_cost,
+        "soft_cost": soft_cost,
+        "finance_cost": finance_cost,
+        "sales_cost": sales_cost,
+        "profit": profit,
+        "residual_land_value": rlv,
+        "rlv_per_site_m2": np.divide(rlv, site, out=np.zeros_like(rlv), where=site > 0),
+        "announced_land_value": announced,
+        "rlv_to_announced": np.divide(rlv, announced, out=np.zeros_like(rlv), where=announced > 0),
+    }
+    columns = {name: np.round(columns[name], 2).tolist() for name in _OUTPUTS}
+    project_ids = np.repeat([p.id for p in projects], band).tolist()
+    names = {p.id: p.name for p in projects}
+    rows = [
+        {
+            "project_id": project_ids[r],
+            "name": names[project_ids[r]],
+            "price_factor": float(price[r]),
+            "cost_factor": float(cost[r]),
+            **{name: columns[name][r] for name in _OUTPUTS},
+        }
+        for r in range(n * band)
+    ]
+    return {
+        "calculation_version": calc_engine.CALCULATION_VERSION,
+        "assumptions": a,
+        "rows": rows,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1),
+    }
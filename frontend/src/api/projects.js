@@ -20,7 +20,37 @@ export const updateProject = async (id, data) => {
     return response.data;
 };
 
+export const touchProject = async (id) => {
+    const response = await apiClient.post(`/projects/${id}/touch`);
+    return response.data;
+};
+
 export const deleteProject = async (id) => {
     const response = await apiClient.delete(`/projects/${id}`);
     return response.data;
 };
+
+export const fetchScenarios = async (projectId) => {
+    const response = await apiClient.get(`/projects/${projectId}/scenarios`);
+    return response.data;
+};
+
+export const createScenario = async (projectId, name, parameters) => {
+    const response = await apiClient.post(`/projects/${projectId}/scenarios`, { name, parameters });
+    return response.data;
+};
+
+export const updateScenario = async (id, data) => {
+    const response = await apiClient.put(`/scenarios/${id}`, data);
+    return response.data;
+};
+
+export const deleteScenario = async (id) => {
+    const response = await apiClient.delete(`/scenarios/${id}`);
+    return response.data;
+};
+
+export const evaluateScenarios = async (projectId) => {
+    const response = await apiClient.get(`/projects/${projectId}/scenarios/evaluate`);
+    return response.data;
+};
@@ -115,11 +115,11 @@ const useProjectStore = create(
 
             markProjectOpened: async (id) => {
                 try {
-                    const now = new Date().toISOString();
-                    await ProjectAPI.updateProject(id, { last_opened_at: now });
+                    // Buffered server-side; does not bump updated_at
+                    const { last_opened_at } = await ProjectAPI.touchProject(id);
                     // No need to blocking wait or full refresh, just update local list
                     set(state => ({
-                        projects: state.projects.map(p => p.id == id ? { ...p, last_opened_at: now } : p)
+                        projects: state.projects.map(p => p.id == id ? { ...p, last_opened_at } : p)
                     }));
                 } catch (e) { console.error(e); }
             },
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import re
+
+from sqlalchemy import String, column, event, func, select, table, text, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+from database import engine
+
+# Content-addressed storage for the projects' JSON documents.
+#
+# The six *_bonus_details columns and site_config hold the SHA-256 of the
+# document's canonical JSON (sorted keys, no whitespace); the document itself
+# is stored once in `json_blobs`:
+#
+#   json_blobs(hash, body, size, refcount)
+#
+# BlobRef is the column type: binding a dict stores its hash, and the blob is
+# written (INSERT OR IGNORE, same connection) just before the statement that
+# binds it, from that statement's own parameters. Selecting the column reads
+# the body through a correlated subquery on json_blobs, so documents load
+# with the row on the query's connection. ORM and Core code keeps reading
+# and writing plain dicts. Legacy inline JSON still loads and is converted by
+# patch_db.
+#
+# Triggers on projects keep refcount equal to the number of columns pointing
+# at a blob and delete it when that reaches zero. patch_db recomputes every
+# refcount (repairing drift left by older versions).
+#
+# Two projects' documents are equal iff their hash columns are equal, so
+# comparisons and cache keys can use hash_column() instead of the documents.
+
+logger = logging.getLogger("json_blobs")
+
+DOCUMENT_COLUMNS = (
+    "central_bonus_details",
+    "local_bonus_details",
+    "disaster_bonus_details",
+    "chloride_bonus_details",
+    "tod_reward_bonus_details",
+    "tod_increment_bonus_details",
+    "site_config",
+)
+
+_HASH = re.compile(r"[0-9a-f]{64}")
+
+
+def canonical(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def content_hash(value) -> str:
+    return hashlib.sha256(canonical(value).encode("utf-8")).hexdigest()
+
+
+def is_hash(value) -> bool:
+    return isinstance(value, str) and _HASH.fullmatch(value) is not None
+
+
+_blobs = table("json_blobs", column("hash"), column("body"))
+
+
+class _Document(TypeDecorator):
+    """What BlobRef columns select: the document's JSON (or the hash if its blob is missing)."""
+
+    impl = String
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if is_hash(value):
+            logger.warning("json_blobs has no document %s", value)
+            return None
+        try:
+            return json.loads(value)  # the document, or inline JSON from before json_blobs
+        except ValueError:
+            return None
+
+
+class BlobRef(TypeDecorator):
+    """A JSON document stored in json_blobs, referenced by content hash."""
+
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or is_hash(value):
+            return value
+        return content_hash(value)
+
+    def column_expression(self, col):
+        # SELECTs read the body with the row: on the query's own connection
+        # and snapshot (uncommitted blobs of this transaction included), no
+        # second lookup. A hash whose blob is missing comes back as is.
+        body = select(_blobs.c.body).where(_blobs.c.hash == col).scalar_subquery()
+        return func.coalesce(body, type_coerce(col, String), type_=_Document())
+
+
+def _statement_blobs(context):
+    """{hash: body} of the dicts bound to BlobRef parameters of one statement."""
+    binds = getattr(getattr(context, "compiled", None), "binds", None)  # None for DDL / driver SQL
+    if not binds:
+        return {}
+    names = [name for name, bind in binds.items() if isinstance(bind.type, BlobRef)]
+    if not names:
+        return {}
+    blobs = {}
+    for params in context.compiled_parameters:
+        for name in names:
+            value = params.get(name)
+            if value is not None and not is_hash(value):
+                body = canonical(value)
+                blobs[hashlib.sha256(body.encode("utf-8")).hexdigest()] = body
+    return blobs
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _write_statement_blobs(conn, cursor, statement, parameters, context, executemany):
+    # Written just before, and only for, the statement that references them,
+    # so they commit or roll back with it.
+    blobs = _statement_blobs(context)
+    if not blobs:
+        return
+    rows = [(digest, body, len(body.encode("utf-8"))) for digest, body in blobs.items()]
+    blob_cursor = cursor.connection.cursor()
+    try:
+        blob_cursor.executemany(
+            "INSERT OR IGNORE INTO json_blobs (hash, body, size, refcount) VALUES (?, ?, ?, 0)", rows
+        )
+    finally:
+        blob_cursor.close()
+
+
+def hash_column(column):
+    """The raw hash behind a BlobRef column, for SQL equality / grouping without loading documents."""
+    return type_coerce(column, String)
+
+
+# --- Triggers / migration ---
+
+def _blob_ddl():
+    increments = "\n".join(
+        f"        UPDATE json_blobs SET refcount = refcount + 1 WHERE hash = NEW.{column};"
+        for column in DOCUMENT_COLUMNS
+    )
+    decrements = "\n".join(
+        f"        UPDATE json_blobs SET refcount = refcount - 1 WHERE hash = OLD.{column};"
+        for column in DOCUMENT_COLUMNS
+    )
+    old_hashes = ", ".join(f"OLD.{column}" for column in DOCUMENT_COLUMNS)
+    statements = [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS json_blobs_projects_ai AFTER INSERT ON projects
+        BEGIN
+{increments}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS json_blobs_projects_ad AFTER DELETE ON projects
+        BEGIN
+{decrements}
+            DELETE FROM json_blobs WHERE refcount <= 0 AND hash IN ({old_hashes});
+        END
+        """,
+    ]
+    for column in DOCUMENT_COLUMNS:
+        statements.append(f"""
+        CREATE TRIGGER IF NOT EXISTS json_blobs_projects_au_{column}
+        AFTER UPDATE OF {column} ON projects WHEN OLD.{column} IS NOT NEW.{column}
+        BEGIN
+            UPDATE json_blobs SET refcount = refcount + 1 WHERE hash = NEW.{column};
+            UPDATE json_blobs SET refcount = refcount - 1 WHERE hash = OLD.{column};
+            DELETE FROM json_blobs WHERE hash = OLD.{column} AND refcount <= 0;
+        END
+        """)
+    return statements
+
+
+def ensure_json_blobs(cursor):
+    """Convert inline documents, recompute refcounts, drop orphans, create triggers (idempotent).
+    Takes a sqlite3 cursor.
+    """
+    for column in DOCUMENT_COLUMNS:
+        cursor.execute(f"SELECT id, {column} FROM projects WHERE {column} IS NOT NULL")
+        updates = []
+        for project_id, value in cursor.fetchall():
+            if is_hash(value):
+                continue
+            try:
+                document = json.loads(value)
+            except (TypeError, ValueError):
+                document = None
+            if document is None:
+                updates.append((None, project_id))
+                continue
+            body = canonical(document)
+            digest = hashlib.sha256(body.encode("utf-8")).hexdigest()
+            cursor.execute(
+                "INSERT OR IGNORE INTO json_blobs (hash, body, size, refcount) VALUES (?, ?, ?, 0)",
+                (digest, body, len(body.encode("utf-8"))),
+            )
+            updates.append((digest, project_id))
+        if updates:
+            logger.info("Moving %d projects.%s documents to json_blobs", len(updates), column)
+            cursor.executemany(f"UPDATE projects SET {column} = ? WHERE id = ?", updates)
+
+    references = " UNION ALL ".join(f"SELECT {column} AS hash FROM projects" for column in DOCUMENT_COLUMNS)
+    cursor.execute(f"SELECT hash, COUNT(*) FROM ({references}) WHERE hash IS NOT NULL GROUP BY hash")
+    counts = cursor.fetchall()
+    cursor.execute("UPDATE json_blobs SET refcount = 0")
+    cursor.executemany("UPDATE json_blobs SET refcount = ? WHERE hash = ?", [(n, h) for h, n in counts])
+    cursor.execute("DELETE FROM json_blobs WHERE refcount <= 0")
+    for statement in _blob_ddl():
+        cursor.execute(statement)
+
+
+def stats(db) -> dict:
+    blobs, stored, references = db.execute(text(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refcount), 0) FROM json_blobs"
+    )).one()
+    inline = db.execute(text(
+        "SELECT COALESCE(SUM(size * refcount), 0) FROM json_blobs"
+    )).scalar()
+    return {
+        "blobs": blobs,
+        "references": references,
+        "stored_bytes": stored,
+        "inline_bytes": inline,  # what the same documents would take stored per row
+        "dedup_ratio": round(inline / stored, 2) if stored else None,
+    }
@@ -0,0 +1,472 @@
+import argparse
+import os
+import sys
+import time
+
+# Operations CLI: one entry point instead of the one-off NLSC / migration scripts.
+#
+#   python landtool.py lookup parcels.csv -o results.csv   # bulk NLSC lookup
+#   python landtool.py warm 萬華區 大安區                    # prefetch section lists
+#   python landtool.py sections 萬華區 --name 雙園           # section codes
+#   python landtool.py verify --project 12 --update        # re-check stored parcels
+#   python landtool.py export --format csv -o parcels.csv
+#   python landtool.py migrate                             # create_all + patch_db
+#   python landtool.py freeze --after-days 30              # cold storage sweep
+#   python landtool.py bench detail                        # bench_project_detail.py
+#
+# Only argparse is imported up front; each command imports what it needs, so
+# `--help` does not pay for SQLAlchemy, numpy or requests. Upstream work runs
+# on a thread pool (--workers) with a progress line on stderr; all NLSC calls
+# go through nlsc.py, the same code as GET /proxy/land-info.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BENCHMARKS = {
+    "detail": "bench_project_detail.py",
+    "workers": "bench_db_workers.py",
+    "optimizer": "bench_site_optimizer.py",
+}
+
+
+# --- Progress / parallel runs ---
+
+class Progress:
+    """`label: done/total (failed) rate` on stderr; rewritten in place on a terminal, every 10% otherwise."""
+
+    def __init__(self, label: str, total: int, stream=None):
+        self.label = label
+        self.total = total
+        self.stream = stream or sys.stderr
+        self.tty = self.stream.isatty()
+        self.done = self.failed = 0
+        self.started = time.perf_counter()
+        self._every = max(1, total // 10)
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        return f"{self.label}: {self.done}/{self.total} ({self.failed} failed) {rate:.1f}/s"
+
+    def step(self, failed: bool = False):
+        self.done += 1
+        self.failed += bool(failed)
+        if self.tty:
+            self.stream.write("\r" + self.line())
+            self.stream.flush()
+        elif self.done == self.total or self.done % self._every == 0:
+            self.stream.write(self.line() + "\n")
+
+    def close(self):
+        if self.tty and self.total:
+            self.stream.write("\n")
+
+
+def run_parallel(fn, items, workers: int, label: str):
+    """[(item, result, error)] in input order; fn runs on `workers` threads."""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    items = list(items)
+    results = [None] * len(items)
+    progress = Progress(label, len(items))
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        futures = {executor.submit(fn, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = (items[index], future.result(), None)
+            except Exception as e:
+                results[index] = (items[index], None, e)
+            progress.step(failed=results[index][2] is not None)
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        progress.close()
+    executor.shutdown()
+    return results
+
+
+def _error_text(error) -> str:
+    return getattr(error, "detail", None) or str(error)
+
+
+def _open_output(path: str):
+    if not path or path == "-":
+        return sys.stdout
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def _warm_towns(town_codes, workers, refresh=False):
+    import nlsc
+
+    return run_parallel(lambda town: nlsc.sections(town, refresh=refresh), sorted(set(town_codes)), workers, "sections")
+
+
+# --- Commands ---
+
+def cmd_lookup(args):
+    """Bulk NLSC lookup: CSV rows (district, section_name, lot_number) -> + area_m2, announced_value, error."""
+    import csv
+
+    import nlsc
+
+    with open(args.csv, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        print("no rows", file=sys.stderr)
+        return 0
+
+    def query(row):
+        district = (row.get("district") or args.district).strip()
+        section = (row.get("section_name") or row.get("section") or "").strip()
+        lot = (row.get("lot_number") or row.get("lot_no") or "").strip()
+        return nlsc.land_info(lot, section, district)
+
+    towns = [nlsc.TAIPEI_DISTRICTS.get((row.get("district") or args.district).strip()) for row in rows]
+    _warm_towns([town for town in towns if town], args.workers)
+    results = run_parallel(query, rows, args.workers, "lookup")
+
+    out = _open_output(args.output)
+    try:
+        writer = csv.DictWriter(out, fieldnames=list(rows[0].keys()) + ["area_m2", "announced_value", "error"])
+        writer.writeheader()
+        for row, info, error in results:
+            writer.writerow({
+                **row,
+                "area_m2": info["area"] if info else "",
+                "announced_value": info["price"] if info else "",
+                "error": _error_text(error) if error else "",
+            })
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    failed = sum(1 for _, _, error in results if error)
+    print(f"{len(results) - failed} found, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def cmd_warm(args):
+    """Fetch district section lists into the nlsc_sections cache."""
+    import nlsc
+
+    districts = args.districts or list(nlsc.TAIPEI_DISTRICTS)
+    unknown = [d for d in districts if d not in nlsc.TAIPEI_DISTRICTS]
+    if unknown:
+        print(f"unknown districts: {', '.join(unknown)} (known: {', '.join(nlsc.TAIPEI_DISTRICTS)})", file=sys.stderr)
+        return 2
+    names = {nlsc.TAIPEI_DISTRICTS[d]: d for d in districts}
+    failed = 0
+    for town, sections, error in _warm_towns(names, args.workers, refresh=args.refresh):
+        if error:
+            failed += 1
+            print(f"{names[town]} ({town}): failed: {_error_text(error)}")
+        else:
+            print(f"{names[town]} ({town}): {len(sections)} sections")
+    return 1 if failed else 0
+
+
+def cmd_sections(args):
+    """Districts and town codes, or one district's section codes (optionally those matching --name)."""
+    import nlsc
+
+    if not args.district:
+        for district, town in nlsc.TAIPEI_DISTRICTS.items():
+            print(f"{town}\t{district}")
+        return 0
+    town = nlsc.TAIPEI_DISTRICTS.get(args.district)
+    if town is None:
+        print(f"unknown district: {args.district} (known: {', '.join(nlsc.TAIPEI_DISTRICTS)})", file=sys.stderr)
+        return 2
+    try:
+        sections = nlsc.sections(town, refresh=args.refresh)
+    except Exception as e:
+        print(f"{args.district} ({town}): failed: {_error_text(e)}", file=sys.stderr)
+        return 1
+    chosen = nlsc.find_section_code(town, args.name) if args.name else None
+    for name, code in sections:
+        if args.name and args.name.strip() not in name:
+            continue
+        print(f"{code}\t{name}" + ("\t<- used for lookups" if code == chosen else ""))
+    return 0
+
+
+def _close(a, b, tolerance) -> bool:
+    if a is None or b is None:
+        return False
+    return abs(a - b) <= tolerance * max(abs(a), abs(b), 1e-9)
+
+
+def cmd_verify(args):
+    """Re-query every stored parcel and compare area / announced value; --update writes NLSC's values."""
+    import csv
+
+    from sqlalchemy import select
+
+    import models
+    import nlsc
+    from database import ReadSessionLocal
+
+    with ReadSessionLocal() as db:
+        query = (
+            select(
+                models.LandParcel.id, models.LandParcel.project_id, models.LandParcel.section_name,
+                models.LandParcel.lot_number, models.LandParcel.area_m2, models.LandParcel.announced_value,
+                models.LandParcel.is_verified, models.LandParcel.district, models.Project.location_dist,
+            )
+            .join(models.Project, models.Project.id == models.LandParcel.project_id)
+            .order_by(models.LandParcel.id)
+        )
+        if args.project:
+            query = query.where(models.LandParcel.project_id.in_(args.project))
+        parcels = db.execute(query).all()
+    if not parcels:
+        print("no parcels", file=sys.stderr)
+        return 0
+
+    def district_of(parcel):
+        return parcel.district or parcel.location_dist or ""
+
+    def query_parcel(parcel):
+        if not parcel.section_name or not parcel.lot_number:
+            raise nlsc.LookupFailed(400, "missing section or lot number")
+        return nlsc.land_info(parcel.lot_number, parcel.section_name, district_of(parcel))
+
+    towns = [nlsc.TAIPEI_DISTRICTS.get(district_of(p)) for p in parcels]
+    _warm_towns([town for town in towns if town], args.workers)
+    results = run_parallel(query_parcel, parcels, args.workers, "verify")
+
+    report, updates = [], []
+    for parcel, info, error in results:
+        if error:
+            status = "failed"
+        elif _close(parcel.area_m2, info["area"], args.tolerance) and _close(
+            parcel.announced_value, info["price"], args.tolerance
+        ):
+            status = "ok"
+        else:
+            status = "mismatch"
+        if info and (status == "mismatch" or not parcel.is_verified):
+            updates.append((parcel.id, info))
+        report.append({
+            "parcel_id": parcel.id,
+            "project_id": parcel.project_id,
+            "district": district_of(parcel),
+            "section_name": parcel.section_name,
+            "lot_number": parcel.lot_number,
+            "status": status,
+            "area_m2": parcel.area_m2,
+            "nlsc_area_m2": info["area"] if info else "",
+            "announced_value": parcel.announced_value,
+            "nlsc_announced_value": info["price"] if info else "",
+            "error": _error_text(error) if error else "",
+        })
+
+    if args.output:
+        out = _open_output(args.output)
+        try:
+            writer = csv.DictWriter(out, fieldnames=list(report[0]))
+            writer.writeheader()
+            writer.writerows(row for row in report if args.all or row["status"] != "ok")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+    counts = {status: sum(1 for row in report if row["status"] == status) for status in ("ok", "mismatch", "failed")}
+    print(f"{counts['ok']} ok, {counts['mismatch']} mismatched, {counts['failed']} failed", file=sys.stderr)
+
+    if args.update and updates:
+        # Same write path as PUT /land_parcels/{id}: change feed, sync seq, totals, summaries
+        import main
+        import schemas
+        from database import SessionLocal
+
+        progress = Progress("update", len(updates))
+        for parcel_id, info in updates:
+            with SessionLocal() as db:
+                try:
+                    main.update_land_parcel(parcel_id, schemas.LandParcelUpdate(
+                        area_m2=info["area"], announced_value=info["price"], is_verified=True,
+                    ), db)
+                    progress.step()
+                except Exception as e:
+                    progress.step(failed=True)
+                    print(f"parcel {parcel_id}: update failed: {_error_text(e)}", file=sys.stderr)
+        progress.close()
+    return 1 if counts["mismatch"] or counts["failed"] else 0
+
+
+def _json_value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def cmd_export(args):
+    """Projects (json, with parcels) or parcels (csv) from the database, cold storage included."""
+    import csv
+    import json
+
+    from sqlalchemy import select
+
+    import cold_storage
+    import models
+    from database import ReadSessionLocal
+
+    projects_table = models.Project.__table__
+    parcels_table = models.LandParcel.__table__
+    with ReadSessionLocal() as db:
+        query = select(projects_table).order_by(projects_table.c.id)
+        if args.project:
+            query = query.where(projects_table.c.id.in_(args.project))
+        elif not args.include_archived:
+            query = query.where(projects_table.c.archived_at == None)
+        projects = [dict(row) for row in db.execute(query).mappings()]
+        parcel_query = (
+            select(parcels_table)
+            .where(parcels_table.c.project_id.in_([p["id"] for p in projects]))
+            .order_by(parcels_table.c.project_id, parcels_table.c.id)
+        )
+        # geom is WKB; its bbox / GeoJSON are derived and not exported
+        parcels = [
+            {key: value for key, value in row.items() if not isinstance(value, (bytes, memoryview))}
+            for row in db.execute(parcel_query).mappings()
+        ]
+        # Archived projects may be in cold storage: same rows, from the payload
+        if args.project or args.include_archived:
+            cold_query = select(models.ColdProject.payload).order_by(models.ColdProject.id)
+            if args.project:
+                cold_query = cold_query.where(models.ColdProject.id.in_(args.project))
+            for payload in db.execute(cold_query).scalars():
+                project = cold_storage.as_project(cold_storage.unpack(payload))
+                project.pop("total_area_ping", None)
+                parcels.extend(project.pop("land_parcels"))
+                projects.append(project)
+            projects.sort(key=lambda p: p["id"])
+            parcels.sort(key=lambda p: (p["project_id"], p["id"]))
+
+    out = _open_output(args.output)
+    try:
+        if args.format == "json":
+            by_project = {p["id"]: {**p, "land_parcels": []} for p in projects}
+            for parcel in parcels:
+                by_project[parcel["project_id"]]["land_parcels"].append(parcel)
+            json.dump({"projects": list(by_project.values())}, out, ensure_ascii=False, indent=1, default=_json_value)
+            out.write("\n")
+        else:
+            names = {p["id"]: p["name"] for p in projects}
+            columns = ["project_name"] + [c.name for c in parcels_table.columns if c.name != "geom"]
+            writer = csv.DictWriter(out, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            for parcel in parcels:
+                writer.writerow({**parcel, "project_name": names.get(parcel["project_id"])})
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"exported {len(projects)} projects, {len(parcels)} parcels", file=sys.stderr)
+    return 0
+
+
+def cmd_migrate(args):
+    """Create missing tables, then run patch_db (columns, indexes, triggers, backfills)."""
+    import models
+    from database import engine
+
+    models.Base.metadata.create_all(bind=engine)
+    from patch_db import patch_db
+
+    patch_db()
+    return 0
+
+
+def cmd_freeze(args):
+    """Move projects archived and unopened for --after-days into cold storage."""
+    import cold_storage
+
+    if args.after_days < 0:
+        print("--after-days must be >= 0", file=sys.stderr)
+        return 2
+    frozen = cold_storage.sweep_all(args.after_days)
+    print(f"froze {frozen} projects", file=sys.stderr)
+    return 0
+
+
+def cmd_bench(args):
+    import subprocess
+
+    extra = args.args[1:] if args.args[:1] == ["--"] else args.args
+    script = os.path.join(HERE, BENCHMARKS[args.name])
+    return subprocess.call([sys.executable, script, *extra])
+
+
+# --- CLI ---
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="landtool", description="Land development tool operations.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    lookup = commands.add_parser("lookup", help="bulk NLSC parcel lookup from a CSV")
+    lookup.add_argument("csv", help="columns: district (optional), section_name, lot_number")
+    lookup.add_argument("-o", "--output", help="result CSV (default: stdout)")
+    lookup.add_argument("--district", default="萬華區", help="district for rows without one (default: %(default)s)")
+    lookup.set_defaults(func=cmd_lookup)
+
+    warm = commands.add_parser("warm", help="prefetch NLSC section lists for districts")
+    warm.add_argument("districts", nargs="*", help="district names, e.g. 萬華區 (default: all)")
+    warm.add_argument("--refresh", action="store_true", help="refetch even if cached")
+    warm.set_defaults(func=cmd_warm)
+
+    sections = commands.add_parser("sections", help="list districts, or a district's NLSC section codes")
+    sections.add_argument("district", nargs="?", help="e.g. 萬華區 (default: list districts and town codes)")
+    sections.add_argument("--name", help="only sections containing this name; marks the one lookups use")
+    sections.add_argument("--refresh", action="store_true", help="refetch even if cached")
+    sections.set_defaults(func=cmd_sections)
+
+    verify = commands.add_parser("verify", help="re-check stored parcels against NLSC")
+    verify.add_argument("--project", type=int, nargs="+", help="only these project ids")
+    verify.add_argument("--tolerance", type=float, default=0.001, help="relative tolerance (default: %(default)s)")
+    verify.add_argument("--update", action="store_true", help="write NLSC area / announced value and mark verified")
+    verify.add_argument("-o", "--output", help="report CSV of mismatched / failed parcels")
+    verify.add_argument("--all", action="store_true", help="include matching parcels in the report")
+    verify.set_defaults(func=cmd_verify)
+
+    export = commands.add_parser("export", help="export projects and parcels")
+    export.add_argument("--format", choices=["json", "csv"], default="json", help="json: projects; csv: parcels")
+    export.add_argument("-o", "--output", help="output file (default: stdout)")
+    export.add_argument("--project", type=int, nargs="+", help="only these project ids")
+    export.add_argument("--include-archived", action="store_true")
+    export.set_defaults(func=cmd_export)
+
+    migrate = commands.add_parser("migrate", help="create tables and run patch_db")
+    migrate.set_defaults(func=cmd_migrate)
+
+    freeze = commands.add_parser("freeze", help="move long-archived projects to cold storage")
+    freeze.add_argument(
+        "--after-days", type=int, default=30,
+        help="days since archiving / last open (default: %(default)s); opens still buffered in a running server are not seen",
+    )
+    freeze.set_defaults(func=cmd_freeze)
+
+    bench = commands.add_parser("bench", help="run a benchmark script")
+    bench.add_argument("name", choices=sorted(BENCHMARKS))
+    bench.add_argument("args", nargs=argparse.REMAINDER, help="passed to the script")
+    bench.set_defaults(func=cmd_bench)
+
+    for command in (lookup, warm, verify):
+        command.add_argument("--workers", type=int, default=4, help="parallel upstream requests (default: %(default)s)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command != "bench":
+        import structured_log
+
+        structured_log.setup()
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,90 @@
 from fastapi import FastAPI, Depends, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
 from sqlalchemy.exc import SQLAlchemyError
-import traceback
-import sys
+import logging
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.orm import Session, noload, selectinload
+from typing import List, Literal
 
+import config
 import models, schemas
-from database import SessionLocal, engine
+import spatial
+import adjacency
+import bonus_optimizer
+import calc_cache
+import cold_storage
+import comparison
+import feasibility
+import json_blobs
+import massing_geometry
+import nlsc
+import parcel_queries
+import project_summary
+import risk_simulation
+import scenarios
+import site_optimizer
+import change_feed
+import project_batch
+import project_clone
+import structured_log
+import sync
+import touch_buffer
+from database import ReadSessionLocal, SessionLocal, engine, read_engine
+
+# Logging goes through a background queue writer; request ids on every record
+structured_log.setup()
+logger = logging.getLogger("main")
 
 models.Base.metadata.create_all(bind=engine)
 
+# Record project/parcel changes in change_log for the change feed
+change_feed.install(SessionLocal)
+change_feed.on_commit(calc_cache.invalidate_projects)
+# Stamp project/parcel writes with a change sequence for delta sync
+sync.install(SessionLocal)
+
 app = FastAPI()
 
+# Write-behind buffer for last_opened_at touches (flushed in the background)
+touches = touch_buffer.create(engine)
+
+def project_not_found(project_id: int, db: Session):
+    # A miss may be an archived project in cold storage: restore it and have
+    # the request retried (307), otherwise 404. Hot requests never get here.
+    # The thaw takes a write connection of its own; hand the request's back
+    # first (in DB_MODE=production it may be the only one).
+    db.close()
+    restored = cold_storage.thaw_committed(project_id=project_id)
+    if restored is not None:
+        return cold_storage.ProjectThawed(project_id, restored)
+    return HTTPException(status_code=404, detail="Project not found")
+
+def parcel_not_found(parcel_id: int, db: Session):
+    db.close()
+    restored = cold_storage.thaw_committed(parcel_id=parcel_id)
+    if restored is not None:
+        return cold_storage.ProjectThawed(restored, restored)
+    return HTTPException(status_code=404, detail="Land parcel not found")
+
 # Auto-patch DB on startup to ensure schema consistency
 from patch_db import patch_db
 
 @app.on_event("startup")
 def on_startup():
     patch_db()
+    if config.COLD_STORAGE_AFTER_DAYS >= 0:  # opt-in; off by default
+        cold_storage.sweep_all(config.COLD_STORAGE_AFTER_DAYS)
+    touches.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    touches.stop()
+    site_optimizer.shutdown()
 
 @app.exception_handler(SQLAlchemyError)
 async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError):
-    print("CAUGHT SQLALCHEMY ERROR:", file=sys.stderr)
-    traceback.print_exc()
+    logger.error("database error on %s %s", request.method, request.url.path, exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={
@@ -34,10 +94,21 @@ async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError):
         },
     )
 
+@app.exception_handler(cold_storage.ProjectThawed)
+async def project_thawed_handler(request: Request, exc: cold_storage.ProjectThawed):
+    # The project was just restored from cold storage: retry the same request
+    url = request.url
+    if exc.restored_id != exc.project_id:
+        url = url.replace(path=url.path.replace(f"/projects/{exc.project_id}", f"/projects/{exc.restored_id}", 1))
+    return RedirectResponse(str(url), status_code=307)
+
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    print(f"CAUGHT UNHANDLED EXCEPTION ({exc.__class__.__name__}):", file=sys.stderr)
-    traceback.print_exc()
+    request_id = structured_log.request_id_of(request.scope)
+    logger.error(
+        "unhandled %s on %s %s", exc.__class__.__name__, request.method, request.url.path,
+        exc_info=exc, extra={"request_id": request_id},
+    )
     return JSONResponse(
         status_code=500,
         content={
@@ -45,6 +116,7 @@ async def general_exception_handler(request: Request, exc: Exception):
             "message": str(exc),
             "hint": "Internal Server Error. Check backend logs for traceback."
         },
+        headers={"X-Request-ID": request_id} if request_id else None,
     )
 
 # CORS Configuration
@@ -62,8 +134,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Profile-Summary", "ETag"],
 )
 
+# Opt-in request profiling (X-Profile: 1 or ?profile=1). Not installed unless enabled.
+if config.PROFILING_ENABLED:
+    from profiling import ProfilingMiddleware
+    app.add_middleware(ProfilingMiddleware)
+
+# SQL instrumentation: slow-query log with EXPLAIN QUERY PLAN, per-route N+1 report.
+if config.QUERY_LOG_ENABLED:
+    import query_log
+    query_log.instrument_engine(engine)
+    query_log.instrument_engine(read_engine)
+    app.add_middleware(query_log.QueryTrackingMiddleware)
+
+    # Per-request query budgets, enforced when QUERY_BUDGET_STRICT=1.
+    # Same numbers as bench_project_detail.py
+    query_log.set_query_budget("GET", "/projects/{project_id}", 2)
+    query_log.set_query_budget("PUT", "/projects/{project_id}", 6)
+    query_log.set_query_budget("POST", "/projects/{project_id}/parcels/", 8)
+    query_log.set_query_budget("PUT", "/land_parcels/{parcel_id}", 8)
+
+    @app.get("/debug/query-stats")
+    def read_query_stats():
+        return query_log.route_report()
+
+# Outermost: X-Request-ID for every response, and on the log records of the request
+app.add_middleware(structured_log.RequestIdMiddleware)
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -72,10 +171,78 @@ def get_db():
     finally:
         db.close()
 
+# Read-only handlers: separate pool in DB_MODE=production, same session otherwise
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Detail read: project row + its parcels in exactly two statements, whatever the
+# parcel count. selectinload (not joinedload) so the project's JSON columns are
+# not repeated on every parcel row. Statements are built once at import; SQLAlchemy
+# caches their compiled form, so per-request cost is parameter binding only.
+_project_detail_stmt = (
+    select(models.Project)
+    .options(selectinload(models.Project.land_parcels))
+    .where(models.Project.id == bindparam("project_id"))
+)
+
+# Keep projects.total_area_m2 in sync with its parcels in a single UPDATE
+# (correlated SUM) instead of loading every parcel into Python.
+_recalculate_total_area_stmt = (
+    update(models.Project)
+    .where(models.Project.id == bindparam("project_id"))
+    .values(
+        total_area_m2=select(func.coalesce(func.sum(models.LandParcel.area_m2), 0.0))
+        .where(models.LandParcel.project_id == bindparam("project_id"))
+        .scalar_subquery(),
+        # Runs after the parcel flush, which already took this transaction's sequence
+        change_seq=sync.current_seq,
+    )
+    .returning(models.Project.total_area_m2)
+    .execution_options(synchronize_session=False)
+)
+
+# Same read without the parcel list (parcels="summary" / "none")
+_project_only_stmt = (
+    select(models.Project)
+    .options(noload(models.Project.land_parcels))
+    .where(models.Project.id == bindparam("project_id"))
+)
+
+# How project responses carry parcels:
+#   full    - embed every parcel (default, what the frontend uses today)
+#   summary - no parcel list; counts/area aggregates in parcel_summary
+#   none    - no parcel list, no aggregates
+ParcelsMode = Literal["full", "summary", "none"]
+
+def get_project_detail(db: Session, project_id: int, parcels: str = "full"):
+    stmt = _project_detail_stmt if parcels == "full" else _project_only_stmt
+    project = db.execute(
+        stmt,
+        {"project_id": project_id},
+        execution_options={"populate_existing": True},
+    ).scalar_one_or_none()
+    if project is not None and parcels == "summary":
+        project.parcel_summary = project_summary.as_parcel_summary(project.summary)
+    return project
+
+def recalculate_total_area(db: Session, project_id: int):
+    # Called after every parcel write: total_area_m2 plus the project_summary rollups
+    total = db.execute(_recalculate_total_area_stmt, {"project_id": project_id}).scalar_one_or_none()
+    if total is not None:
+        change_feed.note_change(db, "project", project_id, project_id, {"total_area_m2": float(total)})
+    project_summary.refresh(db, project_id)
+
 @app.post("/projects/", response_model=schemas.Project)
 def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)):
     db_project = models.Project(**project.dict())
     db.add(db_project)
+    db.flush()
+    # Empty rollups until the first parcel arrives
+    db.add(models.ProjectSummary(project_id=db_project.id))
     db.commit()
     db.refresh(db_project)
     # Initialize computed fields for response
@@ -86,6 +253,21 @@ def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)
 def health_check():
     return {"status": "ok"}
 
+@app.get("/debug/cache-stats")
+def read_cache_stats(db: Session = Depends(get_read_db)):
+    # Entries, approximate bytes and hit ratio of every in-process cache
+    return calc_cache.stats(db)
+
+@app.get("/debug/json-blobs")
+def read_json_blob_stats(db: Session = Depends(get_read_db)):
+    # Distinct bonus-details / site_config documents vs. references to them
+    return json_blobs.stats(db)
+
+@app.get("/debug/log-stats")
+def read_log_stats():
+    # Records waiting for the background writer, and records dropped on a full queue
+    return structured_log.stats()
+
 @app.get("/projects/", response_model=List[schemas.Project])
 def read_projects(
     skip: int = 0, 
@@ -93,10 +275,15 @@ def read_projects(
     search: str = None, 
     include_archived: bool = False,
     sort: str = "recent_updated",
-    db: Session = Depends(get_db)
+    parcels: ParcelsMode = "full",
+    db: Session = Depends(get_read_db)
 ):
     try:
         query = db.query(models.Project)
+        if parcels == "full":
+            query = query.options(selectinload(models.Project.land_parcels))
+        else:
+            query = query.options(noload(models.Project.land_parcels))
 
         # 1. Search (Name)
         if search:
@@ -107,19 +294,22 @@ def read_projects(
             query = query.filter(models.Project.archived_at == None)
 
         # 3. Sorting
-        # 3. Sorting
-        from sqlalchemy import func
-        
         if sort == "recent_updated":
             # updated_at desc (fallback to created_at), then created_at desc
             query = query.order_by(func.coalesce(models.Project.updated_at, models.Project.created_at).desc(), models.Project.created_at.desc())
         elif sort == "recent_opened":
+            # Write out buffered touches first so the ORDER BY sees them
+            touches.flush()
             # last_opened_at desc (nulls last), then updated_at desc
             query = query.order_by(models.Project.last_opened_at.desc(), func.coalesce(models.Project.updated_at, models.Project.created_at).desc())
         elif sort == "name_asc":
             query = query.order_by(models.Project.name.asc())
         elif sort == "created_desc":
             query = query.order_by(models.Project.created_at.desc())
+        elif sort == "value_desc":
+            # Total announced land value, from the materialized summary (no parcel scan)
+            query = query.outerjoin(models.ProjectSummary, models.ProjectSummary.project_id == models.Project.id)
+            query = query.order_by(func.coalesce(models.ProjectSummary.announced_value_total, 0.0).desc(), models.Project.id.desc())
         # Add Pinned Logic? No, usually Pinned is UI logical partition, but maybe we want pinned first?
         # User requirement says "Sort" dropdown. Pinned is partition 'a. Pinned'. 
         # Usually backend just sorts by criterion, frontend partitions. 
@@ -127,13 +317,23 @@ def read_projects(
         # MVP: Frontend partitions. Backend just provides sorted list. 
         # "Sorting... in local is fine". So this backend sort is extra credit but good.
 
-        projects = query.offset(skip).limit(limit).all()
+        if include_archived:
+            # Union with cold storage: first skip+limit of each side, merged in Python
+            projects = query.limit(skip + limit).all()
+            touches.overlay(projects)
+            projects = cold_storage.list_page(db, projects, search, sort, skip, limit, parcels)
+        else:
+            projects = query.offset(skip).limit(limit).all()
+            touches.overlay(projects)
         for p in projects:
+            if isinstance(p, dict):
+                continue  # cold, already shaped
             p.total_area_ping = (p.total_area_m2 or 0.0) * 0.3025
+            if parcels == "summary":
+                p.parcel_summary = project_summary.as_parcel_summary(p.summary)
         return projects
     except Exception as e:
-        print(f"Error in read_projects: {e}", file=sys.stderr)
-        traceback.print_exc()
+        logger.exception("read_projects failed")
         return JSONResponse(
             status_code=500,
             content={
@@ -144,10 +344,11 @@ def read_projects(
         )
 
 @app.get("/projects/{project_id}", response_model=schemas.Project)
-def read_project(project_id: int, db: Session = Depends(get_db)):
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+def read_project(project_id: int, parcels: ParcelsMode = "full", db: Session = Depends(get_read_db)):
+    project = get_project_detail(db, project_id, parcels)
     if project is None:
-        raise HTTPException(status_code=404, detail="Project not found")
+        raise project_not_found(project_id, db)
+    touches.overlay([project])
     
     # Ensure total_area_m2 is up to date (though we update it on write, it's good to be safe or just rely on the stored value)
     # The user asked to "automatically calculate... sum". 
@@ -158,16 +359,21 @@ def read_project(project_id: int, db: Session = Depends(get_db)):
 
 @app.put("/projects/{project_id}", response_model=schemas.Project)
 def update_project(project_id: int, project_update: schemas.ProjectUpdate, db: Session = Depends(get_db)):
-    db_project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    db_project = db.get(models.Project, project_id)
     if db_project is None:
-        raise HTTPException(status_code=404, detail="Project not found")
+        raise project_not_found(project_id, db)
 
     update_data = project_update.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_project, key, value)
+    if "last_opened_at" in update_data:
+        # Explicit value wins over a buffered touch
+        touches.discard(project_id)
     
     db.commit()
-    db.refresh(db_project)
+    # Reload with parcels eagerly so serialization does not lazy-load them
+    db_project = get_project_detail(db, project_id)
+    touches.overlay([db_project])
     db_project.total_area_ping = db_project.total_area_m2 * 0.3025
     return db_project
 
@@ -175,208 +381,369 @@ def update_project(project_id: int, project_update: schemas.ProjectUpdate, db: S
 def delete_project(project_id: int, db: Session = Depends(get_db)):
     db_project = db.query(models.Project).filter(models.Project.id == project_id).first()
     if db_project is None:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Delete associated land parcels first (cascade delete)
-    db.query(models.LandParcel).filter(models.LandParcel.project_id == project_id).delete()
+        raise project_not_found(project_id, db)
     
+    # Delete associated land parcels first (cascade delete). Bulk delete skips
+    # the change feed's flush hook, so their events are noted explicitly.
+    parcel_ids = db.execute(
+        delete(models.LandParcel).where(models.LandParcel.project_id == project_id).returning(models.LandParcel.id)
+    ).scalars().all()
+    change_feed.note_changes(db, [{
+        "entity": "parcel", "entity_id": parcel_id, "project_id": project_id, "op": "delete", "changes": {},
+    } for parcel_id in parcel_ids])
+
     # Delete the project
     db.delete(db_project)
     db.commit()
     return {"message": "Project deleted successfully", "id": project_id}
 
+@app.post("/projects/{project_id}/touch")
+def touch_project(project_id: int, db: Session = Depends(get_read_db)):
+    # Mark a project as opened. Buffered and written in the background in one
+    # batched UPDATE; does not change updated_at.
+    exists = db.execute(select(models.Project.id).where(models.Project.id == project_id)).scalar()
+    if exists is None:
+        raise project_not_found(project_id, db)
+    return {"id": project_id, "last_opened_at": touches.touch(project_id)}
+
+@app.post("/projects/batch", response_model=schemas.ProjectBatchResponse)
+def batch_update_projects(batch: schemas.ProjectBatchRequest, db: Session = Depends(get_db)):
+    # Multi-select pin / archive / restore / delete / field edits: one transaction,
+    # one commit, per-item outcomes in request order.
+    try:
+        results = project_batch.apply_batch(db, batch.operations, discard_touch=touches.discard)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    return {"results": results}
+
+@app.post("/projects/{project_id}/freeze")
+def freeze_project(project_id: int, db: Session = Depends(get_db)):
+    # Move an archived project to cold storage now (`landtool freeze` and
+    # /cold-storage/sweep do this in bulk). Any later request for it restores it.
+    # Buffered opens first: the flush needs the write connection this session
+    # takes with its first query.
+    touches.flush()
+    archived_at = db.execute(select(models.Project.archived_at).where(models.Project.id == project_id)).first()
+    if archived_at is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if archived_at[0] is None:
+        raise HTTPException(status_code=400, detail="Only archived projects can be frozen")
+    cold_storage.freeze(db, project_id)
+    db.commit()
+    return {"id": project_id, "cold": True}
+
+@app.post("/cold-storage/sweep")
+def sweep_cold_storage(after_days: int = None):
+    # Freeze every project archived and unopened for `after_days` (default COLD_STORAGE_AFTER_DAYS)
+    days = config.COLD_STORAGE_AFTER_DAYS if after_days is None else after_days
+    if days < 0:
+        raise HTTPException(status_code=400, detail="after_days must be >= 0")
+    touches.flush()  # buffered opens count as activity
+    return {"frozen": cold_storage.sweep_all(days)}
+
+@app.get("/cold-storage/stats")
+def read_cold_storage_stats(db: Session = Depends(get_read_db)):
+    return cold_storage.stats(db)
+
+@app.post("/projects/{project_id}/clone", response_model=schemas.Project)
+def clone_project(
+    project_id: int,
+    request: schemas.ProjectCloneRequest = schemas.ProjectCloneRequest(),
+    parcels: ParcelsMode = "summary",
+    db: Session = Depends(get_db)
+):
+    # Fork a project (settings, JSON config, filtered parcels, adjacency) with
+    # INSERT ... SELECT in one transaction. `parcels` shapes the response only.
+    new_id = project_clone.clone_project(db, project_id, request)
+    if new_id is None:
+        raise project_not_found(project_id, db)
+    recalculate_total_area(db, new_id)
+    db.commit()
+    db_project = get_project_detail(db, new_id, parcels)
+    db_project.total_area_ping = db_project.total_area_m2 * 0.3025
+    return db_project
 
 @app.post("/projects/{project_id}/parcels/", response_model=schemas.LandParcel)
 def create_land_parcel(project_id: int, land_parcel: schemas.LandParcelCreate, db: Session = Depends(get_db)):
     # Check if project exists
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    project = db.get(models.Project, project_id)
     if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+        raise project_not_found(project_id, db)
 
-    db_land_parcel = models.LandParcel(**land_parcel.dict(), project_id=project_id)
+    parcel_data = land_parcel.dict(exclude={"geometry"})
+    db_land_parcel = models.LandParcel(**parcel_data, project_id=project_id)
+    if land_parcel.geometry is not None:
+        spatial.apply_geometry(db_land_parcel, land_parcel.geometry.dict())
     db.add(db_land_parcel)
+    db.flush()
+
+    if land_parcel.geometry is not None:
+        adjacency.update_parcel_adjacency(db, db_land_parcel)
+
+    # Recalculate Project total_area_m2 in the same transaction
+    recalculate_total_area(db, project_id)
     db.commit()
     db.refresh(db_land_parcel)
-    
-    # Recalculate Project total_area_m2
-    # We re-query to get all parcels to be sure, or just add the new one. Re-querying is safer.
-    parcels = db.query(models.LandParcel).filter(models.LandParcel.project_id == project_id).all()
-    total_area = sum(p.area_m2 for p in parcels)
-    project.total_area_m2 = total_area
-    db.commit()
-        
+
     return db_land_parcel
 
+@app.get("/projects/{project_id}/parcels", response_model=schemas.LandParcelPage)
+def read_project_parcels(
+    project_id: int,
+    limit: int = 100,
+    cursor: str = None,
+    sort: str = "id",
+    order: str = "asc",
+    zoning_type: str = None,
+    include_in_site: bool = None,
+    is_verified: bool = None,
+    integration_risk: str = None,
+    with_total: bool = False,
+    db: Session = Depends(get_read_db)
+):
+    # Keyset-paginated parcel list. Pass next_cursor back as `cursor` for the next page.
+    if db.get(models.Project, project_id) is None:
+        raise project_not_found(project_id, db)
+    try:
+        return parcel_queries.list_parcels(
+            db, project_id, limit=limit, cursor=cursor, sort=sort, order=order,
+            filters={
+                "zoning_type": zoning_type,
+                "include_in_site": include_in_site,
+                "is_verified": is_verified,
+                "integration_risk": integration_risk,
+            },
+            with_total=with_total,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.put("/land_parcels/{parcel_id}", response_model=schemas.LandParcel)
 def update_land_parcel(parcel_id: int, parcel_update: schemas.LandParcelUpdate, db: Session = Depends(get_db)):
-    db_parcel = db.query(models.LandParcel).filter(models.LandParcel.id == parcel_id).first()
+    db_parcel = db.get(models.LandParcel, parcel_id)
     if not db_parcel:
-        raise HTTPException(status_code=404, detail="Land parcel not found")
+        raise parcel_not_found(parcel_id, db)
 
     update_data = parcel_update.dict(exclude_unset=True)
+    geometry_changed = "geometry" in update_data
+    if geometry_changed:
+        spatial.apply_geometry(db_parcel, update_data.pop("geometry"))
     for key, value in update_data.items():
         setattr(db_parcel, key, value)
-    
+    db.flush()
+    if geometry_changed:
+        adjacency.update_parcel_adjacency(db, db_parcel)
+
+    # Recalculate Project total_area_m2 in the same transaction
+    if db_parcel.project_id is not None:
+        recalculate_total_area(db, db_parcel.project_id)
     db.commit()
     db.refresh(db_parcel)
 
-    # Recalculate Project total_area_m2
-    project = db.query(models.Project).filter(models.Project.id == db_parcel.project_id).first()
-    if project:
-        parcels = db.query(models.LandParcel).filter(models.LandParcel.project_id == project.id).all()
-        project.total_area_m2 = sum(p.area_m2 for p in parcels)
-        project.total_area_ping = project.total_area_m2 * 0.3025
-        db.commit()
-
     return db_parcel
 
-import requests
-import xml.etree.ElementTree as ET
-
-
-
-# 1. District Mapping Constant
-TAIPEI_DISTRICTS = {
-    "松山區": "A01", "大安區": "A02", "中正區": "A03", "萬華區": "A05",
-    "大同區": "A09", "中山區": "A10", "文山區": "A11", "南港區": "A13",
-    "內湖區": "A14", "士林區": "A15", "北投區": "A16", "信義區": "A17"
-}
-
-# 2. Dynamic Section Lookup Helper
-def find_section_code(town_code: str, section_name: str) -> str:
-    # API Note: Originally attempted ListTownSection but it returned 404 in app context. 
-    # Switching to ListLandSection which is verified to work.
-    url = f"https://api.nlsc.gov.tw/other/ListLandSection/A/{town_code}"
-    
+@app.get("/parcels/within")
+def read_parcels_within(
+    bbox: str,
+    project_id: int = None,
+    zoom: int = None,
+    limit: int = 5000,
+    db: Session = Depends(get_read_db)
+):
+    # bbox = "west,south,east,north" (WGS84). zoom = map zoom level; geometry is
+    # simplified to ~1px at that zoom. Omit zoom for full-resolution outlines.
     try:
-        # Add User-Agent just in case
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        # Use verify=False to avoid SSL issues in dev environment
-        response = requests.get(url, headers=headers, verify=False)
-        
-        if response.status_code == 200:
-            root = ET.fromstring(response.content)
-            items = root.findall(".//sectItem")
-            # print(f"Found {len(items)} sections for town {town_code}")
-            
-            best_fuzzy_match = None
-            
-            for item in items:
-                name_elem = item.find("sectstr")
-                code_elem = item.find("sectcode")
-                
-                if name_elem is not None and code_elem is not None:
-                    api_name = name_elem.text.strip()
-                    input_name = section_name.strip()
-                    
-                    # Exact Match (Priority)
-                    if api_name == input_name:
-                        # print(f"Found EXACT Section Code: {code_elem.text} for {section_name}")
-                        return code_elem.text.strip()
-                    
-                    # Fuzzy Match (Fallback) - Store the first one found
-                    if input_name in api_name and best_fuzzy_match is None:
-                         best_fuzzy_match = code_elem.text.strip()
-                         # print(f"Found FUZZY candidate: {api_name} ({best_fuzzy_match})")
-            
-            if best_fuzzy_match:
-                # print(f"Returning fuzzy match: {best_fuzzy_match}")
-                return best_fuzzy_match
-                
-        else:
-            print(f"Section Lookup API failed: {response.status_code}")
-
-    except Exception as e:
-        print(f"Error finding section code: {e}")
-        return None
-    
-    return None
+        bounds = spatial.parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    limit = max(1, min(limit, 20000))
+    return spatial.parcels_within(db, bounds, project_id=project_id, zoom=zoom, limit=limit)
+
+@app.get("/projects/{project_id}/contiguity")
+def read_project_contiguity(project_id: int, db: Session = Depends(get_read_db)):
+    # Connected components of the site parcels (include_in_site=1) over the
+    # stored adjacency graph, plus bridging / enclave parcels and frontage.
+    if db.get(models.Project, project_id) is None:
+        raise project_not_found(project_id, db)
+    return adjacency.analyze_contiguity(db, project_id)
+
+@app.post("/projects/{project_id}/scenarios", response_model=schemas.Scenario)
+def create_scenario(project_id: int, request: schemas.ScenarioCreate, db: Session = Depends(get_db)):
+    project = db.get(models.Project, project_id)
+    if project is None:
+        raise project_not_found(project_id, db)
+    try:
+        scenario = scenarios.create(db, project, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    db.refresh(scenario)
+    return scenario
+
+@app.get("/projects/{project_id}/scenarios", response_model=List[schemas.Scenario])
+def read_scenarios(project_id: int, db: Session = Depends(get_read_db)):
+    if db.get(models.Project, project_id) is None:
+        raise project_not_found(project_id, db)
+    return db.query(models.Scenario).filter(models.Scenario.project_id == project_id).order_by(models.Scenario.id).all()
+
+@app.get("/projects/{project_id}/scenarios/evaluate", response_model=schemas.ScenarioEvaluation)
+def evaluate_scenarios(project_id: int, db: Session = Depends(get_read_db)):
+    # Baseline + all scenarios through calc_engine in one vectorized pass:
+    # columnar comparison matrix (allowed volume, GFA, floors, basement, ...).
+    project = db.get(models.Project, project_id)
+    if project is None:
+        raise project_not_found(project_id, db)
+    return scenarios.evaluate(db, project)
+
+@app.put("/scenarios/{scenario_id}", response_model=schemas.Scenario)
+def update_scenario(scenario_id: int, request: schemas.ScenarioUpdate, db: Session = Depends(get_db)):
+    scenario = db.get(models.Scenario, scenario_id)
+    if scenario is None:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    try:
+        scenarios.update(db, scenario, db.get(models.Project, scenario.project_id), request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    db.refresh(scenario)
+    return scenario
+
+@app.delete("/scenarios/{scenario_id}")
+def delete_scenario(scenario_id: int, db: Session = Depends(get_db)):
+    scenario = db.get(models.Scenario, scenario_id)
+    if scenario is None:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    db.delete(scenario)
+    db.commit()
+    return {"message": "Scenario deleted successfully", "id": scenario_id}
 
-@app.get("/proxy/land-info")
-def get_land_info(lot_no: str, section_name: str, district: str = "萬華區"):
-    # Mapping logic
-    sect_code = ""
-    city = "A" # Default to Taipei City
-    town = ""
-    
-    # Step 1: District Lookup
-    if district in TAIPEI_DISTRICTS:
-        town = TAIPEI_DISTRICTS[district]
-    else:
-        # Fallback or error if not in mapping
-        pass 
-    
-    # Step 2: Dynamic Section Lookup
-    if town:
-        found_code = find_section_code(town, section_name)
-        if found_code:
-            sect_code = found_code
-    
-    if not town or not sect_code:
-        if not town:
-             raise HTTPException(status_code=400, detail=f"目前僅支援台北市 (Received: {district})")
-        if not sect_code:
-             raise HTTPException(status_code=400, detail=f"Section '{section_name}' not supported or found in {district}.")
+@app.post("/projects/{project_id}/site/optimize", response_model=schemas.SiteOptimizeResult)
+def optimize_site(project_id: int, request: schemas.SiteOptimizeRequest, db: Session = Depends(get_read_db)):
+    # Which parcels to consolidate: Pareto front of (site area, allowed GFA,
+    # integration risk) over parcel subsets, by branch-and-bound on a process pool.
+    project = db.get(models.Project, project_id)
+    if project is None:
+        raise project_not_found(project_id, db)
+    try:
+        return site_optimizer.optimize(db, project, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/projects/{project_id}/site/simulate", response_model=schemas.RiskSimulationResult)
+def simulate_site(project_id: int, request: schemas.RiskSimulationRequest = schemas.RiskSimulationRequest(), db: Session = Depends(get_read_db)):
+    # Monte Carlo acquisition of the site parcels: distribution of site area,
+    # allowed GFA and land value. Cached per parcel-state hash.
+    project = db.get(models.Project, project_id)
+    if project is None:
+        raise project_not_found(project_id, db)
+    return risk_simulation.simulate(db, project, request)
+
+@app.post("/projects/{project_id}/bonus/optimize", response_model=schemas.BonusOptimizeResult)
+def optimize_bonus(project_id: int, request: schemas.BonusOptimizeRequest = schemas.BonusOptimizeRequest(), db: Session = Depends(get_read_db)):
+    # Cheapest set of bonus items (checklist entries, with user costs) that
+    # fills bonus_cap, plus the min-cost-per-rate curve.
+    project = db.get(models.Project, project_id)
+    if project is None:
+        raise project_not_found(project_id, db)
+    return bonus_optimizer.optimize(db, project, request)
 
-    # Format lot_no to 8 digits (e.g. 265 -> 02650000)
+@app.post("/compare", response_model=schemas.ComparisonResult)
+def compare_portfolio(request: schemas.ComparisonRequest = schemas.ComparisonRequest(), db: Session = Depends(get_read_db)):
+    # Projects and scenarios evaluated once each: columnar metrics, ranks, pairwise deltas
     try:
-        if "-" in lot_no:
-            main, sub = lot_no.split("-")
-            formatted_lot_no = f"{int(main):04d}{int(sub):04d}"
-        else:
-            formatted_lot_no = f"{int(lot_no):04d}0000"
-    except ValueError:
-         raise HTTPException(status_code=400, detail="Invalid lot number format.")
-
-    url = "https://api.nlsc.gov.tw/other/ParcelQuery"
-    params = {
-        "lcode": city,
-        "tcode": town,
-        "scode": sect_code,
-        "lodcode": formatted_lot_no
+        return comparison.compare(db, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/projects/{project_id}/feasibility", response_model=schemas.FeasibilityResult)
+def project_feasibility(project_id: int, options: schemas.FeasibilityOptions = schemas.FeasibilityOptions(), db: Session = Depends(get_read_db)):
+    # Revenue, cost and residual land value, optionally over a price/cost band
+    project = db.get(models.Project, project_id)
+    if project is None:
+        raise project_not_found(project_id, db)
+    return feasibility.evaluate(db, [project], options)
+
+@app.post("/feasibility", response_model=schemas.FeasibilityResult)
+def portfolio_feasibility(request: schemas.PortfolioFeasibilityRequest = schemas.PortfolioFeasibilityRequest(), db: Session = Depends(get_read_db)):
+    # Same as above for many projects in one vectorized pass
+    query = db.query(models.Project).options(noload(models.Project.land_parcels))
+    if request.project_ids is not None:
+        query = query.filter(models.Project.id.in_(request.project_ids))
+    else:
+        query = query.filter(models.Project.archived_at == None)
+    projects = query.order_by(models.Project.id).all()
+    return feasibility.evaluate(db, projects, request)
+
+@app.get("/changes")
+def read_changes(after: int = 0, limit: int = 500, db: Session = Depends(get_read_db)):
+    # Catch-up / polling read of the change feed: events with id > after.
+    limit = max(1, min(limit, 5000))
+    low, high = change_feed.feed_bounds(db)
+    events = change_feed.read_changes(db, after, limit)
+    return {
+        "events": events,
+        "last_event_id": events[-1]["id"] if events else max(after, high),
+        # True when `after` predates the retained log: refetch instead of applying deltas
+        "reset": bool(low) and after < low - 1,
     }
-    
-    # Debug Logging
-    full_url = requests.Request('GET', url, params=params).prepare().url
-    print(f"DEBUG URL: {full_url}")
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+@app.get("/changes/stream")
+def stream_changes(request: Request, last_event_id: int = None, project_id: int = None):
+    # Server-Sent Events. Browsers resend Last-Event-ID on reconnect; the query
+    # parameter is for clients that reconnect by hand.
+    header_id = request.headers.get("last-event-id")
+    if header_id and header_id.isdigit():
+        last_event_id = int(header_id)
+    return StreamingResponse(
+        change_feed.stream_changes(request, ReadSessionLocal, last_event_id, project_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
+@app.get("/sync", response_model=schemas.SyncPage)
+def read_sync(since: str = None, limit: int = 1000, db: Session = Depends(get_read_db)):
+    # Delta sync: projects/parcels changed and ids deleted after `since`.
+    # Omit `since` for a full snapshot; keep the returned token for next time.
     try:
-        response = requests.get(url, params=params, headers=headers, verify=False)
-        
-        if response.status_code != 200:
-            print(f"API Error Response: {response.text}")
-            
-        response.raise_for_status()
-    except requests.exceptions.HTTPError as e:
-        if e.response.status_code == 404:
-            raise HTTPException(status_code=404, detail="Parcel not found in external API.")
-        raise HTTPException(status_code=500, detail=f"External API error: {str(e)}")
-    except requests.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"External API error: {str(e)}")
-
-    # Parse XML
+        return sync.changes_since(db, since, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/massing/geometry.glb")
+def read_massing_geometry(
+    request: Request,
+    floors: float = 1,
+    floor_height: float = 3.3,
+    footprint_area: float = 100,
+    basement_floors: float = 0,
+    basement_area: float = 100,
+    basement_floor_height: float = 3.3,
+    podium_floors: float = 0,
+    tower_footprint_area: float = None,
+):
+    # Same inputs as Massing3D (estFloors, estSingleFloorArea, basement outputs).
+    # The URL fully determines the result, so it is served as immutable and keyed
+    # by a content hash; repeat requests are answered from cache or with 304.
+    inputs = massing_geometry.normalize_inputs(
+        floors=floors, floor_height=floor_height, footprint_area=footprint_area,
+        basement_floors=basement_floors, basement_area=basement_area,
+        basement_floor_height=basement_floor_height,
+        podium_floors=podium_floors, tower_footprint_area=tower_footprint_area,
+    )
+    key = massing_geometry.content_hash(inputs)
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    _, glb = massing_geometry.get_massing_glb(inputs)
+    return Response(content=glb, media_type="model/gltf-binary", headers=headers)
+
+@app.get("/proxy/land-info")
+def get_land_info(lot_no: str, section_name: str, district: str = "萬華區"):
+    # Area and announced value of one lot from NLSC (section codes cached, see nlsc.py)
     try:
-        root = ET.fromstring(response.content)
-        
-        area_elem = root.find(".//area")
-        price_elem = root.find(".//price")
-        
-        if area_elem is None or price_elem is None:
-             # Sometimes the API returns 200 but with empty or error XML
-             print(f"XML Content: {response.text}")
-             raise HTTPException(status_code=404, detail="Data not found in external API response.")
-
-        return {
-            "area": float(area_elem.text),
-            "price": float(price_elem.text)
-        }
-    except ET.ParseError:
-        print(f"XML Parse Error. Content: {response.text}")
-        raise HTTPException(status_code=500, detail="Failed to parse external API response.")
+        return nlsc.land_info(lot_no, section_name, district)
+    except nlsc.LookupFailed as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
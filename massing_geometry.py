@@ -0,0 +1,259 @@
+import json
+import math
+import struct
+from array import array
+
+import calc_cache
+import config
+
+# Server-side massing geometry for Massing3D.
+#
+# Takes the massing/basement outputs the frontend already computes (floor
+# count, single floor area, basement floors, ...) and builds a binary glTF
+# (GLB) with:
+#   - "podium" and "tower" meshes: floor plates extruded to the floor count
+#     (no podium_floors => the whole building is one tower)
+#   - "basement" mesh: excavation box below grade
+#   - "floor_lines": one outline per floor level (LINES), for the floor banding
+# Each node carries its numbers (height, floors, area) in `extras`.
+#
+# Output is a few KB and loads directly with three.js GLTFLoader. Results are
+# keyed by a SHA-256 over the normalised inputs + GEOMETRY_VERSION and kept in
+# an in-process LRU, so identical massings are built once.
+
+GEOMETRY_VERSION = 1
+MAX_FLOORS = 200
+
+# Same look as Massing3D.jsx (RGBA, linear-ish)
+_COLOR_BUILDING = [0.376, 0.647, 0.980, 0.5]   # #60a5fa
+_COLOR_BASEMENT = [0.937, 0.267, 0.267, 0.3]   # #ef4444
+_COLOR_LINES = [0.145, 0.388, 0.922, 0.6]      # #2563eb
+
+
+def _safe(value, default, minimum):
+    # Mirrors safeVal() in Massing3D.jsx
+    try:
+        num = float(value)
+    except (TypeError, ValueError):
+        return default
+    if math.isnan(num) or num < minimum:
+        return default
+    return num
+
+
+def normalize_inputs(floors=None, floor_height=None, footprint_area=None,
+                     basement_floors=None, basement_area=None, basement_floor_height=None,
+                     podium_floors=None, tower_footprint_area=None):
+    floors = int(min(_safe(floors, 1, 1), MAX_FLOORS))
+    footprint = round(_safe(footprint_area, 100, 10), 2)
+    podium = int(min(_safe(podium_floors, 0, 0), floors))
+    tower = round(_safe(tower_footprint_area, footprint, 10), 2) if podium else footprint
+    return {
+        "floors": floors,
+        "floor_height": round(_safe(floor_height, 3.3, 2), 3),
+        "footprint_area": footprint,
+        "podium_floors": podium,
+        "tower_footprint_area": min(tower, footprint),
+        "basement_floors": int(min(_safe(basement_floors, 0, 0), MAX_FLOORS)),
+        "basement_area": round(_safe(basement_area, 100, 10), 2),
+        "basement_floor_height": round(_safe(basement_floor_height, 3.3, 2), 3),
+    }
+
+
+def content_hash(inputs: dict) -> str:
+    return calc_cache.canonical_hash({"v": GEOMETRY_VERSION, **inputs})
+
+
+# --- Mesh Building ---
+
+# (normal, 4 corners as unit-box offsets) per face, CCW seen from outside
+_BOX_FACES = [
+    ((1, 0, 0), [(1, 0, 1), (1, 0, 0), (1, 1, 0), (1, 1, 1)]),
+    ((-1, 0, 0), [(0, 0, 0), (0, 0, 1), (0, 1, 1), (0, 1, 0)]),
+    ((0, 1, 0), [(0, 1, 1), (1, 1, 1), (1, 1, 0), (0, 1, 0)]),
+    ((0, -1, 0), [(0, 0, 0), (1, 0, 0), (1, 0, 1), (0, 0, 1)]),
+    ((0, 0, 1), [(0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]),
+    ((0, 0, -1), [(1, 0, 0), (0, 0, 0), (0, 1, 0), (1, 1, 0)]),
+]
+
+
+def _box(width, y0, y1):
+    """Square box centred on the Y axis. Returns (positions, normals, indices)."""
+    h = width / 2.0
+    positions, normals, indices = array("f"), array("f"), array("H")
+    for face, (normal, corners) in enumerate(_BOX_FACES):
+        for cx, cy, cz in corners:
+            positions.extend((-h + cx * width, y0 + cy * (y1 - y0), -h + cz * width))
+            normals.extend(normal)
+        base = face * 4
+        indices.extend((base, base + 1, base + 2, base, base + 2, base + 3))
+    return positions, normals, indices
+
+
+def _floor_outlines(width, y_levels):
+    h = width / 2.0
+    corners = [(-h, -h), (h, -h), (h, h), (-h, h)]
+    positions = array("f")
+    for y in y_levels:
+        for i in range(4):
+            (x0, z0), (x1, z1) = corners[i], corners[(i + 1) % 4]
+            positions.extend((x0, y, z0, x1, y, z1))
+    return positions
+
+
+class _GlbWriter:
+    def __init__(self):
+        self.bin = bytearray()
+        self.buffer_views = []
+        self.accessors = []
+        self.meshes = []
+        self.materials = []
+        self.nodes = []
+
+    def _view(self, data: bytes, target: int) -> int:
+        while len(self.bin) % 4:
+            self.bin.append(0)
+        self.buffer_views.append({
+            "buffer": 0, "byteOffset": len(self.bin), "byteLength": len(data), "target": target,
+        })
+        self.bin.extend(data)
+        return len(self.buffer_views) - 1
+
+    def _vec3_accessor(self, values: array, with_bounds: bool) -> int:
+        accessor = {
+            "bufferView": self._view(values.tobytes(), 34962),
+            "componentType": 5126,  # FLOAT
+            "count": len(values) // 3,
+            "type": "VEC3",
+        }
+        if with_bounds:
+            accessor["min"] = [min(values[i::3]) for i in range(3)]
+            accessor["max"] = [max(values[i::3]) for i in range(3)]
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+    def _material(self, rgba, name) -> int:
+        self.materials.append({
+            "name": name,
+            "pbrMetallicRoughness": {"baseColorFactor": rgba, "metallicFactor": 0.1, "roughnessFactor": 0.5},
+            "alphaMode": "BLEND",
+            "doubleSided": True,
+        })
+        return len(self.materials) - 1
+
+    def add_box(self, name, width, y0, y1, rgba, extras):
+        positions, normals, indices = _box(width, y0, y1)
+        self.accessors.append({
+            "bufferView": self._view(indices.tobytes(), 34963),
+            "componentType": 5123,  # UNSIGNED_SHORT
+            "count": len(indices),
+            "type": "SCALAR",
+        })
+        index_accessor = len(self.accessors) - 1
+        primitive = {
+            "attributes": {
+                "POSITION": self._vec3_accessor(positions, True),
+                "NORMAL": self._vec3_accessor(normals, False),
+            },
+            "indices": index_accessor,
+            "material": self._material(rgba, name),
+            "mode": 4,  # TRIANGLES
+        }
+        self._add_node(name, primitive, extras)
+
+    def add_lines(self, name, positions: array, rgba, extras):
+        if not positions:
+            return
+        primitive = {
+            "attributes": {"POSITION": self._vec3_accessor(positions, True)},
+            "material": self._material(rgba, name),
+            "mode": 1,  # LINES
+        }
+        self._add_node(name, primitive, extras)
+
+    def _add_node(self, name, primitive, extras):
+        self.meshes.append({"name": name, "primitives": [primitive]})
+        self.nodes.append({"name": name, "mesh": len(self.meshes) - 1, "extras": extras})
+
+    def to_glb(self, extras) -> bytes:
+        while len(self.bin) % 4:
+            self.bin.append(0)
+        gltf = {
+            "asset": {"version": "2.0", "generator": "land-development-tool massing"},
+            "scene": 0,
+            "scenes": [{"nodes": list(range(len(self.nodes))), "extras": extras}],
+            "nodes": self.nodes,
+            "meshes": self.meshes,
+            "materials": self.materials,
+            "accessors": self.accessors,
+            "bufferViews": self.buffer_views,
+            "buffers": [{"byteLength": len(self.bin)}],
+        }
+        json_chunk = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+        json_chunk += b" " * (-len(json_chunk) % 4)
+        total = 12 + 8 + len(json_chunk) + 8 + len(self.bin)
+        return b"".join([
+            struct.pack("<III", 0x46546C67, 2, total),           # "glTF", version 2
+            struct.pack("<II", len(json_chunk), 0x4E4F534A),      # JSON chunk
+            json_chunk,
+            struct.pack("<II", len(self.bin), 0x004E4942),        # BIN chunk
+            bytes(self.bin),
+        ])
+
+
+def build_massing_glb(inputs: dict) -> bytes:
+    floors = inputs["floors"]
+    floor_height = inputs["floor_height"]
+    podium_floors = inputs["podium_floors"]
+    podium_width = math.sqrt(inputs["footprint_area"])
+    tower_width = math.sqrt(inputs["tower_footprint_area"])
+    height = floors * floor_height
+    podium_top = podium_floors * floor_height
+
+    writer = _GlbWriter()
+    if podium_floors:
+        writer.add_box("podium", podium_width, 0.0, podium_top, _COLOR_BUILDING, {
+            "floors": podium_floors, "height": podium_top, "plate_area": inputs["footprint_area"],
+        })
+    if floors > podium_floors:
+        writer.add_box("tower", tower_width, podium_top, height, _COLOR_BUILDING, {
+            "floors": floors - podium_floors,
+            "height": height - podium_top,
+            "plate_area": inputs["tower_footprint_area"],
+        })
+
+    levels = array("f")
+    podium_levels = [i * floor_height for i in range(1, podium_floors)]
+    tower_levels = [i * floor_height for i in range(podium_floors + 1, floors)]
+    levels.extend(_floor_outlines(podium_width, podium_levels))
+    levels.extend(_floor_outlines(tower_width, tower_levels))
+    writer.add_lines("floor_lines", levels, _COLOR_LINES, {"levels": len(podium_levels) + len(tower_levels)})
+
+    basement_floors = inputs["basement_floors"]
+    depth = basement_floors * inputs["basement_floor_height"]
+    if basement_floors:
+        writer.add_box("basement", math.sqrt(inputs["basement_area"]), -depth, 0.0, _COLOR_BASEMENT, {
+            "floors": basement_floors, "depth": depth, "plate_area": inputs["basement_area"],
+        })
+
+    return writer.to_glb({
+        "height": height,
+        "gfa": inputs["footprint_area"] * podium_floors + inputs["tower_footprint_area"] * (floors - podium_floors),
+        "basement_depth": depth,
+        "inputs": inputs,
+    })
+
+
+# --- Cache ---
+
+_cache = calc_cache.LruCache("massing", config.MASSING_CACHE_SIZE)
+
+
+def get_massing_glb(inputs: dict):
+    """Returns (content hash, GLB bytes), building on cache miss."""
+    key = content_hash(inputs)
+    glb = _cache.get(key)
+    if glb is None:
+        glb = build_massing_glb(inputs)
+        _cache.put(key, glb)
+    return key, glb
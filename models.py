@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, JSON, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
+from json_blobs import BlobRef
 
 class Project(Base):
     __tablename__ = "projects"
+    # Ids of projects moved to cold storage must not be handed out again
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
@@ -33,15 +36,15 @@ class Project(Base):
     bonus_cap = Column(Float, default=100.0)
 
     # Bonus Details (JSON)
-    central_bonus_details = Column(JSON, default={})
-    local_bonus_details = Column(JSON, default={})
-    disaster_bonus_details = Column(JSON, default={})
-    chloride_bonus_details = Column(JSON, default={})
-    tod_reward_bonus_details = Column(JSON, default={})
-    tod_increment_bonus_details = Column(JSON, default={})
+    central_bonus_details = Column(BlobRef, default={})
+    local_bonus_details = Column(BlobRef, default={})
+    disaster_bonus_details = Column(BlobRef, default={})
+    chloride_bonus_details = Column(BlobRef, default={})
+    tod_reward_bonus_details = Column(BlobRef, default={})
+    tod_increment_bonus_details = Column(BlobRef, default={})
 
     # Site Config
-    site_config = Column(JSON, default={})
+    site_config = Column(BlobRef, default={})
 
     # Massing Assessment Fields
     massing_design_coverage = Column(Float, default=45.0)
@@ -69,13 +72,19 @@ class Project(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Delta sync: sync_state.seq of the transaction that last wrote this row (see sync.py)
+    change_seq = Column(Integer, default=0, index=True)
+
     land_parcels = relationship("LandParcel", back_populates="project")
+    # Materialized rollups (project_summary.py); joined into every project SELECT
+    summary = relationship("ProjectSummary", uselist=False, lazy="joined", viewonly=True)
 
 class LandParcel(Base):
     __tablename__ = "land_parcels"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True)
     section_name = Column(String)
     lot_number = Column(String)
     area_m2 = Column(Float)
@@ -94,4 +103,158 @@ class LandParcel(Base):
     integration_risk = Column(String, default="unknown")
     include_in_site = Column(Integer, default=1)
 
+    # Geometry (WGS84 polygon, compact binary encoding - see spatial.py)
+    # Bounding box columns are mirrored into the land_parcels_rtree R-tree by triggers.
+    geom = Column(LargeBinary, nullable=True)
+    min_x = Column(Float, nullable=True)
+    min_y = Column(Float, nullable=True)
+    max_x = Column(Float, nullable=True)
+    max_y = Column(Float, nullable=True)
+    perimeter_m = Column(Float, nullable=True)
+
+    # Change Tracking (delta sync, see sync.py)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    change_seq = Column(Integer, default=0, index=True)
+
     project = relationship("Project", back_populates="land_parcels")
+
+class ParcelAdjacency(Base):
+    # Undirected edge between two parcels sharing a boundary (parcel_a < parcel_b).
+    # Maintained by adjacency.py; see there for tolerances.
+    __tablename__ = "parcel_adjacency"
+
+    parcel_a = Column(Integer, ForeignKey("land_parcels.id"), primary_key=True)
+    parcel_b = Column(Integer, ForeignKey("land_parcels.id"), primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True)
+    shared_length_m = Column(Float, default=0.0)
+
+class ChangeLog(Base):
+    # Append-only change feed for projects/parcels; written by change_feed.py
+    # in the same transaction as the change itself.
+    __tablename__ = "change_log"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String, nullable=False)  # "project" | "parcel"
+    entity_id = Column(Integer, nullable=False)
+    project_id = Column(Integer, index=True)
+    op = Column(String, nullable=False)  # "create" | "update" | "delete"
+    changes = Column(JSON, default={})  # field -> new value (create/update)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class SyncState(Base):
+    # Single-row counter (id=1) handing out change sequence numbers for delta sync
+    __tablename__ = "sync_state"
+
+    id = Column(Integer, primary_key=True)
+    seq = Column(Integer, default=0, nullable=False)
+
+class Tombstone(Base):
+    # Deleted projects/parcels, written by triggers (see sync.py)
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String, nullable=False)  # "project" | "parcel"
+    entity_id = Column(Integer, nullable=False)
+    project_id = Column(Integer)
+    change_seq = Column(Integer, nullable=False, index=True)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ProjectSummary(Base):
+    # One row per project, rebuilt on every parcel write (see project_summary.py)
+    __tablename__ = "project_summary"
+
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    parcel_count = Column(Integer, default=0)
+    included_count = Column(Integer, default=0)
+    verified_count = Column(Integer, default=0)
+    total_area_m2 = Column(Float, default=0.0)
+    included_area_m2 = Column(Float, default=0.0)
+    excluded_area_m2 = Column(Float, default=0.0)
+    # Sum of area_m2 * announced_value
+    announced_value_total = Column(Float, default=0.0, index=True)
+    included_announced_value = Column(Float, default=0.0)
+    # Weighted caps of the site parcels (area * bcr_limit / far_limit)
+    max_footprint_m2 = Column(Float, default=0.0)
+    max_gfa_m2 = Column(Float, default=0.0)
+    missing_far_count = Column(Integer, default=0)
+    # {zoning_type: {count, included_count, area_m2, included_area_m2, max_footprint_m2, max_gfa_m2, announced_value_total}}
+    zoning = Column(JSON, default={})
+    ownership_mix = Column(JSON, default={})  # {ownership_status: count}
+    tenure_mix = Column(JSON, default={})  # {tenure: count}
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class Scenario(Base):
+    # Alternative parameter set for a project, stored as a diff against the
+    # project row (see scenarios.py). Removed with its project by a trigger.
+    __tablename__ = "scenarios"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True, nullable=False)
+    name = Column(String, nullable=False)
+    # {projects column: value}; JSON columns hold a merge patch of the project's value
+    diff = Column(JSON, default={})
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class CalcCacheEntry(Base):
+    # Persisted calc_engine outputs (CALC_CACHE_PERSIST=1, see calc_cache.py).
+    # Rows are deleted by triggers when their project or its parcels change.
+    __tablename__ = "calc_cache"
+
+    key = Column(String, primary_key=True)  # SHA-256 of the normalized input
+    project_id = Column(Integer, index=True)
+    calculation_version = Column(String, nullable=False)
+    # {output name: [value per parameter set]}
+    outputs = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ColdProject(Base):
+    # Archived project moved out of the hot tables (see cold_storage.py). The
+    # list columns are copies; everything else is in the compressed payload.
+    __tablename__ = "cold_projects"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # the project's id
+    name = Column(String, index=True)
+    is_pinned = Column(Integer, default=0)
+    archived_at = Column(DateTime(timezone=True))
+    last_opened_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True))
+    total_area_m2 = Column(Float, default=0.0)
+    announced_value_total = Column(Float, default=0.0)
+    parcel_count = Column(Integer, default=0)
+    raw_bytes = Column(Integer, default=0)
+    # zlib(JSON {project, parcels, adjacency, scenarios})
+    payload = Column(LargeBinary, nullable=False)
+    frozen_at = Column(DateTime(timezone=True))
+
+
+class ColdParcel(Base):
+    # Parcel id -> project in cold storage, so parcel routes can restore it
+    __tablename__ = "cold_parcels"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    project_id = Column(Integer, index=True, nullable=False)
+
+
+class JsonBlob(Base):
+    # Project JSON documents stored once by content hash (see json_blobs.py).
+    # refcount is maintained by triggers on projects.
+    __tablename__ = "json_blobs"
+
+    hash = Column(String, primary_key=True)
+    body = Column(String, nullable=False)  # canonical JSON
+    size = Column(Integer, default=0)
+    refcount = Column(Integer, default=0)
+
+
+
+class NlscSection(Base):
+    # NLSC section list of one district (see nlsc.py); [[name, code], ...] in upstream order
+    __tablename__ = "nlsc_sections"
+
+    town_code = Column(String, primary_key=True)
+    sections = Column(JSON, nullable=False)
+    fetched_at = Column(DateTime(timezone=True))
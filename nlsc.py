@@ -0,0 +1,223 @@
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+
+import requests
+import urllib3
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+import calc_cache
+import config
+import models
+from database import engine, read_engine
+
+# NLSC (內政部國土測繪中心) land lookups, shared by GET /proxy/land-info and
+# landtool.
+#
+#   ListLandSection/A/{town}   section name -> section code, per district
+#   ParcelQuery                area / announced value of one lot
+#
+# Section lists barely change, yet every lookup used to fetch the whole list
+# for its district first. They are now kept per town for
+# NLSC_SECTION_TTL_DAYS: in process (LruCache "nlsc_sections") and in the
+# nlsc_sections table, which `landtool warm` fills ahead of time and every
+# worker shares. A lookup on a warm district is a single upstream call.
+#
+# Failures raise LookupFailed(status_code, detail); the proxy turns it into
+# the HTTPException it always answered with.
+
+logger = logging.getLogger("nlsc")
+
+# Upstream certificate chain does not verify in the dev environment; verify=False
+# is deliberate, so don't write a warning per request.
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+CITY_CODE = "A"  # Taipei City
+
+TAIPEI_DISTRICTS = {
+    "松山區": "A01", "大安區": "A02", "中正區": "A03", "萬華區": "A05",
+    "大同區": "A09", "中山區": "A10", "文山區": "A11", "南港區": "A13",
+    "內湖區": "A14", "士林區": "A15", "北投區": "A16", "信義區": "A17"
+}
+
+SECTION_LIST_URL = "https://api.nlsc.gov.tw/other/ListLandSection/A/{town_code}"
+PARCEL_QUERY_URL = "https://api.nlsc.gov.tw/other/ParcelQuery"
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+class LookupFailed(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    # One keep-alive session per thread (landtool runs lookups in a pool)
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+        session.headers.update(HEADERS)
+        session.verify = False
+    return session
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# --- Section codes ---
+
+_sections = calc_cache.LruCache("nlsc_sections", 64)
+
+
+def _fresh(fetched_at) -> bool:
+    return fetched_at is not None and _utcnow() - fetched_at < timedelta(days=config.NLSC_SECTION_TTL_DAYS)
+
+
+def fetch_sections(town_code: str) -> list:
+    """[(section name, section code), ...] in upstream order, straight from NLSC."""
+    # API Note: Originally attempted ListTownSection but it returned 404 in app context.
+    # Switching to ListLandSection which is verified to work.
+    response = _session().get(SECTION_LIST_URL.format(town_code=town_code), timeout=config.NLSC_TIMEOUT_S)
+    response.raise_for_status()
+    root = ET.fromstring(response.content)
+    sections = []
+    for item in root.findall(".//sectItem"):
+        name_elem = item.find("sectstr")
+        code_elem = item.find("sectcode")
+        if name_elem is not None and code_elem is not None and name_elem.text and code_elem.text:
+            sections.append((name_elem.text.strip(), code_elem.text.strip()))
+    logger.debug("found %d sections for town %s", len(sections), town_code)
+    return sections
+
+
+def _load_sections(town_code):
+    try:
+        with read_engine.connect() as conn:
+            row = conn.execute(
+                select(models.NlscSection.sections, models.NlscSection.fetched_at)
+                .where(models.NlscSection.town_code == town_code)
+            ).first()
+    except SQLAlchemyError:
+        return None
+    if row is None or not _fresh(row.fetched_at):
+        return None
+    return [tuple(pair) for pair in row.sections], row.fetched_at
+
+
+def _store_sections(town_code, sections, fetched_at):
+    values = {"town_code": town_code, "sections": sections, "fetched_at": fetched_at}
+    statement = insert(models.NlscSection).values(values)
+    try:
+        with engine.begin() as conn:
+            conn.execute(statement.on_conflict_do_update(
+                index_elements=["town_code"],
+                set_={"sections": statement.excluded.sections, "fetched_at": statement.excluded.fetched_at},
+            ))
+    except SQLAlchemyError:
+        logger.warning("could not store sections of %s", town_code, exc_info=True)
+
+
+def sections(town_code: str, refresh: bool = False) -> list:
+    """Section list of a town through the in-process and table caches."""
+    if not refresh:
+        cached = _sections.get(town_code)
+        if cached is not None and _fresh(cached[1]):
+            return cached[0]
+        cached = _load_sections(town_code)
+        if cached is not None:
+            _sections.put(town_code, cached)
+            return cached[0]
+    fetched = fetch_sections(town_code)
+    fetched_at = _utcnow()
+    _store_sections(town_code, [list(pair) for pair in fetched], fetched_at)
+    _sections.put(town_code, (fetched, fetched_at))
+    return fetched
+
+
+def find_section_code(town_code: str, section_name: str) -> str:
+    """Exact section name match, else the first section containing the name; None if neither."""
+    try:
+        candidates = sections(town_code)
+    except (requests.RequestException, ET.ParseError) as e:
+        logger.warning("section lookup error: %s", e, extra={"town_code": town_code})
+        return None
+
+    input_name = section_name.strip()
+    best_fuzzy_match = None
+    for api_name, code in candidates:
+        # Exact Match (Priority)
+        if api_name == input_name:
+            logger.debug("exact section code %s for %s", code, section_name)
+            return code
+        # Fuzzy Match (Fallback) - Store the first one found
+        if input_name in api_name and best_fuzzy_match is None:
+            best_fuzzy_match = code
+            logger.debug("fuzzy section candidate %s (%s)", api_name, code)
+    return best_fuzzy_match
+
+
+# --- Parcel lookup ---
+
+def format_lot_number(lot_no: str) -> str:
+    """"265" -> "02650000", "265-3" -> "02650003"; ValueError if malformed."""
+    if "-" in lot_no:
+        main, sub = lot_no.split("-")
+        return f"{int(main):04d}{int(sub):04d}"
+    return f"{int(lot_no):04d}0000"
+
+
+def land_info(lot_no: str, section_name: str, district: str) -> dict:
+    """{"area", "price"} of one lot (m2, announced value per m2). Raises LookupFailed."""
+    town = TAIPEI_DISTRICTS.get(district)
+    if not town:
+        raise LookupFailed(400, f"目前僅支援台北市 (Received: {district})")
+    sect_code = find_section_code(town, section_name)
+    if not sect_code:
+        raise LookupFailed(400, f"Section '{section_name}' not supported or found in {district}.")
+    try:
+        formatted_lot_no = format_lot_number(lot_no)
+    except ValueError:
+        raise LookupFailed(400, "Invalid lot number format.")
+
+    params = {"lcode": CITY_CODE, "tcode": town, "scode": sect_code, "lodcode": formatted_lot_no}
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("parcel query", extra={"url": requests.Request('GET', PARCEL_QUERY_URL, params=params).prepare().url})
+
+    try:
+        response = _session().get(PARCEL_QUERY_URL, params=params, timeout=config.NLSC_TIMEOUT_S)
+        if response.status_code != 200:
+            logger.warning("parcel query failed", extra={"status": response.status_code, "body": response.text[:500]})
+        response.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        if e.response.status_code == 404:
+            raise LookupFailed(404, "Parcel not found in external API.")
+        raise LookupFailed(500, f"External API error: {str(e)}")
+    except requests.RequestException as e:
+        raise LookupFailed(500, f"External API error: {str(e)}")
+
+    try:
+        root = ET.fromstring(response.content)
+    except ET.ParseError:
+        logger.warning("parcel query returned unparseable XML", extra={"body": response.text[:500]})
+        raise LookupFailed(500, "Failed to parse external API response.")
+    area_elem = root.find(".//area")
+    price_elem = root.find(".//price")
+    if area_elem is None or price_elem is None:
+        # Sometimes the API returns 200 but with empty or error XML
+        logger.warning("parcel query returned no area/price", extra={"body": response.text[:500]})
+        raise LookupFailed(404, "Data not found in external API response.")
+    return {
+        "area": float(area_elem.text),
+        "price": float(price_elem.text)
+    }
@@ -0,0 +1,96 @@
+import base64
+import json
+
+from sqlalchemy import and_, func, or_, select
+
+import models
+
+# Parcel listing (keyset pagination), so large consolidation projects do not
+# have to ship every parcel on each read. Per-project aggregates live in
+# project_summary.py.
+
+# sort key -> (column, placeholder used for NULLs so keyset comparison stays total)
+SORTABLE_COLUMNS = {
+    "id": (models.LandParcel.id, None),
+    "lot_number": (models.LandParcel.lot_number, ""),
+    "section_name": (models.LandParcel.section_name, ""),
+    "zoning_type": (models.LandParcel.zoning_type, ""),
+    "area_m2": (models.LandParcel.area_m2, -1e300),
+    "announced_value": (models.LandParcel.announced_value, -1e300),
+}
+
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(sort_value, parcel_id: int) -> str:
+    raw = json.dumps([sort_value, parcel_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        sort_value, parcel_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return sort_value, int(parcel_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def list_parcels(db, project_id: int, limit: int = 100, cursor: str = None,
+                 sort: str = "id", order: str = "asc", filters: dict = None,
+                 with_total: bool = False):
+    """One page of a project's parcels.
+
+    Keyset pagination on (sort column, id): each page is an index range scan
+    from the cursor, so page N costs the same as page 1.
+    """
+    if sort not in SORTABLE_COLUMNS:
+        raise ValueError(f"sort must be one of {sorted(SORTABLE_COLUMNS)}")
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be 'asc' or 'desc'")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    column, null_placeholder = SORTABLE_COLUMNS[sort]
+    sort_expr = column if null_placeholder is None else func.coalesce(column, null_placeholder)
+    id_col = models.LandParcel.id
+
+    conditions = [models.LandParcel.project_id == project_id]
+    for key, value in (filters or {}).items():
+        if value is None:
+            continue
+        if key in ("include_in_site", "is_verified"):
+            value = 1 if value else 0
+        conditions.append(getattr(models.LandParcel, key) == value)
+
+    total = None
+    if with_total:
+        total = db.execute(select(func.count()).select_from(models.LandParcel).where(*conditions)).scalar_one()
+
+    stmt = select(models.LandParcel).where(*conditions)
+    if cursor:
+        after_value, after_id = decode_cursor(cursor)
+        if sort == "id":
+            stmt = stmt.where(id_col > after_id if order == "asc" else id_col < after_id)
+        elif order == "asc":
+            stmt = stmt.where(or_(sort_expr > after_value, and_(sort_expr == after_value, id_col > after_id)))
+        else:
+            stmt = stmt.where(or_(sort_expr < after_value, and_(sort_expr == after_value, id_col < after_id)))
+
+    if order == "asc":
+        stmt = stmt.order_by(sort_expr.asc(), id_col.asc())
+    else:
+        stmt = stmt.order_by(sort_expr.desc(), id_col.desc())
+
+    # Fetch one extra row to know whether there is a next page
+    rows = db.execute(stmt.limit(limit + 1)).scalars().all()
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        last_value = getattr(last, sort)
+        if last_value is None:
+            last_value = null_placeholder
+        next_cursor = encode_cursor(last_value, last.id)
+
+    return {"items": items, "next_cursor": next_cursor, "total": total}
+
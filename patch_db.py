@@ -1,15 +1,83 @@
+import logging
 import sqlite3
 import os
 
-DB_FILE = "./sql_app.db"
+from spatial import ensure_spatial_index
+from adjacency import ensure_adjacency_triggers
+from sync import ensure_sync_triggers
+from project_summary import ensure_project_summaries
+from scenarios import ensure_scenario_triggers
+from calc_cache import ensure_calc_cache
+from json_blobs import ensure_json_blobs
+from cold_storage import ensure_autoincrement_ids
+from database import engine
+
+DB_FILE = engine.url.database
+
+logger = logging.getLogger("patch_db")
+
+LEGACY_PROJECT_COLUMNS = [
+    # Bonus fields
+    ("bonus_central", "FLOAT DEFAULT 30.0"),
+    ("bonus_local", "FLOAT DEFAULT 20.0"),
+    ("bonus_other", "FLOAT DEFAULT 0.0"),
+    ("bonus_soil_mgmt", "FLOAT DEFAULT 0.0"),
+    ("bonus_tod_reward", "FLOAT DEFAULT 0.0"),
+    ("bonus_tod_increment", "FLOAT DEFAULT 0.0"),
+    ("bonus_chloride", "FLOAT DEFAULT 0.0"),
+    ("bonus_public_exemption", "FLOAT DEFAULT 7.98"),
+    ("bonus_cap", "FLOAT DEFAULT 100.0"),
+    ("bonus_tod", "FLOAT DEFAULT 0.0"),
+    # JSON documents (inline here, moved to json_blobs in step 12)
+    ("central_bonus_details", "TEXT DEFAULT '{}'"),
+    ("local_bonus_details", "TEXT DEFAULT '{}'"),
+    ("disaster_bonus_details", "TEXT DEFAULT '{}'"),
+    ("chloride_bonus_details", "TEXT DEFAULT '{}'"),
+    ("tod_reward_bonus_details", "TEXT DEFAULT '{}'"),
+    ("tod_increment_bonus_details", "TEXT DEFAULT '{}'"),
+    ("site_config", "TEXT"),
+    # Massing fields
+    ("massing_design_coverage", "FLOAT DEFAULT 45.0"),
+    ("massing_exemption_coef", "FLOAT DEFAULT 1.15"),
+    ("massing_public_ratio", "FLOAT DEFAULT 33.0"),
+    ("massing_me_rate", "FLOAT DEFAULT 15.0"),
+    ("massing_stair_rate", "FLOAT DEFAULT 10.0"),
+    ("massing_balcony_rate", "FLOAT DEFAULT 5.0"),
+    # Basement fields
+    ("basement_legal_parking", "INTEGER DEFAULT 0"),
+    ("basement_bonus_parking", "INTEGER DEFAULT 0"),
+    ("basement_excavation_rate", "FLOAT DEFAULT 70.0"),
+    ("basement_parking_space_area", "FLOAT DEFAULT 40.0"),
+    ("basement_floor_height", "FLOAT DEFAULT 3.3"),
+    ("basement_motorcycle_unit_area", "FLOAT DEFAULT 4.0"),
+    ("basement_legal_motorcycle", "INTEGER DEFAULT 0"),
+    # Usage mix fields
+    ("usage_residential_rate", "FLOAT DEFAULT 60.0"),
+    ("usage_commercial_rate", "FLOAT DEFAULT 30.0"),
+    ("usage_agency_rate", "FLOAT DEFAULT 10.0"),
+]
+
+LEGACY_PARCEL_COLUMNS = [
+    ("district", "VARCHAR"),
+    ("legal_coverage_rate", "FLOAT DEFAULT 0.0"),
+    ("legal_floor_area_rate", "FLOAT DEFAULT 0.0"),
+    ("tenure", "VARCHAR DEFAULT '未確認'"),
+    ("is_verified", "INTEGER DEFAULT 0"),
+    ("bcr_limit", "FLOAT"),
+    ("far_limit", "FLOAT"),
+    ("ownership_status", "VARCHAR DEFAULT '未確認'"),
+    ("integration_risk", "VARCHAR DEFAULT 'unknown'"),
+    ("include_in_site", "INTEGER DEFAULT 1"),
+]
 
 def patch_db():
     if not os.path.exists(DB_FILE):
-        print(f"Skipping DB patch: {DB_FILE} not found.")
+        logger.info("Skipping DB patch: %s not found.", DB_FILE)
         return
 
-    print(f"Checking DB schema for projects table in {DB_FILE}...")
-    conn = sqlite3.connect(DB_FILE)
+    logger.info("Checking DB schema for projects table in %s...", DB_FILE)
+    # Other workers may be starting up (and patching) at the same time
+    conn = sqlite3.connect(DB_FILE, timeout=30)
     cursor = conn.cursor()
     
     try:
@@ -19,39 +87,102 @@ def patch_db():
         columns_info = cursor.fetchall()
         existing_columns = [col[1] for col in columns_info]
         
+        # 0. Columns from before patch_db (formerly migrate_db.py, add_*_columns.py, patch_site_config.py)
+        for col, definition in LEGACY_PROJECT_COLUMNS:
+            if col not in existing_columns:
+                logger.info("Adding column: %s", col)
+                cursor.execute(f"ALTER TABLE projects ADD COLUMN {col} {definition}")
+        cursor.execute("PRAGMA table_info(land_parcels)")
+        legacy_parcel_columns = [col[1] for col in cursor.fetchall()]
+        for col, definition in LEGACY_PARCEL_COLUMNS:
+            if col not in legacy_parcel_columns:
+                logger.info("Adding column: land_parcels.%s", col)
+                cursor.execute(f"ALTER TABLE land_parcels ADD COLUMN {col} {definition}")
+
         # 1. is_pinned (INTEGER DEFAULT 0)
         if "is_pinned" not in existing_columns:
-            print("Adding column: is_pinned")
+            logger.info("Adding column: is_pinned")
             cursor.execute("ALTER TABLE projects ADD COLUMN is_pinned INTEGER DEFAULT 0")
         
         # 2. archived_at (DATETIME/TEXT NULLABLE)
         if "archived_at" not in existing_columns:
-            print("Adding column: archived_at")
+            logger.info("Adding column: archived_at")
             cursor.execute("ALTER TABLE projects ADD COLUMN archived_at TEXT")
             
         # 3. last_opened_at (DATETIME/TEXT NULLABLE)
         if "last_opened_at" not in existing_columns:
-            print("Adding column: last_opened_at")
+            logger.info("Adding column: last_opened_at")
             cursor.execute("ALTER TABLE projects ADD COLUMN last_opened_at TEXT")
             
         # 4. updated_at (DATETIME/TEXT NULLABLE)
         if "updated_at" not in existing_columns:
-            print("Adding column: updated_at")
+            logger.info("Adding column: updated_at")
             cursor.execute("ALTER TABLE projects ADD COLUMN updated_at TEXT")
             
             # Backfill updated_at with created_at if created_at exists
             if "created_at" in existing_columns:
-                print("Backfilling updated_at from created_at...")
+                logger.info("Backfilling updated_at from created_at...")
                 cursor.execute("UPDATE projects SET updated_at = created_at WHERE updated_at IS NULL")
 
+        # 5. land_parcels.project_id index (project detail / total area queries)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_land_parcels_project_id ON land_parcels (project_id)")
+
+        # 6. land_parcels geometry + bbox columns, R-tree index and its sync triggers
+        cursor.execute("PRAGMA table_info(land_parcels)")
+        parcel_columns = [col[1] for col in cursor.fetchall()]
+        for col, definition in [
+            ("geom", "BLOB"),
+            ("min_x", "FLOAT"),
+            ("min_y", "FLOAT"),
+            ("max_x", "FLOAT"),
+            ("max_y", "FLOAT"),
+            ("perimeter_m", "FLOAT"),
+        ]:
+            if col not in parcel_columns:
+                logger.info("Adding column: land_parcels.%s", col)
+                cursor.execute(f"ALTER TABLE land_parcels ADD COLUMN {col} {definition}")
+        ensure_spatial_index(cursor)
+
+        # 7. parcel_adjacency cleanup trigger (table itself comes from create_all)
+        ensure_adjacency_triggers(cursor)
+
+        # 8. Delta sync: change_seq on projects/parcels, parcel updated_at, tombstone triggers
+        if "change_seq" not in existing_columns:
+            logger.info("Adding column: change_seq")
+            cursor.execute("ALTER TABLE projects ADD COLUMN change_seq INTEGER DEFAULT 0")
+        for col, definition in [("updated_at", "TEXT"), ("change_seq", "INTEGER DEFAULT 0")]:
+            if col not in parcel_columns:
+                logger.info("Adding column: land_parcels.%s", col)
+                cursor.execute(f"ALTER TABLE land_parcels ADD COLUMN {col} {definition}")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_projects_change_seq ON projects (change_seq)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_land_parcels_change_seq ON land_parcels (change_seq)")
+        ensure_sync_triggers(cursor)
+
+        # 9. project_summary cleanup trigger + backfill (table itself comes from create_all)
+        ensure_project_summaries(cursor)
+
+        # 10. scenarios cleanup trigger (table itself comes from create_all)
+        ensure_scenario_triggers(cursor)
+
+        # 11. calc_cache invalidation triggers + stale-version purge (table itself comes from create_all)
+        ensure_calc_cache(cursor)
+
+        # 12. Content-addressed JSON documents: inline -> json_blobs, refcounts, triggers
+        ensure_json_blobs(cursor)
+
+        # 13. AUTOINCREMENT ids on projects / land_parcels, so cold-storage ids are never reused
+        ensure_autoincrement_ids(cursor)
+
         conn.commit()
-        print("DB Patch completed successfully.")
+        logger.info("DB Patch completed successfully.")
         
     except Exception as e:
-        print(f"DB Patch failed: {e}")
+        logger.exception("DB Patch failed: %s", e)
         conn.rollback()
     finally:
         conn.close()
 
 if __name__ == "__main__":
+    import structured_log
+    structured_log.setup()
     patch_db()
@@ -0,0 +1,155 @@
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import parse_qs
+
+import config
+import structured_log
+
+# Opt-in per-request profiler.
+#
+# A request is profiled when it carries `X-Profile: 1` or `?profile=1` AND the
+# server runs with PROFILING_ENABLED=1. While the request is in flight a sampler
+# thread snapshots every thread's Python stack (wall clock), so time spent in
+# SQL, response validation/serialization (FastAPI runs it in the threadpool)
+# and blocking upstream calls all show up.
+#
+# Output:
+#   - `X-Profile-Summary` response header (total ms, sample count, top frames)
+#   - `<PROFILE_DIR>/<request_id>.folded` (the id from structured_log's X-Request-ID): collapsed stacks, one line per stack
+#     ("frame;frame;frame count"), loadable by flamegraph.pl / speedscope.
+#
+# Note: the sampler sees the whole process. On a busy server, concurrent
+# requests show up in the profile too; use it on a quiet instance.
+
+# Innermost frames that mean "this thread is parked", not doing request work.
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope.get("headers", []):
+        if name == b"x-profile":
+            return value.strip() in (b"1", b"true")
+    query = scope.get("query_string", b"")
+    if b"profile=" in query:
+        values = parse_qs(query.decode("latin-1")).get("profile", [])
+        return bool(values) and values[-1] in ("1", "true")
+    return False
+
+
+logger = logging.getLogger("profiling")
+
+
+def _request_id() -> str:
+    # Set by structured_log.RequestIdMiddleware, which also echoes it as X-Request-ID
+    return structured_log.current_request_id() or uuid.uuid4().hex
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        # stacks is written by the sampler thread and read from the event loop
+        # (summary header) while sampling continues
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.is_set():
+            sample = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                sample.append(";".join(stack))
+            with self._lock:
+                self.stacks.update(sample)
+                self.samples += 1
+            self._stop.wait(self.interval)
+
+    def snapshot(self):
+        """(stacks copy, sample count), safe while the sampler is running."""
+        with self._lock:
+            return Counter(self.stacks), self.samples
+
+    def top_frames(self, n: int = 3):
+        # Self time: attribute each sampled stack to its innermost frame.
+        stacks, _ = self.snapshot()
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [(label, count * 100.0 / total) for label, count in leaves.most_common(n)]
+
+    def write_folded(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.snapshot()[0].most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that samples a request only when asked to.
+
+    Only installed when config.PROFILING_ENABLED is set, so a normal
+    deployment does not pay for it at all.
+    """
+
+    def __init__(self, app, profile_dir: str = None, interval_ms: float = None):
+        self.app = app
+        self.profile_dir = profile_dir or config.PROFILE_DIR
+        self.interval = (interval_ms or config.PROFILE_INTERVAL_MS) / 1000.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _request_id()
+        sampler = _Sampler(self.interval)
+        started = time.perf_counter()
+        sampler.start()
+
+        async def send_with_summary(message):
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                top = ",".join(f"{label} {pct:.0f}%" for label, pct in sampler.top_frames())
+                summary = f"total={elapsed_ms:.1f}ms;samples={sampler.snapshot()[1]};top={top}"
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-summary", summary.encode("latin-1", "replace")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_summary)
+        finally:
+            sampler.stop()
+            try:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                sampler.write_folded(os.path.join(self.profile_dir, f"{request_id}.folded"))
+            except OSError as e:
+                logger.warning("failed to write profile %s: %s", request_id, e)
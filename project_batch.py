@@ -0,0 +1,128 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, delete, select, update
+
+import change_feed
+import cold_storage
+import models
+import sync
+
+# POST /projects/batch: many project management operations in one request.
+#
+# Operations (pin/unpin and other field edits are plain "update"):
+#   update   set the given ProjectUpdate fields
+#   archive  archived_at = now
+#   restore  archived_at = NULL
+#   delete   remove the project and its parcels
+#
+# Everything is applied in one transaction with one commit. Updates are
+# grouped by the set of fields they touch and each group is a single
+# executemany UPDATE; deletes are two IN (...) DELETEs. Per-item outcomes come
+# back in request order; unknown ids are reported, not fatal. An id may
+# appear only once per batch, since grouped statements do not keep request
+# order.
+
+MAX_BATCH_SIZE = 1000
+
+_projects = models.Project.__table__
+_parcels = models.LandParcel.__table__
+
+
+def _utcnow():
+    # Naive UTC, same as SQLite CURRENT_TIMESTAMP used by the func.now() columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def apply_batch(db, operations, discard_touch=None):
+    """Apply a list of schemas.ProjectBatchOperation. Returns per-item results.
+
+    discard_touch(project_id) is called for every project whose last_opened_at
+    is set explicitly or that is deleted, so a buffered touch (touch_buffer)
+    cannot overwrite it on the next flush.
+
+    Raises ValueError for an oversized batch. Does not commit.
+    """
+    if len(operations) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} operations per batch")
+
+    ids = {op.id for op in operations}
+    existing = set(db.execute(select(_projects.c.id).where(_projects.c.id.in_(ids))).scalars()) if ids else set()
+    # Projects in cold storage are restored first (keeping their id, or reported as not found)
+    for project_id in ids - existing:
+        if cold_storage.thaw(db, project_id) == project_id:
+            existing.add(project_id)
+
+    results = []
+    seen = set()
+    updates = {}  # tuple(sorted field names) -> [params]
+    deletes = []
+    now = _utcnow()
+    for op in operations:
+        outcome = {"id": op.id, "op": op.op, "status": "ok", "error": None}
+        results.append(outcome)
+        if op.id in seen:
+            outcome.update(status="error", error="Duplicate project id in batch")
+            continue
+        seen.add(op.id)
+        if op.id not in existing:
+            outcome.update(status="not_found", error="Project not found")
+            continue
+
+        if op.op == "delete":
+            deletes.append(op.id)
+            if discard_touch is not None:
+                discard_touch(op.id)
+            continue
+        if op.op == "archive":
+            values = {"archived_at": now}
+        elif op.op == "restore":
+            values = {"archived_at": None}
+        else:
+            values = op.fields.dict(exclude_unset=True) if op.fields else {}
+            if not values:
+                outcome.update(status="error", error="No fields to update")
+                continue
+            if "last_opened_at" in values and discard_touch is not None:
+                discard_touch(op.id)
+        updates.setdefault(tuple(sorted(values)), []).append((op.id, values))
+
+    if not updates and not deletes:
+        return results
+
+    # One sequence number for the whole batch (Core statements skip the flush hook)
+    seq = sync.next_seq(db.connection())
+    events = []
+    for fields, items in updates.items():
+        stmt = (
+            update(_projects)
+            .where(_projects.c.id == bindparam("_id"))
+            .values({
+                **{name: bindparam(f"v_{name}") for name in fields},
+                "updated_at": now,
+                "change_seq": seq,
+            })
+        )
+        db.execute(stmt, [
+            {"_id": pid, **{f"v_{name}": value for name, value in values.items()}}
+            for pid, values in items
+        ])
+        events.extend({
+            "entity": "project", "entity_id": pid, "project_id": pid,
+            "op": "update", "changes": {**values, "updated_at": now},
+        } for pid, values in items)
+
+    if deletes:
+        # Triggers take care of tombstones, the R-tree and adjacency edges
+        deleted_parcels = db.execute(
+            delete(_parcels).where(_parcels.c.project_id.in_(deletes)).returning(_parcels.c.id, _parcels.c.project_id)
+        ).all()
+        db.execute(delete(_projects).where(_projects.c.id.in_(deletes)))
+        events.extend({
+            "entity": "parcel", "entity_id": parcel_id, "project_id": pid, "op": "delete", "changes": {},
+        } for parcel_id, pid in deleted_parcels)
+        events.extend({
+            "entity": "project", "entity_id": pid, "project_id": pid, "op": "delete", "changes": {},
+        } for pid in deletes)
+
+    change_feed.note_changes(db, events)
+    return results
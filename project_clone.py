@@ -0,0 +1,117 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, literal, null, select
+
+import change_feed
+import models
+import sync
+
+# POST /projects/{id}/clone: copy a project (scenario fork) server-side.
+#
+# The project row with all its JSON configuration, the selected parcels and
+# the adjacency edges between them are copied with set-based statements in
+# the caller's transaction:
+#
+#   INSERT INTO projects (...)     SELECT ... FROM projects WHERE id = :src
+#   INSERT INTO land_parcels (...) SELECT ... FROM land_parcels WHERE project_id = :src AND <filters>
+#   parcel_adjacency               one executemany over the remapped edges
+#
+# Geometry and bbox columns are copied as-is; the R-tree insert trigger
+# indexes the new rows. Overrides replace single columns in the SELECT list,
+# so nothing is read into Python except the new parcel ids.
+
+_projects = models.Project.__table__
+_parcels = models.LandParcel.__table__
+_adjacency = models.ParcelAdjacency.__table__
+
+# Project columns that describe the source's history, not its content
+_PROJECT_RESET = {"id", "is_pinned", "archived_at", "last_opened_at", "created_at", "updated_at", "change_seq"}
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _parcel_filters(filters):
+    conditions = []
+    if filters.parcel_ids is not None:
+        conditions.append(_parcels.c.id.in_(filters.parcel_ids))
+    if filters.zoning_types is not None:
+        conditions.append(_parcels.c.zoning_type.in_(filters.zoning_types))
+    if filters.include_in_site is not None:
+        conditions.append(_parcels.c.include_in_site == (1 if filters.include_in_site else 0))
+    if filters.is_verified is not None:
+        conditions.append(_parcels.c.is_verified == (1 if filters.is_verified else 0))
+    return conditions
+
+
+def clone_project(db, source_id: int, request):
+    """Copy project `source_id` per schemas.ProjectCloneRequest. Returns the new id, or None if
+    the source does not exist. Does not commit.
+    """
+    source_name = db.execute(select(_projects.c.name).where(_projects.c.id == source_id)).scalar()
+    if source_name is None:
+        return None
+
+    seq = sync.next_seq(db.connection())
+    now = _utcnow()
+    overrides = request.overrides.dict(exclude_unset=True) if request.overrides else {}
+    overrides["name"] = request.name or overrides.get("name") or f"{source_name} (copy)"
+    overrides.update({
+        "is_pinned": 0, "archived_at": None, "last_opened_at": None,
+        "created_at": now, "updated_at": now, "change_seq": seq,
+    })
+
+    columns = [c for c in _projects.c if c.name != "id"]
+    select_list = []
+    for column in columns:
+        if column.name in overrides:
+            value = overrides[column.name]
+            select_list.append(null() if value is None else literal(value, column.type))
+        elif column.name in _PROJECT_RESET:
+            select_list.append(null())
+        else:
+            select_list.append(column)
+    new_id = db.execute(
+        insert(_projects)
+        .from_select(columns, select(*select_list).where(_projects.c.id == source_id))
+        .returning(_projects.c.id)
+    ).scalar_one()
+
+    copied = {}
+    if request.include_parcels:
+        parcel_columns = [c for c in _parcels.c if c.name not in ("id", "project_id", "updated_at", "change_seq")]
+        conditions = [_parcels.c.project_id == source_id, *_parcel_filters(request.parcel_filters)]
+        source_ids = db.execute(select(_parcels.c.id).where(*conditions).order_by(_parcels.c.id)).scalars().all()
+        if source_ids:
+            # ORDER BY id: new rowids are handed out in insertion order, so the
+            # i-th smallest new id is the copy of the i-th smallest source id.
+            new_ids = db.execute(
+                insert(_parcels)
+                .from_select(
+                    [*parcel_columns, _parcels.c.project_id, _parcels.c.updated_at, _parcels.c.change_seq],
+                    select(*parcel_columns, literal(new_id), literal(now, _parcels.c.updated_at.type), literal(seq))
+                    .where(*conditions)
+                    .order_by(_parcels.c.id),
+                )
+                .returning(_parcels.c.id)
+            ).scalars().all()
+            copied = dict(zip(source_ids, sorted(new_ids)))
+
+        if copied:
+            edges = db.execute(
+                select(_adjacency.c.parcel_a, _adjacency.c.parcel_b, _adjacency.c.shared_length_m)
+                .where(_adjacency.c.project_id == source_id)
+            ).all()
+            remapped = [
+                {"parcel_a": copied[a], "parcel_b": copied[b], "project_id": new_id, "shared_length_m": shared}
+                for a, b, shared in edges
+                if a in copied and b in copied
+            ]
+            if remapped:
+                db.execute(insert(_adjacency), remapped)
+
+    change_feed.note_change(db, "project", new_id, new_id, {
+        "cloned_from": source_id, "name": overrides["name"], "parcel_count": len(copied),
+    }, op="create")
+    return new_id
@@ -0,0 +1,111 @@
+from sqlalchemy import text
+
+# Materialized per-project rollups in `project_summary`.
+#
+# One row per project with parcel counts, site / excluded area, total
+# announced land value (sum of area_m2 * announced_value), the weighted
+# footprint and GFA caps of the site parcels (area * bcr_limit / far_limit,
+# same as calculateParcelBaseline in site.js), a per-zoning_type breakdown
+# and the ownership_status / tenure mix.
+#
+# The row is rebuilt by one INSERT OR REPLACE ... SELECT over the project's
+# parcels (index range scans on land_parcels.project_id) in the same
+# transaction as every parcel write, so reads never aggregate parcels:
+# Project.summary is joined into the project SELECT itself. A trigger drops
+# the row with its project. The statement is plain SQLite so patch_db can use
+# it to backfill through a sqlite3 cursor.
+
+REFRESH_SQL = """
+INSERT OR REPLACE INTO project_summary (
+    project_id, parcel_count, included_count, verified_count,
+    total_area_m2, included_area_m2, excluded_area_m2,
+    announced_value_total, included_announced_value,
+    max_footprint_m2, max_gfa_m2, missing_far_count,
+    zoning, ownership_mix, tenure_mix, updated_at
+)
+SELECT
+    p.id,
+    COUNT(l.id),
+    COALESCE(SUM(l.include_in_site = 1), 0),
+    COALESCE(SUM(l.is_verified = 1), 0),
+    COALESCE(SUM(l.area_m2), 0.0),
+    COALESCE(SUM(CASE WHEN l.include_in_site = 1 THEN l.area_m2 END), 0.0),
+    COALESCE(SUM(CASE WHEN l.include_in_site = 1 THEN 0.0 ELSE l.area_m2 END), 0.0),
+    COALESCE(SUM(l.area_m2 * l.announced_value), 0.0),
+    COALESCE(SUM(CASE WHEN l.include_in_site = 1 THEN l.area_m2 * l.announced_value END), 0.0),
+    COALESCE(SUM(CASE WHEN l.include_in_site = 1 THEN l.area_m2 * l.bcr_limit / 100.0 END), 0.0),
+    COALESCE(SUM(CASE WHEN l.include_in_site = 1 THEN l.area_m2 * l.far_limit / 100.0 END), 0.0),
+    COALESCE(SUM(l.include_in_site = 1 AND l.far_limit IS NULL), 0),
+    (
+        SELECT COALESCE(json_group_object(zone, json(stats)), '{}') FROM (
+            SELECT COALESCE(zoning_type, '') AS zone, json_object(
+                'count', COUNT(*),
+                'included_count', SUM(include_in_site = 1),
+                'area_m2', COALESCE(SUM(area_m2), 0.0),
+                'included_area_m2', COALESCE(SUM(CASE WHEN include_in_site = 1 THEN area_m2 END), 0.0),
+                'max_footprint_m2', COALESCE(SUM(CASE WHEN include_in_site = 1 THEN area_m2 * bcr_limit / 100.0 END), 0.0),
+                'max_gfa_m2', COALESCE(SUM(CASE WHEN include_in_site = 1 THEN area_m2 * far_limit / 100.0 END), 0.0),
+                'announced_value_total', COALESCE(SUM(area_m2 * announced_value), 0.0)
+            ) AS stats
+            FROM land_parcels WHERE project_id = :project_id
+            GROUP BY zone
+        )
+    ),
+    (
+        SELECT COALESCE(json_group_object(status, n), '{}') FROM (
+            SELECT COALESCE(ownership_status, '') AS status, COUNT(*) AS n
+            FROM land_parcels WHERE project_id = :project_id
+            GROUP BY status
+        )
+    ),
+    (
+        SELECT COALESCE(json_group_object(tenure, n), '{}') FROM (
+            SELECT COALESCE(tenure, '') AS tenure, COUNT(*) AS n
+            FROM land_parcels WHERE project_id = :project_id
+            GROUP BY tenure
+        )
+    ),
+    CURRENT_TIMESTAMP
+FROM projects AS p
+LEFT JOIN land_parcels AS l ON l.project_id = p.id
+WHERE p.id = :project_id
+GROUP BY p.id
+"""
+
+SUMMARY_DDL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS project_summary_ad AFTER DELETE ON projects
+    BEGIN
+        DELETE FROM project_summary WHERE project_id = OLD.id;
+    END
+    """,
+]
+
+_refresh_stmt = text(REFRESH_SQL)
+
+
+def refresh(db, project_id: int):
+    """Rebuild one project's summary row. Call after its parcels are flushed."""
+    db.execute(_refresh_stmt, {"project_id": project_id})
+
+
+def ensure_project_summaries(cursor):
+    """Create the cleanup trigger and backfill missing rows (idempotent). Takes a sqlite3 cursor."""
+    for statement in SUMMARY_DDL:
+        cursor.execute(statement)
+    cursor.execute("SELECT id FROM projects WHERE id NOT IN (SELECT project_id FROM project_summary)")
+    for (project_id,) in cursor.fetchall():
+        cursor.execute(REFRESH_SQL, {"project_id": project_id})
+
+
+def as_parcel_summary(summary):
+    """The older ParcelSummary shape (?parcels=summary) from a summary row."""
+    if summary is None:
+        return None
+    return {
+        "count": summary.parcel_count,
+        "included_count": summary.included_count,
+        "total_area_m2": summary.total_area_m2,
+        "included_area_m2": summary.included_area_m2,
+        "area_by_zoning": {zone: stats["area_m2"] for zone, stats in (summary.zoning or {}).items()},
+    }
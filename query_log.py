@@ -0,0 +1,285 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+import config
+
+# SQL instrumentation hooked onto the engine via SQLAlchemy cursor events.
+#
+# 1. Slow-query log: statements slower than SLOW_QUERY_MS are logged together
+#    with their `EXPLAIN QUERY PLAN` (same parameters, same connection).
+# 2. N+1 detector: every statement executed while a request is in flight is
+#    counted by "shape" (whitespace-normalised SQL, IN-lists collapsed). A shape
+#    repeated N_PLUS_ONE_THRESHOLD times within one request is reported against
+#    the route, and per-route totals are kept for GET /debug/query-stats.
+# 3. Query budgets: optional per-route limits. In strict mode (the test mode,
+#    QUERY_BUDGET_STRICT=1) a request that exceeds its budget is answered with
+#    a 500 `QueryBudgetExceeded` instead of its normal response.
+
+logger = logging.getLogger("query_log")
+
+_current_stats: ContextVar = ContextVar("query_stats", default=None)
+
+_IN_LIST = re.compile(r"IN \((?:\?|__\[POSTCOMPILE_\w+\])(?:, ?\?)*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Process-wide trackers opened by track_queries(); see its docstring.
+_global_trackers = []
+
+# (method, route path) -> max queries per request; populated by set_query_budget()
+QUERY_BUDGETS = {}
+
+# "METHOD route path" -> aggregated counters; read via route_report()
+_route_stats = {}
+_route_stats_lock = threading.Lock()
+
+
+def statement_shape(statement: str) -> str:
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    return _IN_LIST.sub("IN (...)", shape)
+
+
+class QueryStats:
+    """Statements executed within one request (or one `track_queries()` block)."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed_ms: float):
+        shape = statement_shape(statement)
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.shapes[shape] += 1
+
+    def repeated_shapes(self, threshold: int = None):
+        threshold = threshold or config.N_PLUS_ONE_THRESHOLD
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def set_query_budget(method: str, route_path: str, max_queries: int):
+    QUERY_BUDGETS[(method.upper(), route_path)] = max_queries
+
+
+@contextmanager
+def track_queries(max_queries: int = None):
+    """Count every statement the process issues inside the block.
+
+    Process-wide on purpose: TestClient runs the app on another thread with
+    its own context, so a ContextVar would not see those queries. Meant for
+    scripts and regression checks, not for concurrent servers.
+
+    Usage:
+        with track_queries(max_queries=2) as stats:
+            client.get("/projects/1")
+        print(stats.count, stats.repeated_shapes())
+
+    Raises QueryBudgetExceeded on exit if max_queries is given and exceeded.
+    """
+    stats = QueryStats()
+    _global_trackers.append(stats)
+    try:
+        yield stats
+    finally:
+        _global_trackers.remove(stats)
+    if max_queries is not None and stats.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{stats.count} queries issued, budget is {max_queries}. "
+            f"Repeated: {stats.repeated_shapes(2)}"
+        )
+
+
+# --- Engine Events ---
+
+def _explain(conn, statement, parameters):
+    # Use a fresh raw DBAPI cursor on the same connection: the plan must come
+    # from the same database/transaction, but must not disturb the cursor
+    # whose results the ORM is still about to read.
+    try:
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+            return [row[-1] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except Exception as e:
+        return [f"<explain failed: {e}>"]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000.0
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+    for tracker in _global_trackers:
+        tracker.record(statement, elapsed_ms)
+
+    if elapsed_ms >= config.SLOW_QUERY_MS:
+        head = statement.lstrip()[:7].upper()
+        plan = None
+        if not executemany and head.startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            plan = _explain(conn, statement, parameters)
+        logger.warning(
+            "slow query %.1fms: %s | params=%s | plan=%s",
+            elapsed_ms, statement_shape(statement), _short(parameters), plan,
+        )
+
+
+def _short(parameters, limit: int = 200) -> str:
+    text = repr(parameters)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def instrument_engine(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- Per-Request Tracking ---
+
+def _record_route(route: str, stats: QueryStats, repeated):
+    with _route_stats_lock:
+        entry = _route_stats.setdefault(route, {
+            "requests": 0,
+            "queries": 0,
+            "max_queries": 0,
+            "sql_ms": 0.0,
+            "n_plus_one_requests": 0,
+            "repeated_shapes": Counter(),
+        })
+        entry["requests"] += 1
+        entry["queries"] += stats.count
+        entry["max_queries"] = max(entry["max_queries"], stats.count)
+        entry["sql_ms"] += stats.total_ms
+        if repeated:
+            entry["n_plus_one_requests"] += 1
+            for shape, n in repeated:
+                entry["repeated_shapes"][shape] = max(entry["repeated_shapes"][shape], n)
+
+
+def route_report():
+    with _route_stats_lock:
+        return {
+            route: {
+                "requests": e["requests"],
+                "avg_queries": round(e["queries"] / e["requests"], 2),
+                "max_queries": e["max_queries"],
+                "avg_sql_ms": round(e["sql_ms"] / e["requests"], 3),
+                "budget": QUERY_BUDGETS.get(tuple(route.split(" ", 1))),
+                "n_plus_one_requests": e["n_plus_one_requests"],
+                "repeated_shapes": [
+                    {"shape": shape, "max_per_request": n}
+                    for shape, n in e["repeated_shapes"].most_common(5)
+                ],
+            }
+            for route, e in _route_stats.items()
+        }
+
+
+def reset_route_stats():
+    with _route_stats_lock:
+        _route_stats.clear()
+
+
+# Requests that matched no route share one entry (raw paths would grow the
+# report without bound)
+UNMATCHED = "<unmatched>"
+
+
+def _route_path(scope):
+    """The matched route template, or None."""
+    return getattr(scope.get("route"), "path", None)
+
+
+class QueryTrackingMiddleware:
+    """Attach a QueryStats to each HTTP request and report N+1 / budget overruns.
+
+    Statement counting happens through a ContextVar; FastAPI copies the context
+    into its threadpool, so sync endpoints and response validation (where
+    lazy relationship loads fire) are counted too.
+    """
+
+    def __init__(self, app, strict: bool = None):
+        self.app = app
+        self.strict = config.QUERY_BUDGET_STRICT if strict is None else strict
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        suppress_body = False
+
+        method = scope.get("method", "GET")
+
+        async def send_checked(message):
+            nonlocal suppress_body
+            if message["type"] == "http.response.start":
+                route = _route_path(scope)
+                budget = QUERY_BUDGETS.get((method, route))
+                if self.strict and budget is not None and stats.count > budget:
+                    # Everything a handler queries happens before the response
+                    # starts, so the budget can still be enforced here. The
+                    # handler has already committed, so say so: a write that
+                    # answered 2xx was applied.
+                    suppress_body = True
+                    status = message["status"]
+                    applied = method not in ("GET", "HEAD", "OPTIONS") and status < 400
+                    body = json.dumps({
+                        "error_type": "QueryBudgetExceeded",
+                        "message": f"{method} {route} issued {stats.count} queries, budget is {budget}"
+                        + (f"; the request succeeded ({status}) and its changes were applied" if applied else ""),
+                        "hint": "Check for lazy loads / N+1 patterns in this route.",
+                        "original_status": status,
+                        "changes_applied": applied,
+                        "repeated_shapes": [s for s, _ in stats.repeated_shapes(2)],
+                    }).encode("utf-8")
+                    await send({
+                        "type": "http.response.start",
+                        "status": 500,
+                        "headers": [
+                            (b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode("latin-1")),
+                        ],
+                    })
+                    await send({"type": "http.response.body", "body": body})
+                    return
+            elif suppress_body:
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_checked)
+        finally:
+            _current_stats.reset(token)
+            route = _route_path(scope)
+            repeated = stats.repeated_shapes()
+            if repeated:
+                logger.warning(
+                    "possible N+1 on %s %s: %d queries, repeated shapes: %s",
+                    method, route or scope.get("path"), stats.count,
+                    [(shape[:120], n) for shape, n in repeated],
+                )
+            _record_route(f"{method} {route}" if route else UNMATCHED, stats, repeated)
@@ -0,0 +1,150 @@
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+import calc_cache
+import calc_engine
+import config
+import models
+
+# Monte Carlo site assembly: what site do we actually end up with?
+#
+# Every site parcel (include_in_site=1) is acquired independently with
+#
+#   p = acquisition_probability[integration_risk] * ownership_factor[ownership_status]
+#
+# Draws are sampled in blocks as a (draws x parcels) Bernoulli matrix; one
+# matrix product with the per-parcel [area, base volume, announced land value]
+# columns gives every draw's site area, base volume and land value at once.
+# Allowed GFA applies calc_engine.total_allowed_rates to the sampled sites
+# (soil 80-2 eligibility and original-volume chloride depend on the site).
+#
+# Results are cached in-process keyed by a hash of the parcel state, the
+# project's bonus parameters and the request, and the default seed is derived
+# from the same hash, so a repeated view returns the identical distribution
+# without sampling again. Any parcel or parameter edit changes the key.
+
+SIMULATION_VERSION = "1"
+
+DEFAULT_ACQUISITION_PROBABILITY = {"low": 0.95, "medium": 0.75, "high": 0.4, "unknown": 0.6}
+DEFAULT_OWNERSHIP_FACTOR = {
+    "private_single": 1.0,
+    "private_multiple": 0.9,
+    "public": 0.85,
+    "mixed": 0.85,
+    "unknown": 0.9,
+}
+
+MAX_DRAWS = 2_000_000
+# Bernoulli matrix cells per block (bounds memory at a few tens of MB)
+_BLOCK_CELLS = 1 << 22
+
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+HISTOGRAM_BINS = 20
+
+
+# --- Cache ---
+
+_cache = calc_cache.LruCache("simulation", config.SIMULATION_CACHE_SIZE)
+_hash = calc_cache.canonical_hash
+
+
+# --- Sampling ---
+
+def acquisition_probabilities(parcels, request):
+    risk_p = {**DEFAULT_ACQUISITION_PROBABILITY, **(request.acquisition_probability or {})}
+    owner_f = {**DEFAULT_OWNERSHIP_FACTOR, **(request.ownership_factor or {})}
+    probabilities = [
+        risk_p.get(p.integration_risk, risk_p["unknown"]) * owner_f.get(p.ownership_status, owner_f["unknown"])
+        for p in parcels
+    ]
+    return np.clip(np.array(probabilities, dtype=float), 0.0, 1.0)
+
+
+def sample(probabilities, values, draws, seed):
+    """Per-draw sums of `values` columns (parcels x k) and acquired counts."""
+    rng = np.random.default_rng(seed)
+    n_parcels = len(probabilities)
+    sums = np.empty((draws, values.shape[1]), dtype=float)
+    counts = np.empty(draws, dtype=np.int32)
+    threshold = probabilities.astype(np.float32)
+    block = max(1, _BLOCK_CELLS // max(n_parcels, 1))
+    for start in range(0, draws, block):
+        stop = min(start + block, draws)
+        acquired = rng.random((stop - start, n_parcels), dtype=np.float32) < threshold
+        sums[start:stop] = acquired.astype(np.float64) @ values
+        counts[start:stop] = acquired.sum(axis=1)
+    return sums, counts
+
+
+def _distribution(values):
+    percentiles = np.percentile(values, PERCENTILES)
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    return {
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "percentiles": {f"p{q}": float(v) for q, v in zip(PERCENTILES, percentiles)},
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+    }
+
+
+def simulate(db, project, request):
+    """Distribution of site area, allowed GFA and land value per schemas.RiskSimulationRequest."""
+    started = time.perf_counter()
+    parcels = db.execute(
+        select(
+            models.LandParcel.id, models.LandParcel.area_m2, models.LandParcel.far_limit,
+            models.LandParcel.legal_floor_area_rate, models.LandParcel.include_in_site,
+            models.LandParcel.announced_value, models.LandParcel.integration_risk,
+            models.LandParcel.ownership_status,
+        )
+        .where(models.LandParcel.project_id == project.id, models.LandParcel.include_in_site == 1)
+        .order_by(models.LandParcel.id)
+    ).all()
+    params = {name: getattr(project, name) for name in calc_engine.PARAMETER_FIELDS}
+    state_hash = _hash({
+        "v": SIMULATION_VERSION,
+        "calc": calc_engine.CALCULATION_VERSION,
+        "parcels": [list(p) for p in parcels],
+        "params": params,
+    })
+    key = _hash({"state": state_hash, "request": request.dict()})
+    cached = _cache.get(key)
+    if cached is not None:
+        return {**cached, "cached": True, "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1)}
+
+    draws = min(request.draws, MAX_DRAWS)
+    probabilities = acquisition_probabilities(parcels, request)
+    arrays = calc_engine.parcel_arrays([p._mapping for p in parcels])
+    land_value = np.array([calc_engine.safe_num(p.announced_value) for p in parcels], dtype=float) * arrays["area"]
+    values = np.column_stack([arrays["area"], arrays["area"] * arrays["far"] / 100.0, land_value])
+    seed = request.seed if request.seed is not None else int(key[:16], 16)
+    sums, counts = sample(probabilities, values, draws, seed)
+
+    site_area, base_volume, acquired_value = sums[:, 0], sums[:, 1], sums[:, 2]
+    allowed = base_volume * calc_engine.total_allowed_rates(params, base_volume, site_area) / 100.0
+    full = values.sum(axis=0)
+    full_allowed = float(full[1] * calc_engine.total_allowed_rate(params, full[1], full[0]) / 100.0)
+
+    result = {
+        "state_hash": state_hash,
+        "draws": draws,
+        "parcel_count": len(parcels),
+        "parcels": [{"id": p.id, "probability": round(float(q), 4)} for p, q in zip(parcels, probabilities)],
+        "full_site": {"site_area_m2": float(full[0]), "allowed_volume_m2": full_allowed, "land_value": float(full[2])},
+        "p_full_site": float((counts == len(parcels)).mean()) if draws else 0.0,
+        "p_meets_min_area": (
+            float((site_area >= request.min_site_area_m2).mean()) if request.min_site_area_m2 is not None else None
+        ),
+        "expected_parcels": float(counts.mean()) if draws else 0.0,
+        "metrics": {
+            "site_area_m2": _distribution(site_area),
+            "allowed_volume_m2": _distribution(allowed),
+            "land_value": _distribution(acquired_value),
+        },
+    }
+    _cache.put(key, result, tags=(project.id,))
+    return {**result, "cached": False, "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1)}
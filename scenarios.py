@@ -0,0 +1,197 @@
+from sqlalchemy import select
+
+import calc_cache
+import calc_engine
+import models
+import schemas
+
+# Scenarios: alternative parameter sets for one project (ScenarioForm /
+# Comparator), stored compactly as a diff against the project row.
+#
+#   scalar columns   stored only when they differ from the project's value
+#   JSON columns     stored as a JSON merge patch (RFC 7396) of the project's
+#                    value, so a scenario that ticks one checklist item stores
+#                    that item, not the whole details object
+#
+# A field a scenario does not override follows the project, so editing the
+# baseline moves every scenario that did not change that field. evaluate()
+# runs the baseline and all scenarios through calc_engine in one vectorized
+# pass (memoized by calc_cache) and returns a columnar comparison matrix.
+
+# Parameter columns a scenario may override (ProjectUpdate minus management fields)
+SCENARIO_FIELDS = tuple(
+    name for name in schemas.ProjectUpdate.model_fields
+    if name not in ("name", "is_pinned", "archived_at", "last_opened_at")
+)
+
+# Comparison matrix rows: calc_engine output -> metric name
+METRICS = {
+    "allowed_volume_m2": "allowed_volume_m2",
+    "gfa_total_m2": "gfa_total_m2",
+    "est_floors": "floors",
+    "basement_floors": "basement_floors",
+    "basement_depth_m": "basement_depth_m",
+    "saleable_ratio": "saleable_ratio",
+    "total_allowed_rate": "total_allowed_rate",
+    "site_area_m2": "site_area_m2",
+    "base_volume_m2": "base_volume_m2",
+    "parking_total": "parking_total",
+}
+
+SCENARIO_DDL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS scenarios_project_ad AFTER DELETE ON projects
+    BEGIN
+        DELETE FROM scenarios WHERE project_id = OLD.id;
+    END
+    """,
+]
+
+
+def ensure_scenario_triggers(cursor):
+    """Create the cleanup trigger (idempotent). Takes a sqlite3 cursor."""
+    for statement in SCENARIO_DDL:
+        cursor.execute(statement)
+
+
+# --- Diffs ---
+
+def _merge_patch(base, target):
+    """Merge patch turning `base` into `target` (both dicts). None marks a removed key."""
+    patch = {}
+    for key, value in target.items():
+        if key not in base:
+            patch[key] = value
+        elif base[key] != value:
+            if isinstance(base[key], dict) and isinstance(value, dict):
+                patch[key] = _merge_patch(base[key], value)
+            else:
+                patch[key] = value
+    for key in base:
+        if key not in target:
+            patch[key] = None
+    return patch
+
+
+def _apply_patch(base, patch):
+    result = dict(base) if isinstance(base, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        elif isinstance(value, dict):
+            result[key] = _apply_patch(result.get(key), value)
+        else:
+            result[key] = value
+    return result
+
+
+def project_parameters(project) -> dict:
+    return {name: getattr(project, name) for name in SCENARIO_FIELDS}
+
+
+def make_diff(baseline: dict, values: dict) -> dict:
+    """Compact diff of `values` (full or partial parameter dict) against `baseline`."""
+    diff = {}
+    for name, value in values.items():
+        if value is None:
+            continue
+        if name in calc_engine.JSON_PARAMETERS:
+            patch = _merge_patch(baseline.get(name) or {}, value)
+            if patch:
+                diff[name] = patch
+        elif value != baseline.get(name):
+            diff[name] = value
+    return diff
+
+
+def apply_diff(baseline: dict, diff: dict) -> dict:
+    values = dict(baseline)
+    for name, value in (diff or {}).items():
+        if name not in SCENARIO_FIELDS:
+            continue  # column since removed; ignore
+        if name in calc_engine.JSON_PARAMETERS:
+            values[name] = _apply_patch(baseline.get(name), value)
+        else:
+            values[name] = value
+    return values
+
+
+def _parameters(update: schemas.ProjectUpdate) -> dict:
+    values = update.dict(exclude_unset=True)
+    rejected = sorted(set(values) - set(SCENARIO_FIELDS))
+    if rejected:
+        raise ValueError(f"not scenario parameters: {', '.join(rejected)}")
+    return values
+
+
+def _merge_parameters(values: dict, parameters: dict) -> dict:
+    """Request parameters over `values`; JSON objects merge (null removes a key)."""
+    merged = dict(values)
+    for name, value in parameters.items():
+        if value is None:
+            continue
+        if name in calc_engine.JSON_PARAMETERS:
+            merged[name] = _apply_patch(merged.get(name), value)
+        else:
+            merged[name] = value
+    return merged
+
+
+# --- CRUD (callers commit) ---
+
+def create(db, project, request: schemas.ScenarioCreate):
+    baseline = project_parameters(project)
+    diff = make_diff(baseline, _merge_parameters(baseline, _parameters(request.parameters)))
+    scenario = models.Scenario(project_id=project.id, name=request.name, diff=diff)
+    db.add(scenario)
+    return scenario
+
+
+def update(db, scenario, project, request: schemas.ScenarioUpdate):
+    if request.name is not None:
+        scenario.name = request.name
+    if request.parameters is not None:
+        baseline = project_parameters(project)
+        values = _merge_parameters(apply_diff(baseline, scenario.diff), _parameters(request.parameters))
+        scenario.diff = make_diff(baseline, values)
+    return scenario
+
+
+# --- Evaluation ---
+
+_parcel_columns = select(
+    models.LandParcel.id,
+    models.LandParcel.area_m2,
+    models.LandParcel.far_limit,
+    models.LandParcel.legal_floor_area_rate,
+    models.LandParcel.include_in_site,
+)
+
+
+def evaluate(db, project):
+    """Baseline + every scenario of `project` in one calc_engine pass (3 queries total)."""
+    parcels = db.execute(
+        _parcel_columns.where(models.LandParcel.project_id == project.id)
+    ).mappings().all()
+    rows = db.execute(
+        select(models.Scenario.id, models.Scenario.name, models.Scenario.diff)
+        .where(models.Scenario.project_id == project.id)
+        .order_by(models.Scenario.id)
+    ).all()
+
+    baseline = project_parameters(project)
+    param_sets = [baseline] + [apply_diff(baseline, diff) for _, _, diff in rows]
+    outputs = calc_cache.evaluate(parcels, param_sets, project_ids=(project.id,))
+
+    metrics, deltas = {}, {}
+    for output, metric in METRICS.items():
+        values = outputs[output]
+        metrics[metric] = values.round(4).tolist()
+        deltas[metric] = ((values - values[0]).round(4) + 0.0).tolist()  # no -0.0
+    return {
+        "calculation_version": calc_engine.CALCULATION_VERSION,
+        "scenarios": [{"id": None, "name": project.name or "baseline"}]
+        + [{"id": scenario_id, "name": name} for scenario_id, name, _ in rows],
+        "metrics": metrics,
+        "deltas": deltas,
+    }
@@ -1,7 +1,26 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, field_validator
+from typing import Dict, Optional, List, Literal
 from datetime import datetime
 
+class PolygonGeometry(BaseModel):
+    # GeoJSON Polygon, WGS84 [lng, lat]. First ring is the outline, the rest are holes.
+    type: Literal["Polygon"] = "Polygon"
+    coordinates: List[List[List[float]]]
+
+    @field_validator("coordinates")
+    @classmethod
+    def check_rings(cls, rings):
+        if not rings:
+            raise ValueError("Polygon needs at least one ring")
+        for ring in rings:
+            if len(ring) < 4:
+                raise ValueError("Each ring needs at least 4 positions")
+            if any(len(point) < 2 for point in ring):
+                raise ValueError("Positions must be [lng, lat]")
+            if ring[0][:2] != ring[-1][:2]:
+                raise ValueError("Rings must be closed (first position == last position)")
+        return [[point[:2] for point in ring] for ring in rings]
+
 class LandParcelBase(BaseModel):
     section_name: str
     lot_number: str
@@ -21,7 +40,7 @@ class LandParcelBase(BaseModel):
     include_in_site: Optional[bool] = True
 
 class LandParcelCreate(LandParcelBase):
-    pass
+    geometry: Optional[PolygonGeometry] = None
 
 class LandParcelUpdate(BaseModel):
     section_name: Optional[str] = None
@@ -41,9 +60,54 @@ class LandParcelUpdate(BaseModel):
     integration_risk: Optional[str] = None
     include_in_site: Optional[bool] = None
 
+    geometry: Optional[PolygonGeometry] = None
+
 class LandParcel(LandParcelBase):
     id: int
     project_id: int
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class LandParcelPage(BaseModel):
+    items: List[LandParcel]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+class ParcelSummary(BaseModel):
+    count: int = 0
+    included_count: int = 0
+    total_area_m2: float = 0.0
+    included_area_m2: float = 0.0
+    area_by_zoning: dict = {}
+
+class ZoningRollup(BaseModel):
+    count: int = 0
+    included_count: int = 0
+    area_m2: float = 0.0
+    included_area_m2: float = 0.0
+    max_footprint_m2: float = 0.0
+    max_gfa_m2: float = 0.0
+    announced_value_total: float = 0.0
+
+class ProjectSummary(BaseModel):
+    # Materialized rollups, kept current on every parcel write
+    parcel_count: int = 0
+    included_count: int = 0
+    verified_count: int = 0
+    total_area_m2: float = 0.0
+    included_area_m2: float = 0.0
+    excluded_area_m2: float = 0.0
+    announced_value_total: float = 0.0
+    included_announced_value: float = 0.0
+    max_footprint_m2: float = 0.0
+    max_gfa_m2: float = 0.0
+    missing_far_count: int = 0
+    zoning: dict[str, ZoningRollup] = {}
+    ownership_mix: dict[str, int] = {}
+    tenure_mix: dict[str, int] = {}
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -152,6 +216,294 @@ class Project(ProjectBase):
 
     created_at: datetime
     land_parcels: List[LandParcel] = []
+    summary: Optional[ProjectSummary] = None
+    # Only set when requested with ?parcels=summary
+    parcel_summary: Optional[ParcelSummary] = None
 
     class Config:
         from_attributes = True
+
+class ProjectBatchOperation(BaseModel):
+    op: Literal["update", "archive", "restore", "delete"]
+    id: int
+    # Only for op="update" (pin/unpin, last_opened_at, any editable field)
+    fields: Optional[ProjectUpdate] = None
+
+class ProjectBatchRequest(BaseModel):
+    operations: List[ProjectBatchOperation]
+
+class ProjectBatchResult(BaseModel):
+    id: int
+    op: str
+    status: Literal["ok", "not_found", "error"]
+    error: Optional[str] = None
+
+class ProjectBatchResponse(BaseModel):
+    results: List[ProjectBatchResult]
+
+class CloneParcelFilters(BaseModel):
+    # All optional; parcels must match every filter given
+    parcel_ids: Optional[List[int]] = None
+    zoning_types: Optional[List[str]] = None
+    include_in_site: Optional[bool] = None
+    is_verified: Optional[bool] = None
+
+class ProjectCloneRequest(BaseModel):
+    name: Optional[str] = None  # default "<source name> (copy)"
+    overrides: Optional[ProjectUpdate] = None
+    include_parcels: bool = True
+    parcel_filters: CloneParcelFilters = CloneParcelFilters()
+
+class SyncPage(BaseModel):
+    # Pass `token` back as ?since= ; repeat while has_more
+    token: str
+    has_more: bool = False
+    projects: List[Project] = []
+    parcels: List[LandParcel] = []
+    deleted_projects: List[int] = []
+    deleted_parcels: List[int] = []
+
+class ScenarioCreate(BaseModel):
+    name: str
+    # Values to override; JSON objects merge into the project's. Stored as a diff
+    parameters: ProjectUpdate = ProjectUpdate()
+
+class ScenarioUpdate(BaseModel):
+    name: Optional[str] = None
+    # Merged over the scenario's current values, then re-diffed
+    parameters: Optional[ProjectUpdate] = None
+
+class Scenario(BaseModel):
+    id: int
+    project_id: int
+    name: str
+    diff: dict = {}
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ScenarioColumn(BaseModel):
+    id: Optional[int] = None  # None for the project baseline
+    name: str
+
+class ScenarioEvaluation(BaseModel):
+    # Columnar: metrics[m][i] is metric m of scenarios[i]; scenarios[0] is the baseline
+    calculation_version: str
+    scenarios: List[ScenarioColumn]
+    metrics: Dict[str, List[float]]
+    deltas: Dict[str, List[float]]  # metrics[m][i] - metrics[m][0]
+
+class ComparisonRequest(BaseModel):
+    # Columns: these projects' baselines, then these scenarios. Neither given = every non-archived project.
+    project_ids: Optional[List[int]] = None
+    scenario_ids: Optional[List[int]] = None
+    metrics: Optional[List[str]] = None  # subset of comparison.METRICS; default all
+    pairwise: bool = True  # N x N delta matrices (omit for large sets if only ranks are needed)
+
+class ComparisonColumn(BaseModel):
+    kind: Literal["project", "scenario"]
+    id: int
+    project_id: int
+    name: Optional[str] = None
+
+class ComparisonResult(BaseModel):
+    # Columnar: metrics[m][i] is metric m of columns[i]
+    calculation_version: str
+    columns: List[ComparisonColumn]
+    metrics: Dict[str, List[float]]
+    ranks: Dict[str, List[int]]  # 1 = largest
+    deltas: Dict[str, List[List[float]]]  # deltas[m][i][j] = metrics[m][j] - metrics[m][i]
+    elapsed_ms: float
+
+class SiteOptimizeRequest(BaseModel):
+    # Hard constraints
+    max_integration_risk: Optional[Literal["low", "medium", "high"]] = None  # unknown counts as high
+    ownership_status: Optional[List[str]] = None  # allowed values; None = any
+    min_site_area_m2: float = 0.0
+    required_parcel_ids: List[int] = []
+    candidate_parcel_ids: Optional[List[int]] = None  # default: every parcel of the project
+    # Risk score per integration_risk value (integers); a site's risk is the sum
+    risk_weights: Optional[Dict[str, int]] = None
+    max_nodes: Optional[int] = None  # per search, default OPTIMIZER_MAX_NODES
+
+class SiteOption(BaseModel):
+    parcel_ids: List[int]
+    parcel_count: int
+    site_area_m2: float
+    base_volume_m2: float
+    allowed_volume_m2: float
+    gfa_total_m2: float
+    risk_score: int
+
+class ExcludedParcel(BaseModel):
+    id: int
+    reason: str  # "integration_risk" | "ownership_status"
+
+class SiteOptimizeResult(BaseModel):
+    candidate_count: int
+    excluded: List[ExcludedParcel] = []
+    front: List[SiteOption]  # non-dominated, by risk_score then allowed volume desc
+    nodes: int
+    exact: bool  # false when a search hit max_nodes
+    elapsed_ms: float
+
+class RiskSimulationRequest(BaseModel):
+    draws: int = 100_000  # capped at 2,000,000
+    # Overrides of the per-level / per-status defaults in risk_simulation.py
+    acquisition_probability: Optional[Dict[str, float]] = None  # integration_risk -> p
+    ownership_factor: Optional[Dict[str, float]] = None  # ownership_status -> multiplier
+    min_site_area_m2: Optional[float] = None  # reports p_meets_min_area
+    seed: Optional[int] = None  # default derived from the state hash (repeatable)
+
+    @field_validator("draws")
+    @classmethod
+    def check_draws(cls, draws):
+        if draws < 1:
+            raise ValueError("draws must be at least 1")
+        return draws
+
+class Histogram(BaseModel):
+    edges: List[float]
+    counts: List[int]
+
+class Distribution(BaseModel):
+    mean: float
+    std: float
+    min: float
+    max: float
+    percentiles: Dict[str, float]  # p5 ... p95
+    histogram: Histogram
+
+class ParcelProbability(BaseModel):
+    id: int
+    probability: float
+
+class FullSite(BaseModel):
+    site_area_m2: float
+    allowed_volume_m2: float
+    land_value: float
+
+class RiskSimulationResult(BaseModel):
+    state_hash: str
+    cached: bool
+    draws: int
+    parcel_count: int
+    parcels: List[ParcelProbability]
+    full_site: FullSite  # every site parcel acquired
+    p_full_site: float
+    p_meets_min_area: Optional[float] = None
+    expected_parcels: float
+    metrics: Dict[str, Distribution]  # site_area_m2, allowed_volume_m2, land_value
+    elapsed_ms: float
+
+class BonusOption(BaseModel):
+    rate: float  # %
+    cost: float
+
+class BonusOptimizeRequest(BaseModel):
+    # Cost of claiming a detected item at its current rate, by item id
+    # ("central.green_building", "disaster.delta_b1", "chloride", "soil_80_2", "tod", ...)
+    costs: Dict[str, float] = {}
+    # Alternative tiers for an item (replaces its detected rate), or new items
+    options: Dict[str, List[BonusOption]] = {}
+    target_rate: Optional[float] = None  # default: bonus_cap
+
+class BonusCandidate(BaseModel):
+    id: str
+    category: str
+    tiers: List[BonusOption]
+    note: Optional[str] = None
+
+class BonusExcluded(BaseModel):
+    id: str
+    reason: str
+
+class BonusPick(BaseModel):
+    id: str
+    rate: float
+    cost: float
+
+class BonusCurvePoint(BaseModel):
+    rate: float  # claim at least this much ...
+    min_cost: float  # ... for this cost
+    marginal_cost_per_pct: Optional[float] = None  # vs the previous point
+
+class BonusClaim(BaseModel):
+    rate: float
+    cost: float
+    wasted_rate: float
+
+class BonusOptimizeResult(BaseModel):
+    cap: float
+    target_rate: float
+    site_area_m2: float
+    base_volume_m2: float
+    candidates: List[BonusCandidate]
+    excluded: List[BonusExcluded] = []
+    unpriced: List[str] = []  # detected items with no cost given (priced at 0)
+    selected: List[BonusPick]
+    selected_rate: float
+    effective_rate: float
+    wasted_rate: float
+    min_cost: float
+    reaches_target: bool
+    current: BonusClaim  # every candidate at its detected tier
+    curve: List[BonusCurvePoint]
+    elapsed_ms: float
+
+class FeasibilityAssumptions(BaseModel):
+    # TWD; placeholder market figures, override per call
+    price_residential_per_m2: float = 250_000.0
+    price_commercial_per_m2: float = 300_000.0
+    price_agency_per_m2: float = 180_000.0
+    price_parking_per_space: float = 2_500_000.0
+    cost_above_ground_per_m2: float = 50_000.0
+    cost_basement_per_m2: float = 65_000.0
+    cost_excavation_per_m3: float = 2_000.0
+    soft_cost_rate: float = 10.0  # % of hard cost
+    finance_rate: float = 5.0  # % of hard + soft cost
+    sales_cost_rate: float = 5.0  # % of revenue
+    profit_rate: float = 15.0  # % of revenue (developer margin)
+
+class FeasibilityOptions(BaseModel):
+    assumptions: FeasibilityAssumptions = FeasibilityAssumptions()
+    # Sensitivity band: every price factor x every cost factor
+    price_factors: List[float] = [1.0]
+    cost_factors: List[float] = [1.0]
+
+    @field_validator("price_factors", "cost_factors")
+    @classmethod
+    def check_factors(cls, factors):
+        if not factors:
+            raise ValueError("at least one factor is required")
+        return factors
+
+class PortfolioFeasibilityRequest(FeasibilityOptions):
+    project_ids: Optional[List[int]] = None  # default: every non-archived project
+
+class FeasibilityRow(BaseModel):
+    project_id: int
+    name: Optional[str] = None
+    price_factor: float
+    cost_factor: float
+    site_area_m2: float
+    saleable_area_m2: float
+    parking_total: float
+    revenue: float
+    hard_cost: float
+    soft_cost: float
+    finance_cost: float
+    sales_cost: float
+    profit: float
+    residual_land_value: float
+    rlv_per_site_m2: float
+    announced_land_value: float  # sum of area_m2 * announced_value over the site
+    rlv_to_announced: float
+
+class FeasibilityResult(BaseModel):
+    calculation_version: str
+    assumptions: FeasibilityAssumptions
+    rows: List[FeasibilityRow]  # project-major, then price factor, then cost factor
+    elapsed_ms: float
@@ -0,0 +1,350 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import select
+
+import calc_engine
+import config
+import models
+
+# Site assembly: which of a project's parcels to consolidate.
+#
+# Each candidate parcel contributes site area, base volume (area x FAR, as
+# calc_engine) and an integration risk score (risk_weights[integration_risk];
+# a site's risk is the sum over its parcels, i.e. roughly "how many owners
+# must sign, weighted by how hard they are"). The objectives are
+#
+#   maximize site area, maximize allowed GFA (base volume x total allowed rate,
+#   bonuses under bonus_cap), minimize risk
+#
+# under hard constraints: per-parcel max_integration_risk, allowed
+# ownership_status values, parcels that must be included, minimum site area.
+#
+# The Pareto front is built by the epsilon-constraint method on both other
+# objectives: for every risk budget R (integer weights, so budgets are
+# enumerable) sweep an area threshold A upwards from min_site_area, solving
+# max GFA s.t. risk <= R, area >= A and then raising A just above the area of
+# the optimum, until nothing qualifies. Every non-dominated (area, GFA, risk)
+# point is the optimum of some (R, A) pair, so the union of these optima
+# contains the whole front. Each solve is a depth-first branch-and-bound:
+# parcels are branched in value/risk density order, (area, base, risk) are
+# carried incrementally down the tree, and nodes are pruned by the
+# fractional-knapsack (LP) bounds on the GFA and on the area the remaining
+# parcels can still add. Each solve starts from the best subset already found
+# that satisfies (R, A). Risk budgets are spread over a process pool, each
+# worker taking its share in ascending order; the non-dominated set of all
+# optima is the front.
+
+RISK_LEVELS = {"low": 0, "medium": 1, "high": 2}
+# Parcels with no / unrecognized integration_risk are treated as "high"
+UNKNOWN_RISK = "high"
+DEFAULT_RISK_WEIGHTS = {"low": 1, "medium": 2, "high": 4, "unknown": 4}
+
+MAX_CANDIDATES = 200
+# Budgets beyond this are sampled evenly between the minimum and maximum risk
+MAX_RISK_BUDGETS = 120
+
+# Area threshold step of the sweep: the next threshold is this much above the last optimum's area
+AREA_STEP_M2 = 1e-6
+
+
+def _risk_level(value):
+    return value if value in RISK_LEVELS else UNKNOWN_RISK
+
+
+def build_problem(project, parcels, request):
+    """Candidate vectors for one project. Raises ValueError on unsatisfiable input."""
+    weights = {**DEFAULT_RISK_WEIGHTS, **(request.risk_weights or {})}
+    max_level = RISK_LEVELS[request.max_integration_risk] if request.max_integration_risk else None
+    allowed_ownership = set(request.ownership_status) if request.ownership_status else None
+    wanted = set(request.candidate_parcel_ids) if request.candidate_parcel_ids is not None else None
+    required = set(request.required_parcel_ids or [])
+
+    candidates, excluded = [], {}
+    for parcel in parcels:
+        if wanted is not None and parcel.id not in wanted and parcel.id not in required:
+            continue
+        level = _risk_level(parcel.integration_risk)
+        if max_level is not None and RISK_LEVELS[level] > max_level:
+            excluded[parcel.id] = "integration_risk"
+        elif allowed_ownership is not None and parcel.ownership_status not in allowed_ownership:
+            excluded[parcel.id] = "ownership_status"
+        else:
+            candidates.append(parcel)
+
+    missing = sorted(required - {p.id for p in candidates})
+    if missing:
+        raise ValueError(f"required parcels excluded or not in project: {missing}")
+    if len(candidates) > MAX_CANDIDATES:
+        raise ValueError(f"too many candidate parcels ({len(candidates)} > {MAX_CANDIDATES})")
+
+    arrays = calc_engine.parcel_arrays(candidates)
+    params = {name: getattr(project, name) for name in calc_engine.PARAMETER_FIELDS}
+    return {
+        "ids": arrays["ids"],
+        "area": arrays["area"].tolist(),
+        "base": (arrays["area"] * arrays["far"] / 100.0).tolist(),
+        "risk": [int(weights.get(p.integration_risk or "unknown", weights["unknown"])) for p in candidates],
+        "required": [i for i, p in enumerate(candidates) if p.id in required],
+        "min_area": float(request.min_site_area_m2 or 0.0),
+        "params": params,
+        "excluded": excluded,
+    }
+
+
+# --- Branch-and-bound (runs in pool workers; plain lists only) ---
+
+def _allowed_gfa(params, area, base):
+    return base * calc_engine.total_allowed_rate(params, base, area) / 100.0
+
+
+def _branch_and_bound(problem, budget, max_nodes, min_area, incumbent=None):
+    """Max-GFA subset with risk <= budget and area >= min_area.
+
+    incumbent: (indices, GFA) of a subset known to qualify; returned unless
+    something better is found. Returns (indices or None if nothing
+    qualifies, nodes, exact).
+    """
+    area, base, risk = problem["area"], problem["base"], problem["risk"]
+    params = problem["params"]
+    required = set(problem["required"])
+
+    start_area = sum(area[i] for i in required)
+    start_base = sum(base[i] for i in required)
+    start_risk = sum(risk[i] for i in required)
+    if start_risk > budget:
+        return None, 0, True
+
+    free = [i for i in range(len(area)) if i not in required and risk[i] <= budget - start_risk]
+    free.sort(key=lambda i: base[i] / risk[i] if risk[i] > 0 else float("inf"), reverse=True)
+    n = len(free)
+    f_area = [area[i] for i in free]
+    f_base = [base[i] for i in free]
+    f_risk = [risk[i] for i in free]
+    # Free positions in area/risk density order, for the reachable-area bound
+    by_area = sorted(range(n), key=lambda j: f_area[j] / f_risk[j] if f_risk[j] > 0 else float("inf"), reverse=True)
+    area_suffix = [0.0] * (n + 1)
+    for k in range(n - 1, -1, -1):
+        area_suffix[k] = area_suffix[k + 1] + f_area[k]
+
+    # Upper bound on the allowed rate of any subset: soil eligibility is
+    # monotone in site area and the original-volume chloride rate is largest
+    # for the smallest base, both capped by bonus_cap.
+    rate_ub = calc_engine.total_allowed_rate(params, 1e-9, start_area + area_suffix[0]) / 100.0
+
+    def base_bound(k, current, capacity):
+        # Fractional knapsack over free[k:] in density order
+        total = current
+        for j in range(k, n):
+            if f_risk[j] <= capacity:
+                capacity -= f_risk[j]
+                total += f_base[j]
+            else:
+                total += f_base[j] * capacity / f_risk[j]
+                break
+        return total * rate_ub
+
+    def area_bound(k, current, capacity):
+        # Most area free[k:] can still add within the remaining risk (fractional knapsack)
+        total = current
+        for j in by_area:
+            if j < k:
+                continue
+            if f_risk[j] <= capacity:
+                capacity -= f_risk[j]
+                total += f_area[j]
+            else:
+                total += f_area[j] * capacity / f_risk[j]
+                break
+        return total
+
+    best, best_mask = -1.0, None
+    if incumbent is not None:
+        best = incumbent[1]
+    nodes, exact = 0, True
+    # (next index, area, base, risk, chosen bitmask over free positions)
+    stack = [(0, start_area, start_base, start_risk, 0)]
+    while stack:
+        k, s_area, s_base, s_risk, mask = stack.pop()
+        nodes += 1
+        if nodes > max_nodes:
+            exact = False
+            break
+        if s_area + area_suffix[k] < min_area:
+            continue
+        if s_area < min_area and area_bound(k, s_area, budget - s_risk) < min_area:
+            continue
+        if s_area >= min_area and (mask or required):  # a site has at least one parcel
+            score = _allowed_gfa(params, s_area, s_base) if s_base * rate_ub > best else -1.0
+            if score > best:
+                best, best_mask = score, mask
+        if k == n:
+            continue
+        if base_bound(k, s_base, budget - s_risk) <= best + 1e-9:
+            continue
+        # Push exclude first so include is explored first
+        stack.append((k + 1, s_area, s_base, s_risk, mask))
+        if s_risk + f_risk[k] <= budget:
+            stack.append((k + 1, s_area + f_area[k], s_base + f_base[k], s_risk + f_risk[k], mask | (1 << k)))
+
+    if best_mask is None:
+        return (list(incumbent[0]) if incumbent is not None else None), nodes, exact
+    chosen = sorted(required | {free[j] for j in range(n) if best_mask >> j & 1})
+    return chosen, nodes, exact
+
+
+def _sweep_budget(problem, budget, max_nodes, known):
+    """Max-GFA subsets within one risk budget at every area threshold. Returns (subsets, nodes, exact).
+
+    known: [(indices, area, GFA, risk)] found so far by this worker; the best
+    one that qualifies seeds each search as its incumbent.
+    """
+    subsets, nodes, exact = [], 0, True
+    min_area = problem["min_area"]
+    while True:
+        qualifying = [(s, g) for s, a, g, r in known if r <= budget and a >= min_area]
+        incumbent = max(qualifying, key=lambda item: item[1]) if qualifying else None
+        chosen, task_nodes, task_exact = _branch_and_bound(problem, budget, max_nodes, min_area, incumbent)
+        nodes += task_nodes
+        exact = exact and task_exact
+        if chosen is None:
+            return subsets, nodes, exact
+        chosen_area = sum(problem["area"][i] for i in chosen)
+        chosen_base = sum(problem["base"][i] for i in chosen)
+        known.append((chosen, chosen_area, _allowed_gfa(problem["params"], chosen_area, chosen_base),
+                      sum(problem["risk"][i] for i in chosen)))
+        subsets.append(chosen)
+        min_area = chosen_area + AREA_STEP_M2
+
+
+def _solve_chunk(problem, budgets, max_nodes):
+    # Ascending budgets: every subset found so far fits the later, larger budgets
+    known = []
+    return [_sweep_budget(problem, budget, max_nodes, known) for budget in sorted(budgets)]
+
+
+# --- Process pool ---
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the API process runs threads (touch flusher, SSE), never fork it
+            _pool = ProcessPoolExecutor(
+                max_workers=config.OPTIMIZER_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _risk_budgets(problem):
+    """(budgets, complete): every integer budget, or an even sample when there are too many."""
+    low = sum(problem["risk"][i] for i in problem["required"])
+    high = sum(problem["risk"])
+    if high - low + 1 <= MAX_RISK_BUDGETS:
+        return list(range(low, high + 1)), True
+    step = (high - low) / (MAX_RISK_BUDGETS - 1)
+    return sorted({low + round(step * k) for k in range(MAX_RISK_BUDGETS)}), False
+
+
+def solve(problem, max_nodes=None, workers=None):
+    """Sweep every risk budget; returns (subsets, nodes, exact).
+
+    exact is false when a search hit max_nodes or the risk budgets were
+    sampled (the front may then miss points).
+    """
+    max_nodes = max_nodes or config.OPTIMIZER_MAX_NODES
+    workers = config.OPTIMIZER_WORKERS if workers is None else workers
+    tasks, complete = _risk_budgets(problem)
+
+    if workers > 1 and len(problem["ids"]) >= config.OPTIMIZER_PARALLEL_MIN_PARCELS:
+        # Interleave so every chunk mixes cheap (small budget) and expensive searches
+        chunks = [tasks[k::workers * 4] for k in range(workers * 4)]
+        chunks = [chunk for chunk in chunks if chunk]
+        results = [
+            result
+            for chunk_results in _executor().map(
+                _solve_chunk, [problem] * len(chunks), chunks, [max_nodes] * len(chunks)
+            )
+            for result in chunk_results
+        ]
+    else:
+        results = _solve_chunk(problem, tasks, max_nodes)
+
+    subsets, nodes, exact = set(), 0, complete
+    for budget_subsets, task_nodes, task_exact in results:
+        subsets.update(tuple(chosen) for chosen in budget_subsets)
+        nodes += task_nodes
+        exact = exact and task_exact
+    return sorted(subsets), nodes, exact
+
+
+def pareto_front(problem, subsets):
+    """Evaluate subsets with calc_engine and keep the non-dominated ones (area up, GFA up, risk down)."""
+    if not subsets:
+        return []
+    ids = problem["ids"]
+    parcels = [
+        {"id": pid, "area_m2": a, "far_limit": (b / a * 100.0) if a else 0.0,
+         "legal_floor_area_rate": None, "include_in_site": 1}
+        for pid, a, b in zip(ids, problem["area"], problem["base"])
+    ]
+    param_sets = [
+        {**problem["params"], "site_config": {"selectedParcelIds": [ids[i] for i in subset]}}
+        for subset in subsets
+    ]
+    outputs = calc_engine.evaluate(parcels, param_sets)
+    points = [
+        {
+            "parcel_ids": [ids[i] for i in subset],
+            "parcel_count": len(subset),
+            "site_area_m2": round(float(outputs["site_area_m2"][k]), 4),
+            "base_volume_m2": round(float(outputs["base_volume_m2"][k]), 4),
+            "allowed_volume_m2": round(float(outputs["allowed_volume_m2"][k]), 4),
+            "gfa_total_m2": round(float(outputs["gfa_total_m2"][k]), 4),
+            "risk_score": sum(problem["risk"][i] for i in subset),
+        }
+        for k, subset in enumerate(subsets)
+    ]
+
+    def dominates(a, b):
+        ge = (a["site_area_m2"] >= b["site_area_m2"] and a["allowed_volume_m2"] >= b["allowed_volume_m2"]
+              and a["risk_score"] <= b["risk_score"])
+        gt = (a["site_area_m2"] > b["site_area_m2"] or a["allowed_volume_m2"] > b["allowed_volume_m2"]
+              or a["risk_score"] < b["risk_score"])
+        return ge and gt
+
+    front = [p for p in points if not any(dominates(q, p) for q in points)]
+    front.sort(key=lambda p: (p["risk_score"], -p["allowed_volume_m2"]))
+    return front
+
+
+def optimize(db, project, request):
+    """Pareto front of parcel subsets for `project` per schemas.SiteOptimizeRequest."""
+    started = time.perf_counter()
+    parcels = db.execute(
+        select(models.LandParcel).where(models.LandParcel.project_id == project.id).order_by(models.LandParcel.id)
+    ).scalars().all()
+    problem = build_problem(project, parcels, request)
+    subsets, nodes, exact = solve(problem, request.max_nodes)
+    return {
+        "candidate_count": len(problem["ids"]),
+        "excluded": [{"id": pid, "reason": reason} for pid, reason in problem["excluded"].items()],
+        "front": pareto_front(problem, subsets),
+        "nodes": nodes,
+        "exact": exact,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1),
+    }
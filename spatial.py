@@ -0,0 +1,277 @@
+import math
+
+from sqlalchemy import text
+
+# Parcel geometry storage and bounding-box queries.
+#
+# Geometry is a GeoJSON Polygon in WGS84 (lng, lat), stored on
+# land_parcels.geom in a compact binary form:
+#
+#   byte 0      format version (1)
+#   varint      ring count
+#   per ring:   varint point count, then per point zigzag-varint (dx, dy)
+#
+# Coordinates are quantized to 1e-7 degrees (~1 cm) and delta-encoded against
+# the previous point, so a typical lot polygon takes a few dozen bytes.
+#
+# The bounding box is kept in plain columns (min_x/min_y/max_x/max_y) and
+# mirrored into the `land_parcels_rtree` R-tree by triggers, so the index stays
+# correct for any write path, including bulk SQL.
+
+GEOMETRY_FORMAT_VERSION = 1
+COORD_SCALE = 10_000_000
+
+# Metres per degree (equirectangular approximation; fine at parcel scale)
+M_PER_DEG_LAT = 110_540.0
+M_PER_DEG_LNG_EQUATOR = 111_320.0
+
+RTREE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS land_parcels_rtree
+    USING rtree(id, min_x, max_x, min_y, max_y)
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_parcels_rtree_ai AFTER INSERT ON land_parcels
+    WHEN NEW.min_x IS NOT NULL
+    BEGIN
+        INSERT OR REPLACE INTO land_parcels_rtree VALUES (NEW.id, NEW.min_x, NEW.max_x, NEW.min_y, NEW.max_y);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_parcels_rtree_au
+    AFTER UPDATE OF min_x, max_x, min_y, max_y ON land_parcels
+    BEGIN
+        DELETE FROM land_parcels_rtree WHERE id = OLD.id;
+        INSERT INTO land_parcels_rtree
+        SELECT NEW.id, NEW.min_x, NEW.max_x, NEW.min_y, NEW.max_y WHERE NEW.min_x IS NOT NULL;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_parcels_rtree_ad AFTER DELETE ON land_parcels
+    BEGIN
+        DELETE FROM land_parcels_rtree WHERE id = OLD.id;
+    END
+    """,
+    # Backfill rows written before the index existed
+    """
+    INSERT OR REPLACE INTO land_parcels_rtree
+    SELECT id, min_x, max_x, min_y, max_y FROM land_parcels
+    WHERE min_x IS NOT NULL AND id NOT IN (SELECT id FROM land_parcels_rtree)
+    """,
+]
+
+
+def ensure_spatial_index(cursor):
+    """Create the R-tree and its sync triggers (idempotent). Takes a sqlite3 cursor."""
+    for statement in RTREE_DDL:
+        cursor.execute(statement)
+
+
+# --- Binary Encoding ---
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def encode_polygon(rings) -> bytes:
+    out = bytearray([GEOMETRY_FORMAT_VERSION])
+    _write_varint(out, len(rings))
+    prev_x = prev_y = 0
+    for ring in rings:
+        _write_varint(out, len(ring))
+        for point in ring:
+            x = round(point[0] * COORD_SCALE)
+            y = round(point[1] * COORD_SCALE)
+            _write_varint(out, _zigzag(x - prev_x))
+            _write_varint(out, _zigzag(y - prev_y))
+            prev_x, prev_y = x, y
+    return bytes(out)
+
+
+def decode_polygon(data: bytes):
+    if not data:
+        return None
+    if data[0] != GEOMETRY_FORMAT_VERSION:
+        raise ValueError(f"Unsupported geometry format version: {data[0]}")
+    ring_count, pos = _read_varint(data, 1)
+    rings = []
+    x = y = 0
+    for _ in range(ring_count):
+        point_count, pos = _read_varint(data, pos)
+        ring = []
+        for _ in range(point_count):
+            dx, pos = _read_varint(data, pos)
+            dy, pos = _read_varint(data, pos)
+            x += _unzigzag(dx)
+            y += _unzigzag(dy)
+            ring.append([x / COORD_SCALE, y / COORD_SCALE])
+        rings.append(ring)
+    return rings
+
+
+def polygon_bbox(rings):
+    # Outer ring bounds the polygon; holes cannot extend it.
+    xs = [p[0] for p in rings[0]]
+    ys = [p[1] for p in rings[0]]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def to_metres(ring, lat0: float):
+    kx = M_PER_DEG_LNG_EQUATOR * math.cos(math.radians(lat0))
+    return [(x * kx, y * M_PER_DEG_LAT) for x, y in ring]
+
+
+def ring_perimeter_m(ring) -> float:
+    pts = to_metres(ring, ring[0][1])
+    return sum(math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(pts, pts[1:]))
+
+
+def apply_geometry(db_parcel, geometry):
+    """Set encoded geometry + bbox columns on a LandParcel from a GeoJSON Polygon dict.
+
+    Passing None clears the geometry (the R-tree trigger drops the entry).
+    """
+    if geometry is None:
+        db_parcel.geom = None
+        db_parcel.min_x = db_parcel.min_y = db_parcel.max_x = db_parcel.max_y = None
+        db_parcel.perimeter_m = None
+        return
+    rings = geometry["coordinates"]
+    db_parcel.geom = encode_polygon(rings)
+    db_parcel.min_x, db_parcel.min_y, db_parcel.max_x, db_parcel.max_y = polygon_bbox(rings)
+    db_parcel.perimeter_m = ring_perimeter_m(rings[0])
+
+
+# --- Simplification ---
+
+def zoom_tolerance(zoom: int) -> float:
+    # Degrees covered by one 256px web-mercator tile pixel at this zoom (at the equator).
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def _perpendicular_distance(point, start, end) -> float:
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    if dx == 0 and dy == 0:
+        return math.hypot(point[0] - start[0], point[1] - start[1])
+    return abs(dy * point[0] - dx * point[1] + end[0] * start[1] - end[1] * start[0]) / math.hypot(dx, dy)
+
+
+def simplify_ring(ring, tolerance: float):
+    """Douglas-Peucker on a closed ring. Keeps the first/last point."""
+    if len(ring) <= 4 or tolerance <= 0:
+        return ring
+    keep = [False] * len(ring)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(ring) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_dist = 0.0
+        index = first
+        for i in range(first + 1, last):
+            dist = _perpendicular_distance(ring[i], ring[first], ring[last])
+            if dist > max_dist:
+                index, max_dist = i, dist
+        if max_dist > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, kept in zip(ring, keep) if kept]
+
+
+def simplify_polygon(rings, bbox, tolerance: float):
+    min_x, min_y, max_x, max_y = bbox
+    if max_x - min_x <= tolerance and max_y - min_y <= tolerance:
+        # Sub-pixel parcel: its bbox is as good as the real outline at this zoom
+        return [[[min_x, min_y], [max_x, min_y], [max_x, max_y], [min_x, max_y], [min_x, min_y]]]
+    simplified = []
+    for i, ring in enumerate(rings):
+        ring = simplify_ring(ring, tolerance)
+        if len(ring) >= 4:
+            simplified.append(ring)
+        elif i == 0:
+            return simplify_polygon(rings, bbox, float("inf"))
+    return simplified
+
+
+# --- Queries ---
+
+def parse_bbox(value: str):
+    parts = [float(v) for v in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox must be 'west,south,east,north'")
+    west, south, east, north = parts
+    if west > east or south > north:
+        raise ValueError("bbox must be 'west,south,east,north' with west <= east and south <= north")
+    return west, south, east, north
+
+
+_WITHIN_SQL = """
+    SELECT p.id, p.project_id, p.section_name, p.lot_number, p.zoning_type,
+           p.include_in_site, p.geom, p.min_x, p.min_y, p.max_x, p.max_y
+    FROM land_parcels_rtree AS r
+    JOIN land_parcels AS p ON p.id = r.id
+    WHERE r.min_x <= :east AND r.max_x >= :west
+      AND r.min_y <= :north AND r.max_y >= :south
+      AND p.min_x <= :east AND p.max_x >= :west
+      AND p.min_y <= :north AND p.max_y >= :south
+      {project_filter}
+    LIMIT :limit
+"""
+
+
+def parcels_within(db, bbox, project_id: int = None, zoom: int = None, limit: int = 5000):
+    """Parcels whose bbox intersects `bbox`, as a GeoJSON FeatureCollection."""
+    west, south, east, north = bbox
+    params = {"west": west, "south": south, "east": east, "north": north, "limit": limit}
+    project_filter = ""
+    if project_id is not None:
+        project_filter = "AND p.project_id = :project_id"
+        params["project_id"] = project_id
+
+    rows = db.execute(text(_WITHIN_SQL.format(project_filter=project_filter)), params).all()
+
+    tolerance = zoom_tolerance(zoom) if zoom is not None else 0.0
+    features = []
+    for row in rows:
+        rings = decode_polygon(row.geom)
+        if rings is None:
+            continue
+        if tolerance > 0:
+            rings = simplify_polygon(rings, (row.min_x, row.min_y, row.max_x, row.max_y), tolerance)
+        features.append({
+            "type": "Feature",
+            "id": row.id,
+            "geometry": {"type": "Polygon", "coordinates": rings},
+            "properties": {
+                "project_id": row.project_id,
+                "section_name": row.section_name,
+                "lot_number": row.lot_number,
+                "zoning_type": row.zoning_type,
+                "include_in_site": bool(row.include_in_site),
+            },
+        })
+    return {"type": "FeatureCollection", "features": features, "truncated": len(rows) >= limit}
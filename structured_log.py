@@ -0,0 +1,229 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+import config
+
+# Process-wide logging setup.
+#
+# Request threads never write to the console: the root logger's only handler
+# is a QueueHandler that renders the record (message, traceback) and drops it
+# on a bounded queue. A QueueListener thread formats and writes it. When the
+# queue is full the record is dropped and counted instead of blocking the
+# request.
+#
+# - Levels: LOG_LEVEL for everything, LOG_LEVELS="main=DEBUG,query_log=WARNING"
+#   per logger. Disabled levels cost one isEnabledFor() check.
+# - Sampling: DEBUG records are kept at LOG_DEBUG_SAMPLE_RATE, counted per
+#   call site (logger + message template): the first one is always written,
+#   then every 1/rate-th. Kept records carry `sampled=1/rate`.
+# - Request IDs: RequestIdMiddleware takes X-Request-ID (or makes one), echoes
+#   it on the response and puts it on every record logged while the request
+#   is in flight, including from threadpool handlers. The catch-all Exception
+#   handler runs outside all middleware and passes it via `extra=`.
+# - Format: LOG_FORMAT=text (default) or json (one object per line, `extra=`
+#   fields included).
+
+_request_id: ContextVar = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came in via `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+_queue_handler = None
+_setup_lock = threading.Lock()
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def request_id_of(scope):
+    """The request's id where the context var is already reset (Exception handlers run outside the middleware)."""
+    return scope.get("request_id")
+
+
+def _clean_request_id(value: str) -> str:
+    # Kept filesystem-safe: profiling uses it as a file name.
+    rid = "".join(c for c in value if c.isalnum() or c in "-_")
+    return rid[:64]
+
+
+def _extras(record) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update(_extras(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s%(rid)s: %(message)s")
+
+    def format(self, record):
+        rid = getattr(record, "request_id", None)
+        record.rid = f" [{rid}]" if rid else ""
+        line = super().format(record)
+        del record.rid
+        fields = " ".join(f"{key}={value}" for key, value in _extras(record).items())
+        if fields:
+            head, sep, tail = line.partition("\n")
+            line = f"{head} | {fields}{sep}{tail}"
+        return line
+
+
+class DebugSampler(logging.Filter):
+    """Keep 1 in every round(1/rate) DEBUG records per call site (the first always)."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1.0 / rate)) if rate > 0 else 0
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        if self.every == 0:
+            return False
+        key = (record.name, record.msg)
+        with self._lock:
+            n = self._counts.get(key, 0)
+            self._counts[key] = n + 1
+        if n % self.every:
+            return False
+        record.sampled = self.every
+        return True
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._traceback_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        # Render in the caller (args may be mutable, tracebacks hold frames);
+        # keep extras and exc_text for the listener's formatter.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._traceback_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        record.stack_info = None
+        record.request_id = _request_id.get() or getattr(record, "request_id", None)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_levels(spec: str) -> dict:
+    """"main=DEBUG,query_log=warning" -> {"main": "DEBUG", "query_log": "WARNING"}"""
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup():
+    """Install the queue handler on the root logger and start the listener (idempotent)."""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            return
+        log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+        _queue_handler = _NonBlockingQueueHandler(log_queue)
+        _queue_handler.addFilter(DebugSampler(config.LOG_DEBUG_SAMPLE_RATE))
+
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(JsonFormatter() if config.LOG_FORMAT == "json" else TextFormatter())
+
+        root = logging.getLogger()
+        root.handlers = [_queue_handler]
+        root.setLevel(config.LOG_LEVEL.upper())
+        for name, level in parse_levels(config.LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def shutdown():
+    """Write out everything queued and stop the listener thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+
+
+def stats() -> dict:
+    if _queue_handler is None:
+        return {"running": False}
+    return {
+        "running": _listener is not None,
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+    }
+
+
+class RequestIdMiddleware:
+    """ASGI middleware: X-Request-ID in, same id on the response and on every log record."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = _clean_request_id(value.decode("latin-1"))
+                break
+        request_id = request_id or uuid.uuid4().hex
+        scope["request_id"] = request_id
+        token = _request_id.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
@@ -0,0 +1,183 @@
+import base64
+import json
+
+from sqlalchemy import and_, event, or_, select, text
+from sqlalchemy.orm import noload
+
+import models
+
+# Delta sync for offline / reopening clients.
+#
+# Every write transaction that touches a Project or LandParcel takes the next
+# number from the single-row `sync_state` counter and stamps it on the rows it
+# writes (`change_seq`, indexed). SQLite has one writer at a time and the
+# counter bump happens while that write lock is held, so sequence order is
+# commit order: a reader that has seen sequence N has seen every row stamped
+# <= N. Deletes leave a row in `tombstones`, written by triggers so bulk SQL
+# deletes are covered too.
+#
+# GET /sync?since=<token> walks the three change_seq indexes from the token
+# and returns changed projects, changed parcels and deleted ids, so the cost
+# of a re-sync follows the number of changes, not the size of the portfolio.
+# Tokens are opaque to clients; internally a (seq, kind, id) keyset position.
+
+KIND_PROJECT = 0
+KIND_PARCEL = 1
+KIND_TOMBSTONE = 2
+# Position after every kind at a given seq ("everything up to seq is done")
+_KIND_END = 9
+
+MAX_PAGE_SIZE = 5000
+
+SYNC_DDL = [
+    "INSERT OR IGNORE INTO sync_state (id, seq) VALUES (1, 0)",
+    """
+    CREATE TRIGGER IF NOT EXISTS projects_tombstone_ad AFTER DELETE ON projects
+    BEGIN
+        UPDATE sync_state SET seq = seq + 1 WHERE id = 1;
+        INSERT INTO tombstones (entity, entity_id, project_id, change_seq, deleted_at)
+        VALUES ('project', OLD.id, OLD.id, (SELECT seq FROM sync_state WHERE id = 1), CURRENT_TIMESTAMP);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_parcels_tombstone_ad AFTER DELETE ON land_parcels
+    BEGIN
+        UPDATE sync_state SET seq = seq + 1 WHERE id = 1;
+        INSERT INTO tombstones (entity, entity_id, project_id, change_seq, deleted_at)
+        VALUES ('parcel', OLD.id, OLD.project_id, (SELECT seq FROM sync_state WHERE id = 1), CURRENT_TIMESTAMP);
+    END
+    """,
+]
+
+
+def ensure_sync_triggers(cursor):
+    """Seed the counter row and create the tombstone triggers (idempotent). Takes a sqlite3 cursor."""
+    for statement in SYNC_DDL:
+        cursor.execute(statement)
+
+
+# --- Stamping Writes ---
+
+_BUMP_SQL = text("UPDATE sync_state SET seq = seq + 1 WHERE id = 1 RETURNING seq")
+
+# For Core statements that run after a flush in the same transaction
+current_seq = select(models.SyncState.seq).where(models.SyncState.id == 1).scalar_subquery()
+
+
+def next_seq(connection) -> int:
+    seq = connection.execute(_BUMP_SQL).scalar_one_or_none()
+    if seq is None:
+        # Counter row not seeded yet (DB created before patch_db ran)
+        connection.execute(text("INSERT OR IGNORE INTO sync_state (id, seq) VALUES (1, 1)"))
+        seq = 1
+    return seq
+
+
+def _before_flush(session, flush_context, instances):
+    targets = [obj for obj in session.new if isinstance(obj, (models.Project, models.LandParcel))]
+    targets += [
+        obj for obj in session.dirty
+        if isinstance(obj, (models.Project, models.LandParcel))
+        and session.is_modified(obj, include_collections=False)
+    ]
+    if not targets:
+        return
+    seq = next_seq(session.connection())
+    for obj in targets:
+        obj.change_seq = seq
+
+
+def install(session_factory):
+    if not event.contains(session_factory, "before_flush", _before_flush):
+        event.listen(session_factory, "before_flush", _before_flush)
+
+
+# --- Tokens ---
+
+def encode_token(seq: int, kind: int = _KIND_END, row_id: int = 0) -> str:
+    raw = json.dumps([seq, kind, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_token(token: str):
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        seq, kind, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return int(seq), int(kind), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid sync token")
+
+
+# --- Reading ---
+
+def _after(seq_col, id_col, kind: int, position):
+    """Rows of `kind` strictly after keyset `position` in (seq, kind, id) order."""
+    seq, at_kind, row_id = position
+    if kind < at_kind:
+        return seq_col > seq
+    if kind > at_kind:
+        return seq_col >= seq
+    return or_(seq_col > seq, and_(seq_col == seq, id_col > row_id))
+
+
+def changes_since(db, since: str = None, limit: int = 1000):
+    """One page of changes after `since` (None = full sync, no tombstones).
+
+    Returns a dict with projects, parcels, deleted ids, the next token and
+    has_more; call again with the token until has_more is False.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    position = decode_token(since) if since else (-1, _KIND_END, 0)
+
+    # Read the counter first: anything committed later is picked up next time.
+    high = db.execute(select(models.SyncState.seq).where(models.SyncState.id == 1)).scalar() or 0
+
+    Project, LandParcel, Tombstone = models.Project, models.LandParcel, models.Tombstone
+    sources = [
+        (KIND_PROJECT, Project, Project.change_seq, Project.id),
+        (KIND_PARCEL, LandParcel, LandParcel.change_seq, LandParcel.id),
+    ]
+    if since:
+        sources.append((KIND_TOMBSTONE, Tombstone, Tombstone.change_seq, Tombstone.id))
+
+    merged = []
+    for kind, entity, seq_col, id_col in sources:
+        stmt = (
+            select(entity)
+            .where(_after(seq_col, id_col, kind, position))
+            .order_by(seq_col, id_col)
+            .limit(limit + 1)
+        )
+        if entity is Project:
+            stmt = stmt.options(noload(Project.land_parcels))
+        for row in db.execute(stmt).scalars():
+            merged.append(((row.change_seq or 0, kind, row.id), row))
+
+    merged.sort(key=lambda item: item[0])
+    has_more = len(merged) > limit
+    page = merged[:limit]
+    token = encode_token(*page[-1][0]) if has_more else encode_token(max(high, position[0]))
+
+    # Latest state per row wins, so a delete followed by id reuse (or the
+    # reverse) inside one page comes out right.
+    projects, parcels, deleted = {}, {}, {"project": {}, "parcel": {}}
+    for (_, kind, _), row in page:
+        if kind == KIND_PROJECT:
+            row.total_area_ping = (row.total_area_m2 or 0.0) * 0.3025
+            projects[row.id] = row
+            deleted["project"].pop(row.id, None)
+        elif kind == KIND_PARCEL:
+            parcels[row.id] = row
+            deleted["parcel"].pop(row.id, None)
+        else:
+            (projects if row.entity == "project" else parcels).pop(row.entity_id, None)
+            deleted[row.entity][row.entity_id] = True
+
+    return {
+        "token": token,
+        "has_more": has_more,
+        "projects": list(projects.values()),
+        "parcels": list(parcels.values()),
+        "deleted_projects": list(deleted["project"]),
+        "deleted_parcels": list(deleted["parcel"]),
+    }
@@ -0,0 +1,136 @@
+import logging
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+import change_feed
+import config
+import models
+import sync
+
+# Write-behind buffer for projects.last_opened_at.
+#
+# Opening a project is the most frequent write the app makes. Instead of a
+# full ORM update per open, POST /projects/{id}/touch records the time here
+# and a background thread writes all pending touches every
+# TOUCH_FLUSH_INTERVAL_S in one executemany UPDATE. Repeated opens of the same
+# project between flushes coalesce into one row write.
+#
+# - The flush leaves updated_at alone, so opening a project does not move it
+#   in the `recent_updated` sort. It does take a sync sequence number and
+#   writes change_log rows, so delta sync and change feed clients still see
+#   the new last_opened_at.
+# - Reads in this process overlay pending values (overlay()); the
+#   `recent_opened` list sort flushes first so the ORDER BY is exact.
+# - The buffer is per process: other workers see a touch after the next flush.
+#   Pending touches are flushed on shutdown.
+
+logger = logging.getLogger("touch_buffer")
+
+_projects = models.Project.__table__
+
+_flush_stmt = (
+    update(_projects)
+    .where(_projects.c.id == bindparam("_id"))
+    .values(
+        last_opened_at=bindparam("_opened_at"),
+        # Set explicitly so the column's onupdate=now() does not fire
+        updated_at=_projects.c.updated_at,
+        change_seq=bindparam("_seq"),
+    )
+)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class TouchBuffer:
+    def __init__(self, engine, interval_s: float):
+        self.engine = engine
+        self.interval_s = interval_s
+        self._pending = {}  # project_id -> datetime
+        self._lock = threading.Lock()
+        # Serializes flushes so a slow one cannot race the next
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def touch(self, project_id: int, when: datetime = None) -> datetime:
+        when = when or _utcnow()
+        with self._lock:
+            current = self._pending.get(project_id)
+            if current is None or when > current:
+                self._pending[project_id] = when
+            return self._pending[project_id]
+
+    def pending(self, project_id: int):
+        with self._lock:
+            return self._pending.get(project_id)
+
+    def discard(self, project_id: int):
+        """Drop a pending touch (an explicit last_opened_at write supersedes it)."""
+        with self._lock:
+            self._pending.pop(project_id, None)
+
+    def overlay(self, projects):
+        """Show pending last_opened_at on loaded Project rows without dirtying them."""
+        with self._lock:
+            if not self._pending:
+                return
+            pending = dict(self._pending)
+        for project in projects:
+            when = pending.get(project.id)
+            if when is not None:
+                set_committed_value(project, "last_opened_at", when)
+
+    def flush(self) -> int:
+        """Write all pending touches in one UPDATE. Returns the number of projects written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                with self.engine.begin() as conn:
+                    seq = sync.next_seq(conn)
+                    conn.execute(_flush_stmt, [
+                        {"_id": pid, "_opened_at": when, "_seq": seq} for pid, when in batch.items()
+                    ])
+                    change_feed.write_changes(conn, [{
+                        "entity": "project", "entity_id": pid, "project_id": pid,
+                        "op": "update", "changes": {"last_opened_at": when},
+                    } for pid, when in batch.items()])
+            except Exception:
+                logger.exception("last_opened_at flush failed; keeping %d touches for retry", len(batch))
+                with self._lock:
+                    for pid, when in batch.items():
+                        current = self._pending.get(pid)
+                        if current is None or when > current:
+                            self._pending[pid] = when
+                return 0
+            change_feed.broker.notify()
+            return len(batch)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.flush()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="touch-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_s + 5)
+            self._thread = None
+        self.flush()
+
+
+def create(engine):
+    return TouchBuffer(engine, config.TOUCH_FLUSH_INTERVAL_S)
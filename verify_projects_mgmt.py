@@ -1,67 +0,0 @@
-import requests
-import time
-
-BASE_URL = "http://127.0.0.1:8001"
-
-def test_project_mgmt():
-    print("Creating test project...")
-    res = requests.post(f"{BASE_URL}/projects/", json={"name": "Mgmt Test Project"})
-    assert res.status_code == 200
-    project_id = res.json()["id"]
-    print(f"Created Project ID: {project_id}")
-
-    # 1. Test Pinning
-    print("\nTesting Pin...")
-    res = requests.put(f"{BASE_URL}/projects/{project_id}", json={"is_pinned": 1})
-    assert res.status_code == 200
-    assert res.json()["is_pinned"] == 1
-    
-    # Check GET
-    res = requests.get(f"{BASE_URL}/projects/")
-    projects = res.json()
-    p = next(x for x in projects if x["id"] == project_id)
-    assert p["is_pinned"] == 1
-    print("Pin Verified.")
-
-    # 2. Test Archive
-    print("\nTesting Archive...")
-    import datetime
-    now = datetime.datetime.now().isoformat()
-    res = requests.put(f"{BASE_URL}/projects/{project_id}", json={"archived_at": now})
-    assert res.status_code == 200
-    assert res.json()["archived_at"] is not None
-    print("Archive Verified.")
-
-    # 3. Test Filter (Active only by default)
-    print("\nTesting Archive Filter...")
-    # By default, should not include archived? 
-    # Wait, my implementation of `read_projects` has `include_archived` param default False.
-    res = requests.get(f"{BASE_URL}/projects/")
-    projects = res.json()
-    # Should NOT find it
-    found = any(x["id"] == project_id for x in projects)
-    if found:
-         print("WARNING: Found archived project in default list. Check default param logic.")
-    else:
-         print("Verified: Archived project hidden by default.")
-
-    # Test include_archived=true
-    res = requests.get(f"{BASE_URL}/projects/?include_archived=true")
-    projects = res.json()
-    found = any(x["id"] == project_id for x in projects)
-    assert found
-    print("Verified: Archived project shown with include_archived=true.")
-
-    # 4. Test Last Opened
-    print("\nTesting Last Opened...")
-    res = requests.put(f"{BASE_URL}/projects/{project_id}", json={"last_opened_at": now})
-    assert res.json()["last_opened_at"] is not None
-    print("Last Opened Verified.")
-
-    print("\nALL BACKEND TESTS PASSED.")
-
-if __name__ == "__main__":
-    try:
-        test_project_mgmt()
-    except Exception as e:
-        print(f"FAILED: {e}")